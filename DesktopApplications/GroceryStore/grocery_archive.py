@@ -0,0 +1,291 @@
+# grocery_archive.py - أرشفة المبيعات القديمة في ملفات شهرية خارج قاعدة البيانات الحية
+import argparse
+import os
+import sqlite3
+from datetime import date, datetime
+from urllib.request import pathname2url
+
+from grocery_manager import GroceryStoreManager, _bucket_bound
+from grocery_metrics import configure_logging, logger
+
+SALES_COLUMNS = ['sale_id', 'product_id', 'quantity_sold', 'sale_date', 'total_price']
+
+ARCHIVE_SALES_TABLE = '''
+    CREATE TABLE IF NOT EXISTS {schema}.sales (
+        sale_id INTEGER PRIMARY KEY,
+        product_id INTEGER,
+        quantity_sold INTEGER,
+        sale_date TEXT,
+        total_price REAL
+    )
+'''
+
+
+def month_range(month):
+    """بداية الشهر وبداية الشهر التالي كنصوص قابلة للمقارنة مع sale_date"""
+    year, number = int(month[:4]), int(month[5:7])
+    following = f'{year + number // 12:04d}-{number % 12 + 1:02d}'
+    return f'{month}-01', f'{following}-01'
+
+
+def shift_month(month, offset):
+    """إزاحة شهر بصيغة 'YYYY-MM' بعدد من الأشهر"""
+    index = int(month[:4]) * 12 + int(month[5:7]) - 1 + offset
+    return f'{index // 12:04d}-{index % 12 + 1:02d}'
+
+
+class SalesArchive:
+    """نقل مبيعات الأشهر المغلقة من جدول sales إلى ملف لكل شهر
+    
+    يبقى في قاعدة البيانات الحية آخر hot_months أشهر فقط (منها الشهر الحالي).
+    يُكتب كل شهر أقدم إلى قاعدة SQLite مستقلة (عبر ATTACH) أو ملف Parquet
+    مضغوط، ويُسجل في sales_archive_log. تبقى مبيعات الأشهر المؤرشفة في جداول
+    التجميع، فتقارير الفترات في المدير تشمل الأرشيف دون قراءته، ويقرأ
+    iter_sales وsales_totals السجل الخام من الأرشيف والقاعدة الحية معاً.
+    
+    الأرشفة آمنة عند الانقطاع: تُنسخ المبيعات أولاً ثم تُحذف من القاعدة الحية
+    في معاملة ثانية، وإعادة أرشفة الشهر نفسه لا تكرر أي بيع.
+    """
+    
+    def __init__(self, manager, directory=None, hot_months=3, file_format='sqlite'):
+        if file_format not in ('sqlite', 'parquet'):
+            raise ValueError(f"صيغة أرشيف غير مدعومة: {file_format}")
+        if hot_months < 1:
+            raise ValueError("يجب أن يبقى شهر واحد على الأقل في القاعدة الحية")
+        
+        self.manager = manager
+        self.directory = directory or os.path.splitext(os.path.abspath(manager.db_name))[0] + '_archive'
+        self.hot_months = hot_months
+        self.file_format = file_format
+    
+    def archive_path(self, month, file_format=None):
+        extension = 'parquet' if (file_format or self.file_format) == 'parquet' else 'db'
+        return os.path.join(self.directory, f'sales_{month}.{extension}')
+    
+    def archived_months(self):
+        """الأشهر المؤرشفة: قائمة (الشهر، المسار، الصيغة، عدد المبيعات)"""
+        with self.manager.db.connection() as conn:
+            return conn.execute(
+                'SELECT month, path, file_format, rows FROM sales_archive_log ORDER BY month').fetchall()
+    
+    def archivable_months(self, today=None):
+        """الأشهر الأقدم من النافذة الحية التي ما زالت لها مبيعات في القاعدة"""
+        today = today or date.today()
+        cutoff = shift_month(today.strftime('%Y-%m'), -(self.hot_months - 1))
+        
+        months = []
+        with self.manager.db.connection() as conn:
+            # كل خطوة بحث في فهرس idx_sales_date بدلاً من مسح جدول المبيعات
+            first = conn.execute(
+                'SELECT MIN(sale_date) FROM sales WHERE sale_date < ?', (f'{cutoff}-01',)).fetchall()[0][0]
+            while first is not None:
+                month = first[:7]
+                months.append(month)
+                first = conn.execute(
+                    'SELECT MIN(sale_date) FROM sales WHERE sale_date >= ? AND sale_date < ?',
+                    (month_range(month)[1], f'{cutoff}-01')).fetchall()[0][0]
+        return months
+    
+    def archive(self, today=None):
+        """أرشفة كل الأشهر المغلقة الأقدم من النافذة الحية"""
+        summary = {'months': [], 'rows': 0}
+        for month in self.archivable_months(today):
+            rows = self.archive_month(month)
+            summary['months'].append(month)
+            summary['rows'] += rows
+        
+        if summary['months']:
+            logger.info("تم أرشفة %s عملية بيع من %s شهر", summary['rows'], len(summary['months']))
+        else:
+            logger.info("لا توجد أشهر مغلقة للأرشفة")
+        return summary
+    
+    def archive_month(self, month):
+        """نقل مبيعات شهر واحد إلى ملف الأرشيف وإعادة عدد المبيعات المنقولة"""
+        start, end = month_range(month)
+        os.makedirs(self.directory, exist_ok=True)
+        
+        # قد يكون الشهر مؤرشفاً سابقاً بصيغة أخرى؛ تُضاف المبيعات المتأخرة إلى الملف نفسه
+        logged = [row for row in self.archived_months() if row[0] == month]
+        file_format = logged[0][2] if logged else self.file_format
+        path = logged[0][1] if logged else self.archive_path(month, file_format)
+        
+        with self.manager.db.writer(immediate=False) as conn:
+            if file_format == 'sqlite':
+                conn.execute('ATTACH DATABASE ? AS archive', (path,))
+                try:
+                    max_id, total = self._copy_to_sqlite(conn, start, end)
+                finally:
+                    conn.execute('DETACH DATABASE archive')
+            else:
+                max_id, total = self._copy_to_parquet(conn, path, start, end)
+            
+            if max_id is None:
+                return 0
+            
+            # المرحلة الثانية: حذف ما نُسخ فقط (أرقام المبيعات تتزايد، فأي بيع
+            # أُضيف بعد النسخ رقمه أكبر ويبقى للأرشفة التالية)
+            self.manager.db.begin_immediate(conn)
+            conn.execute('''
+                INSERT OR REPLACE INTO sales_archive_log (month, path, file_format, rows, archived_date)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (month, path, file_format, total, datetime.now()))
+            moved = conn.execute(
+                'DELETE FROM sales WHERE sale_date >= ? AND sale_date < ? AND sale_id <= ?',
+                (start, end, max_id)).rowcount
+            conn.commit()
+        
+        logger.info("تم أرشفة %s عملية بيع من شهر %s إلى %s", moved, month, path)
+        return moved
+    
+    def _copy_to_sqlite(self, conn, start, end):
+        """المرحلة الأولى: نسخ مبيعات الشهر إلى قاعدة الأرشيف المرفقة"""
+        self.manager.db.begin_immediate(conn)
+        try:
+            conn.execute(ARCHIVE_SALES_TABLE.format(schema='archive'))
+            max_id = conn.execute(
+                'SELECT MAX(sale_id) FROM main.sales WHERE sale_date >= ? AND sale_date < ?',
+                (start, end)).fetchall()[0][0]
+            conn.execute(f'''
+                INSERT OR IGNORE INTO archive.sales ({', '.join(SALES_COLUMNS)})
+                SELECT {', '.join(SALES_COLUMNS)} FROM main.sales
+                WHERE sale_date >= ? AND sale_date < ?
+            ''', (start, end))
+            total = conn.execute('SELECT COUNT(*) FROM archive.sales').fetchall()[0][0]
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return max_id, total
+    
+    def _copy_to_parquet(self, conn, path, start, end):
+        """المرحلة الأولى: كتابة مبيعات الشهر (مع ما أُرشف سابقاً) إلى ملف Parquet"""
+        from grocery_bulk import _parquet_schema, _require_pyarrow
+        pyarrow = _require_pyarrow()
+        schema = _parquet_schema(pyarrow, 'sales')
+        
+        rows = conn.execute(f'''
+            SELECT {', '.join(SALES_COLUMNS)} FROM sales
+            WHERE sale_date >= ? AND sale_date < ?
+            ORDER BY sale_id
+        ''', (start, end)).fetchall()
+        if not rows:
+            return None, 0
+        
+        records = {}
+        if os.path.exists(path):
+            for record in pyarrow.parquet.read_table(path, schema=schema).to_pylist():
+                records[record['sale_id']] = record
+        for row in rows:
+            records[row[0]] = {column: str(value) if column == 'sale_date' else value
+                               for column, value in zip(SALES_COLUMNS, row)}
+        
+        table = pyarrow.Table.from_pylist([records[sale_id] for sale_id in sorted(records)], schema=schema)
+        temporary = path + '.tmp'
+        pyarrow.parquet.write_table(table, temporary, compression='zstd')
+        os.replace(temporary, path)
+        return rows[-1][0], len(records)
+    
+    # ----- القراءة من الأرشيف والقاعدة الحية معاً -----
+    
+    def _read_month(self, path, file_format, start, end, product_id):
+        """مبيعات ملف أرشيف واحد ضمن النطاق"""
+        if file_format == 'parquet':
+            from grocery_bulk import _require_pyarrow
+            pyarrow = _require_pyarrow()
+            filters = [('sale_date', '>=', start), ('sale_date', '<=', end)]
+            if product_id is not None:
+                filters.append(('product_id', '=', product_id))
+            table = pyarrow.parquet.read_table(path, columns=SALES_COLUMNS, filters=filters)
+            yield from zip(*(table.column(column).to_pylist() for column in SALES_COLUMNS))
+            return
+        
+        # المسار يُرمَّز كما في grocery_db حتى لا تُفسَّر ? و# و% فيه كأجزاء من URI
+        conn = sqlite3.connect(f'file:{pathname2url(os.path.abspath(path))}?mode=ro', uri=True)
+        try:
+            query = f'''
+                SELECT {', '.join(SALES_COLUMNS)} FROM sales
+                WHERE sale_date >= ? AND sale_date <= ?
+            '''
+            params = [start, end]
+            if product_id is not None:
+                query += ' AND product_id = ?'
+                params.append(product_id)
+            yield from conn.execute(query + ' ORDER BY sale_date, sale_id', params)
+        finally:
+            conn.close()
+    
+    def iter_sales(self, start=None, end=None, product_id=None):
+        """سجل المبيعات الخام بين start وend (الحدان مشمولان) من الأرشيف ثم القاعدة الحية
+        
+        start وend بصيغة sale_date ('2024-03' أو '2024-03-15') أو date/datetime.
+        يعيد صفوفاً (sale_id, product_id, quantity_sold, sale_date, total_price).
+        """
+        start = _bucket_bound(start) or ''
+        end = (_bucket_bound(end) or '9999') + '~'
+        
+        for month, path, file_format, _ in self.archived_months():
+            if start[:7] <= month <= end[:7] and os.path.exists(path):
+                yield from self._read_month(path, file_format, start, end, product_id)
+        
+        query = f'''
+            SELECT {', '.join(SALES_COLUMNS)} FROM sales
+            WHERE sale_date >= ? AND sale_date <= ?
+        '''
+        params = [start, end]
+        if product_id is not None:
+            query += ' AND product_id = ?'
+            params.append(product_id)
+        with self.manager.db.connection() as conn:
+            cursor = conn.execute(query + ' ORDER BY sale_date, sale_id', params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(500)
+                    if not rows:
+                        break
+                    yield from rows
+            finally:
+                cursor.close()
+    
+    def sales_totals(self, start=None, end=None, product_id=None):
+        """إجمالي الكمية والإيراد وعدد المبيعات من الأرشيف والقاعدة الحية"""
+        quantity = revenue = count = 0
+        for _, _, quantity_sold, _, total_price in self.iter_sales(start, end, product_id):
+            quantity += quantity_sold or 0
+            revenue += total_price or 0
+            count += 1
+        return {'quantity': quantity, 'revenue': revenue, 'sale_count': count}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="أرشفة مبيعات الأشهر المغلقة")
+    parser.add_argument('--db', default='grocery_store.db', help="ملف قاعدة البيانات")
+    parser.add_argument('--dir', help="مجلد الأرشيف (افتراضياً بجانب قاعدة البيانات)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    archive_parser = subparsers.add_parser('archive', help="أرشفة الأشهر الأقدم من النافذة الحية")
+    archive_parser.add_argument('--hot-months', type=int, default=3)
+    archive_parser.add_argument('--format', choices=['sqlite', 'parquet'], default='sqlite')
+    
+    subparsers.add_parser('list', help="عرض الأشهر المؤرشفة")
+    
+    trim_parser = subparsers.add_parser('trim-journal', help="حذف التغييرات القديمة من سجل التغييرات")
+    trim_parser.add_argument('--keep', type=int, default=100_000, help="عدد آخر التغييرات التي تبقى دائماً")
+    trim_parser.add_argument('--keep-days', type=float, help="إبقاء كل تغييرات آخر عدد من الأيام أيضاً")
+    
+    args = parser.parse_args(argv)
+    configure_logging()
+    
+    with GroceryStoreManager(args.db) as manager:
+        if args.command == 'archive':
+            SalesArchive(manager, args.dir, args.hot_months, args.format).archive()
+        elif args.command == 'trim-journal':
+            removed = manager.trim_change_journal(args.keep, args.keep_days)
+            print(f"تم حذف {removed} تغييراً من سجل التغييرات")
+        else:
+            for month, path, file_format, rows in SalesArchive(manager, args.dir).archived_months():
+                print(f"{month}: {rows} عملية بيع ({file_format}) - {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+# grocery_async.py - واجهة asyncio لمدير المحل: كاتب واحد وعدة قرّاء في خيوط مخصصة
+import asyncio
+import functools
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+
+from grocery_manager import GroceryStoreManager
+
+
+def _next_batch(iterator, size):
+    return list(itertools.islice(iterator, size))
+
+
+class AsyncGroceryStoreManager:
+    """نسخة async من GroceryStoreManager لخدمات asyncio (الماسحات والموازين ولوحات الويب)
+    
+    كل عملية تُنفذ في خيط مخصص لقاعدة البيانات فلا تتوقف حلقة الأحداث:
+    الكتابات في خيط واحد (كاتب واحد كما في SQLite، دون تنافس على قفل الكتابة)،
+    والقراءات في readers خيطاً لكل منها اتصاله، وتُرسل كل قراءة إلى أقلها
+    انشغالاً. لا يتجاوز عدد الطلبات الجارية max_pending؛ ما زاد ينتظر دوره
+    (ضغط عكسي) بدلاً من تكديس طابور بلا حد.
+    
+    لا تمر القراءات بقفل الكتابة: الاستعلامات تعمل على اتصال خيط القارئ (SQLite
+    تحرر GIL أثناءها، وفي وضع WAL لا تنتظر معاملة الكتابة الجارية)، وقراءات
+    الذاكرة المؤقتة تتحقق من حداثتها على الاتصال نفسه ولا تمسك قفلها إلا أثناء
+    نسخ الصفوف. فتتوازى القراءات فيما بينها ومع الكاتب.
+    
+    النتائج الكبيرة تُقرأ بـ async for على دفعات من batch_size صف، وتُجلب
+    الدفعة التالية عند طلبها فقط ومن الخيط نفسه الذي فتح المؤشر. لكل قراءة
+    متدفقة خيط من streams خيطاً لا يخدم غيرها حتى تنتهي، فلا تعتمد قراءة أخرى
+    على الاتصال نفسه والمؤشر مفتوح؛ ما زاد عن streams ينتظر خيطاً يتحرر.
+    """
+    
+    def __init__(self, manager=None, readers=4, max_pending=256, batch_size=500, streams=2, **manager_options):
+        owns_manager = manager is None
+        if owns_manager:
+            manager = GroceryStoreManager(**manager_options)
+        self._setup(manager, owns_manager, readers, max_pending, batch_size, streams)
+    
+    def _setup(self, manager, owns_manager, readers, max_pending, batch_size, streams, writer=None):
+        self.manager = manager
+        self._owns_manager = owns_manager
+        # اتصال لكل قارئ ولكل خيط قراءة متدفقة ولخيط الكتابة، ويبقى اتصال لخيط المستدعي
+        if readers + streams + 2 > manager.db.max_connections:
+            if owns_manager:
+                manager.close()
+            if writer is not None:
+                writer.shutdown(wait=False)
+            raise ValueError(f"عدد القراء وخيوط القراءة المتدفقة يتجاوز حد الاتصالات ({manager.db.max_connections})")
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        
+        self._writer = writer or ThreadPoolExecutor(1, thread_name_prefix='grocery-writer')
+        self._readers = [ThreadPoolExecutor(1, thread_name_prefix=f'grocery-reader-{i}') for i in range(readers)]
+        self._reader_load = [0] * readers
+        self._stream_executors = [ThreadPoolExecutor(1, thread_name_prefix=f'grocery-stream-{i}')
+                                  for i in range(streams)]
+        self._streams = asyncio.Queue()   # خيوط القراءة المتدفقة الحرة
+        for executor in self._stream_executors:
+            self._streams.put_nowait(executor)
+        self._slots = asyncio.Semaphore(max_pending)
+        
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.completed = 0
+        self.waited = 0
+    
+    @classmethod
+    async def open(cls, db_name='grocery_store.db', readers=4, max_pending=256, batch_size=500, streams=2,
+                   **manager_options):
+        """فتح قاعدة البيانات وتهيئتها (الترحيلات وغيرها) خارج حلقة الأحداث
+        
+        يُنشأ المدير في خيط الكتابة نفسه، فلا يبقى اتصال لخيط إضافي.
+        """
+        writer = ThreadPoolExecutor(1, thread_name_prefix='grocery-writer')
+        try:
+            manager = await asyncio.get_running_loop().run_in_executor(
+                writer, functools.partial(GroceryStoreManager, db_name, **manager_options))
+        except BaseException:
+            writer.shutdown(wait=False)
+            raise
+        store = cls.__new__(cls)
+        store._setup(manager, True, readers, max_pending, batch_size, streams, writer)
+        return store
+    
+    async def _call(self, executor, func, *args, **kwargs):
+        if self._slots.locked():
+            self.waited += 1
+        async with self._slots:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            try:
+                return await asyncio.get_running_loop().run_in_executor(
+                    executor, functools.partial(func, *args, **kwargs))
+            finally:
+                self.in_flight -= 1
+                self.completed += 1
+    
+    def _pick_reader(self):
+        index = min(range(len(self._readers)), key=self._reader_load.__getitem__)
+        self._reader_load[index] += 1
+        return index
+    
+    async def _read(self, method, *args, **kwargs):
+        index = self._pick_reader()
+        try:
+            return await self._call(self._readers[index], getattr(self.manager, method), *args, **kwargs)
+        finally:
+            self._reader_load[index] -= 1
+    
+    async def _write(self, method, *args, **kwargs):
+        return await self._call(self._writer, getattr(self.manager, method), *args, **kwargs)
+    
+    async def _stream(self, method, args, batch_size):
+        """قراءة نتيجة مولّد المدير على دفعات، كلها في خيط قراءة متدفقة محجوز لها"""
+        size = batch_size or self.batch_size
+        executor = await self._streams.get()
+        try:
+            iterator = await self._call(executor, lambda: iter(getattr(self.manager, method)(*args)))
+            try:
+                while True:
+                    batch = await self._call(executor, _next_batch, iterator, size)
+                    for row in batch:
+                        yield row
+                    if len(batch) < size:
+                        return
+            finally:
+                # إغلاق المؤشر في خيطه إذا توقف المستهلك قبل النهاية
+                if hasattr(iterator, 'close'):
+                    await asyncio.get_running_loop().run_in_executor(executor, iterator.close)
+        finally:
+            self._streams.put_nowait(executor)
+    
+    # الكتابات
+    
+    async def add_product(self, name, category, price, quantity, min_stock_level=5, expiry_date=None, barcodes=()):
+        return await self._write('add_product', name, category, price, quantity, min_stock_level, expiry_date,
+                                 barcodes)
+    
+    async def update_product(self, product_id, **kwargs):
+        return await self._write('update_product', product_id, **kwargs)
+    
+    async def delete_product(self, product_id):
+        return await self._write('delete_product', product_id)
+    
+    async def restore_product(self, product_id):
+        return await self._write('restore_product', product_id)
+    
+    async def receive_stock(self, product_id, quantity, expiry_date=None, received_date=None):
+        return await self._write('receive_stock', product_id, quantity, expiry_date, received_date)
+    
+    async def sell_product(self, product_id, quantity):
+        return await self._write('sell_product', product_id, quantity)
+    
+    async def sell_many(self, lines):
+        return await self._write('sell_many', lines)
+    
+    async def scan_and_sell(self, barcode, quantity=1):
+        return await self._write('scan_and_sell', barcode, quantity)
+    
+    # القراءات
+    
+    async def get_product(self, product_id):
+        return await self._read('get_product', product_id)
+    
+    async def find_by_barcode(self, barcode):
+        return await self._read('find_by_barcode', barcode)
+    
+    async def count_products(self):
+        return await self._read('count_products')
+    
+    async def get_products_page(self, limit=100, offset=0, after_id=None):
+        return await self._read('get_products_page', limit, offset, after_id)
+    
+    async def get_all_products(self):
+        return await self._read('get_all_products')
+    
+    async def search_products(self, search_term, use_fts=True, limit=None):
+        return await self._read('search_products', search_term, use_fts, limit)
+    
+    async def get_low_stock_products(self):
+        return await self._read('get_low_stock_products')
+    
+    async def get_product_stats(self):
+        return await self._read('get_product_stats')
+    
+    async def get_top_sellers(self, n=10, start=None, end=None, by='revenue', category=None):
+        return await self._read('get_top_sellers', n, start, end, by, category)
+    
+    async def get_revenue_by_period(self, period='day', start=None, end=None, category=None):
+        return await self._read('get_revenue_by_period', period, start, end, category)
+    
+    async def get_category_breakdown(self, start=None, end=None):
+        return await self._read('get_category_breakdown', start, end)
+    
+    async def changes_since(self, seq=0, limit=1000):
+        return await self._read('changes_since', seq, limit)
+    
+    # القراءة المتدفقة: async for row in store.iter_products()
+    
+    def iter_products(self, batch_size=None):
+        return self._stream('iter_products', (), batch_size)
+    
+    def iter_search_results(self, search_term, use_fts=True, limit=None, batch_size=None):
+        return self._stream('iter_search_results', (search_term, use_fts, limit), batch_size)
+    
+    def iter_low_stock_products(self, batch_size=None):
+        return self._stream('iter_low_stock_products', (), batch_size)
+    
+    def stats(self):
+        """حالة الطلبات: الجارية وأقصاها والمكتملة وعدد من انتظر دوره وانشغال كل قارئ"""
+        return {
+            'in_flight': self.in_flight,
+            'max_in_flight': self.max_in_flight,
+            'max_pending': self.max_pending,
+            'completed': self.completed,
+            'waited': self.waited,
+            'reader_load': list(self._reader_load),
+            'free_streams': self._streams.qsize(),
+        }
+    
+    async def close(self):
+        """انتظار الطلبات الجارية وإيقاف الخيوط (وإغلاق المدير إذا فتحته هذه الواجهة)
+        
+        الإيقاف يتم في خيط الكتابة بعد آخر كتابة في طابوره، فلا يُستخدم خيط إضافي.
+        """
+        await asyncio.get_running_loop().run_in_executor(self._writer, self._shutdown)
+        self._writer.shutdown()
+    
+    def _shutdown(self):
+        for executor in self._readers + self._stream_executors:
+            executor.shutdown()
+        if self._owns_manager:
+            self.manager.close()
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+        return False
@@ -0,0 +1,1062 @@
+# grocery_benchmark.py - قياس أداء مدير المحل
+import argparse
+import contextlib
+import inspect
+import io
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from grocery_manager import GroceryStoreManager
+
+
+def time_calls(func, iterations):
+    """تنفيذ الدالة عدة مرات وإرجاع زمن كل استدعاء بالثواني"""
+    latencies = []
+    for i in range(iterations):
+        start = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def summarize(latencies):
+    """ملخص أزمنة الاستدعاءات بالميكروثانية والإنتاجية (استدعاء/ثانية)"""
+    ordered = sorted(latencies)
+    
+    def percentile(fraction):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1e6
+    
+    total = sum(ordered)
+    return {
+        'calls': len(ordered),
+        'mean_us': statistics.fmean(ordered) * 1e6,
+        'p50_us': ordered[len(ordered) // 2] * 1e6,
+        'p95_us': percentile(0.95),
+        'p99_us': percentile(0.99),
+        'ops_per_sec': len(ordered) / total if total else float('inf'),
+    }
+
+
+def print_table(title, rows):
+    """طباعة نتائج مجموعة قياسات"""
+    print(f"\n{title}")
+    print(f"{'العملية':<28}{'الاستدعاءات':>12}{'المتوسط µs':>14}{'p50 µs':>12}{'p95 µs':>12}"
+          f"{'p99 µs':>12}{'عملية/ث':>12}")
+    for name, result in rows:
+        print(f"{name:<28}{result['calls']:>12}{result['mean_us']:>14.1f}"
+              f"{result['p50_us']:>12.1f}{result['p95_us']:>12.1f}"
+              f"{result['p99_us']:>12.1f}{result['ops_per_sec']:>12.0f}")
+
+
+def seed_products(manager, count):
+    """إضافة سلع تجريبية بكميات كبيرة"""
+    return [manager.add_product(f"سلعة {i}", f"فئة {i % 10}", 1.5 + i % 7, 1_000_000)
+            for i in range(count)]
+
+
+def bench_connections(iterations=300, products=200):
+    """مقارنة زمن الاستدعاء: اتصال جديد لكل عملية مقابل اتصال دائم لكل خيط"""
+    results = {}
+    for persistent in (False, True):
+        label = 'اتصال دائم' if persistent else 'اتصال لكل عملية'
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            db_path = os.path.join(tmp, 'bench.db')
+            with GroceryStoreManager(db_path, persistent_connections=persistent) as manager:
+                ids = seed_products(manager, products)
+                rows = [
+                    ('add_product', time_calls(
+                        lambda i: manager.add_product(f"جديد {i}", "فئة", 2.0, 10), iterations)),
+                    ('sell_product', time_calls(
+                        lambda i: manager.sell_product(ids[i % len(ids)], 1), iterations)),
+                    ('update_product', time_calls(
+                        lambda i: manager.update_product(ids[i % len(ids)], price=3.0 + i % 5), iterations)),
+                    ('get_product_stats', time_calls(
+                        lambda i: manager.get_product_stats(), iterations)),
+                    ('search_products', time_calls(
+                        lambda i: manager.search_products(f"سلعة {i % 50}"), iterations)),
+                    ('get_all_products', time_calls(
+                        lambda i: manager.get_all_products(), max(1, iterations // 10))),
+                ]
+        results[label] = [(name, summarize(latencies)) for name, latencies in rows]
+    
+    for label, rows in results.items():
+        print_table(label, rows)
+    return results
+
+
+def bench_bulk_import(iterations=300, products=100_000):
+    """مقارنة استيراد كتالوج كامل بالدفعات مقابل add_product سطراً سطراً"""
+    import csv
+    from grocery_bulk import import_products
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, 'catalogue.csv')
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['name', 'category', 'price', 'quantity', 'min_stock_level', 'expiry_date'])
+            for i in range(products):
+                writer.writerow([f"سلعة {i}", f"فئة {i % 25}", 1.25 + i % 40, i % 200, 5, '2027-01-01'])
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            with GroceryStoreManager(os.path.join(tmp, 'rows.db')) as manager:
+                latencies = time_calls(
+                    lambda i: manager.add_product(f"سلعة {i}", f"فئة {i % 25}", 1.25, 10), iterations)
+            with GroceryStoreManager(os.path.join(tmp, 'bulk.db')) as manager:
+                summary = import_products(manager, csv_path, fast=True)
+    
+    per_row_us = statistics.fmean(latencies) * 1e6
+    print(f"add_product: {per_row_us:.1f} µs لكل سلعة (تقدير {per_row_us * products / 1e6:.1f} ثانية لـ {products} سلعة)")
+    print(f"import_products: {summary['seconds']:.2f} ثانية لـ {summary['imported']} سلعة "
+          f"({summary['seconds'] / max(1, summary['imported']) * 1e6:.1f} µs لكل سلعة)")
+    return summary
+
+
+def _import_seconds(statement):
+    """زمن تنفيذ أمر استيراد في عملية Python جديدة"""
+    code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+    output = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout
+    return float(output.strip())
+
+
+def bench_rows(iterations=20, products=20_000):
+    """زمن بدء التشغيل وزمن تحديث قائمة السلع: DataFrame مقابل صفوف ProductRow"""
+    runs = max(3, iterations // 4)
+    startup = {
+        'import grocery_manager': [_import_seconds('import grocery_manager') for _ in range(runs)],
+        'import grocery_manager + pandas': [_import_seconds('import grocery_manager, pandas') for _ in range(runs)],
+    }
+    print("\nزمن الاستيراد عند بدء التشغيل")
+    for name, samples in startup.items():
+        print(f"{name:<36}{statistics.median(samples) * 1000:>10.1f} ms")
+    
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        with GroceryStoreManager(os.path.join(tmp, 'bench.db')) as manager:
+            manager.db.get().executemany(
+                'INSERT INTO products (name, category, price, quantity) VALUES (?, ?, ?, ?)',
+                [(f"سلعة {i}", f"فئة {i % 25}", 1.5, i % 100) for i in range(products)])
+            manager.db.get().commit()
+            
+            def dataframe_refresh(i):
+                df = manager.get_all_products()
+                for _, row in df.iterrows():
+                    (row['product_id'], row['name'], row['category'], f"{row['price']:.2f}",
+                     row['quantity'], row['sold_quantity'], row['status'])
+            
+            def rows_refresh(i):
+                for row in manager.iter_products():
+                    (row.product_id, row.name, row.category, f"{row.price:.2f}",
+                     row.quantity, row.sold_quantity, row.status)
+            
+            rows = [
+                ('DataFrame + iterrows', summarize(time_calls(dataframe_refresh, iterations))),
+                ('iter_products', summarize(time_calls(rows_refresh, iterations))),
+            ]
+    print_table(f"تحديث قائمة {products} سلعة", rows)
+    return startup, rows
+
+
+def bench_cache(iterations=300, products=20_000):
+    """القراءات مع الذاكرة المؤقتة للسلع ومن دونها"""
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        db_path = os.path.join(tmp, 'bench.db')
+        with GroceryStoreManager(db_path, cache=False) as manager:
+            manager.db.get().executemany(
+                'INSERT INTO products (name, category, price, quantity) VALUES (?, ?, ?, ?)',
+                [(f"سلعة {i}", f"فئة {i % 25}", 1.5, i % 100) for i in range(products)])
+            manager.db.get().commit()
+        
+        for cache in (False, True):
+            label = 'مع الذاكرة المؤقتة' if cache else 'بدون ذاكرة مؤقتة'
+            with GroceryStoreManager(db_path, cache=cache) as manager:
+                manager.count_products()
+                rows = [
+                    ('get_product', time_calls(
+                        lambda i: manager.get_product(1 + i * 7919 % products), iterations)),
+                    ('get_products_by_category', time_calls(
+                        lambda i: manager.get_products_by_category(f"فئة {i % 25}"), iterations // 10)),
+                    ('iter_low_stock_products', time_calls(
+                        lambda i: list(manager.iter_low_stock_products()), iterations // 10)),
+                    ('sell + get_product', time_calls(
+                        lambda i: (manager.sell_product(1 + i % products, 1), manager.get_product(1 + i % products)),
+                        iterations)),
+                ]
+            results[label] = [(name, summarize(latencies)) for name, latencies in rows]
+    
+    for label, rows in results.items():
+        print_table(label, rows)
+    return results
+
+
+# أكبر كمية في بيع واحد من نقاط البيع في اختبار الضغط
+STRESS_MAX_QUANTITY = 3
+
+
+def _terminal_worker(db_path, product_ids, attempts, seed, results):
+    """نقطة بيع مستقلة في عملية منفصلة تبيع من السلع نفسها"""
+    import random
+    
+    rng = random.Random(seed)
+    sold = {product_id: 0 for product_id in product_ids}
+    with contextlib.redirect_stdout(io.StringIO()):
+        with GroceryStoreManager(db_path, cache=False) as manager:
+            start = time.perf_counter()
+            for _ in range(attempts):
+                product_id = rng.choice(product_ids)
+                quantity = rng.randint(1, STRESS_MAX_QUANTITY)
+                if manager.sell_product(product_id, quantity):
+                    sold[product_id] += quantity
+            elapsed = time.perf_counter() - start
+    results.put((sold, attempts, elapsed))
+
+
+def bench_stress(iterations=300, products=5, max_terminals=8):
+    """اختبار ضغط لعدة نقاط بيع على ملف واحد: التحقق من عدم ضياع أي تحديث وقياس المبيعات/ثانية"""
+    import multiprocessing
+    
+    terminals = 1
+    rows = []
+    while terminals <= max_terminals:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, 'stress.db')
+            with contextlib.redirect_stdout(io.StringIO()):
+                with GroceryStoreManager(db_path) as manager:
+                    # مخزون أقل من الطلب الكلي حتى تنفد بعض السلع أثناء الاختبار،
+                    # ولا يقل عن أكبر كمية في بيع واحد فينجح أول بيع لكل سلعة على الأقل
+                    initial = max(STRESS_MAX_QUANTITY, iterations * terminals // products)
+                    product_ids = [manager.add_product(f"سلعة {i}", "ضغط", 1.0, initial) for i in range(products)]
+            
+            results = multiprocessing.Queue()
+            workers = [
+                multiprocessing.Process(target=_terminal_worker,
+                                        args=(db_path, product_ids, iterations, seed, results))
+                for seed in range(terminals)
+            ]
+            start = time.perf_counter()
+            for worker in workers:
+                worker.start()
+            outcomes = [results.get() for _ in workers]
+            for worker in workers:
+                worker.join()
+            elapsed = time.perf_counter() - start
+            
+            sold = {product_id: sum(outcome[0][product_id] for outcome in outcomes) for product_id in product_ids}
+            with contextlib.redirect_stdout(io.StringIO()):
+                with GroceryStoreManager(db_path, cache=False) as manager:
+                    conn = manager.db.get()
+                    for product_id in product_ids:
+                        quantity, sold_quantity = conn.execute(
+                            'SELECT quantity, sold_quantity FROM products WHERE product_id = ?',
+                            (product_id,)).fetchall()[0]
+                        recorded = conn.execute(
+                            'SELECT IFNULL(SUM(quantity_sold), 0) FROM sales WHERE product_id = ?',
+                            (product_id,)).fetchall()[0][0]
+                        # لا تحديثات ضائعة: كل بيع ناجح مسجل مرة واحدة والمخزون لم يصبح سالباً
+                        assert quantity >= 0, f"مخزون سالب للسلعة {product_id}"
+                        assert quantity == initial - sold[product_id], f"تحديث ضائع للسلعة {product_id}"
+                        assert sold_quantity == recorded == sold[product_id], f"مبيعات غير متطابقة للسلعة {product_id}"
+                    sales_count = conn.execute('SELECT COUNT(*) FROM sales').fetchall()[0][0]
+                    # جولة بلا مبيعات لا تثبت شيئاً عن التحديثات الضائعة
+                    assert sales_count > 0, f"لم يتم أي بيع مع {terminals} نقطة بيع"
+        
+        attempts = iterations * terminals
+        rows.append((terminals, attempts, sales_count, attempts / elapsed, sales_count / elapsed))
+        terminals *= 2
+    
+    print(f"\n{'نقاط البيع':<12}{'المحاولات':>10}{'المبيعات':>10}{'محاولة/ث':>12}{'بيع/ث':>10}")
+    for terminals, attempts, sales_count, attempt_rate, sale_rate in rows:
+        print(f"{terminals:<12}{attempts:>10}{sales_count:>10}{attempt_rate:>12.0f}{sale_rate:>10.0f}")
+    print("لا توجد تحديثات ضائعة في جميع الجولات")
+    return rows
+
+
+def bench_write_behind(iterations=300, threads=8, products=50):
+    """معدل تسجيل المبيعات من عدة خيوط: اعتماد لكل بيع مقابل الكتابة المؤجلة المجمّعة"""
+    import threading
+    
+    modes = [
+        ('اعتماد لكل بيع', None),
+        ("مؤجلة (durability='ack')", {'durability': 'ack'}),
+        ("مؤجلة (durability='async')", {'durability': 'async'}),
+    ]
+    rows = []
+    for label, write_behind in modes:
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            with GroceryStoreManager(os.path.join(tmp, 'bench.db'), write_behind=write_behind) as manager:
+                ids = seed_products(manager, products)
+                
+                def terminal(offset):
+                    for i in range(iterations):
+                        manager.sell_product(ids[(offset + i) % len(ids)], 1)
+                
+                workers = [threading.Thread(target=terminal, args=(t,)) for t in range(threads)]
+                start = time.perf_counter()
+                for worker in workers:
+                    worker.start()
+                for worker in workers:
+                    worker.join()
+                if manager.write_behind is not None:
+                    manager.write_behind.flush()
+                elapsed = time.perf_counter() - start
+                metrics = manager.write_behind.metrics() if manager.write_behind is not None else None
+        rows.append((label, threads * iterations / elapsed, metrics))
+    
+    print(f"\n{'الوضع':<30}{'بيع/ث':>10}{'متوسط الدفعة':>14}{'أقصى عمق':>10}")
+    for label, rate, metrics in rows:
+        batch = f"{metrics['avg_batch_size']:.1f}" if metrics else '1'
+        depth = metrics['max_queue_depth'] if metrics else '-'
+        print(f"{label:<30}{rate:>10.0f}{batch:>14}{depth:>10}")
+    return rows
+
+
+def bench_server(iterations=100, clients=20, products=50):
+    """اختبار حمل على خادم نقاط البيع عبر localhost مع الذاكرة المؤقتة للقراءة وبدونها"""
+    import asyncio
+    from grocery_server import GroceryStoreServer, load_test
+    
+    async def run(manager, ids, cache_ttl):
+        server = GroceryStoreServer(manager, port=0, cache_ttl=cache_ttl)
+        await server.start()
+        try:
+            result = await load_test(port=server.port, clients=clients, requests_per_client=iterations,
+                                     product_ids=ids)
+        finally:
+            await server.stop()
+        result['cache_hits'] = server.cache_hits
+        return result
+    
+    rows = []
+    for label, cache_ttl in (('بدون ذاكرة مؤقتة', 0.0), ('ذاكرة مؤقتة 1 ثانية', 1.0)):
+        with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+            with GroceryStoreManager(os.path.join(tmp, 'bench.db')) as manager:
+                ids = seed_products(manager, products)
+                result = asyncio.run(run(manager, ids, cache_ttl))
+        assert result['statuses'].get(500) is None, f"أخطاء في الخادم: {result['statuses']}"
+        rows.append((label, result))
+    
+    print(f"\n{'الوضع':<24}{'طلب/ث':>10}{'p50 ms':>10}{'p95 ms':>10}{'إصابات':>10}")
+    for label, result in rows:
+        print(f"{label:<24}{result['requests_per_second']:>10.0f}{result['p50_ms']:>10.2f}"
+              f"{result['p95_ms']:>10.2f}{result['cache_hits']:>10}")
+    return rows
+
+
+def bench_rollups(iterations=50, products=500, sales=300_000, years=3):
+    """تقارير الفترات من جداول التجميع مقابل التجميع المباشر من سجل المبيعات"""
+    import random
+    from datetime import datetime, timedelta
+    
+    daily_raw_query = '''
+        SELECT substr(sale_date, 1, 10), SUM(quantity_sold), SUM(total_price), COUNT(*)
+        FROM sales WHERE sale_date >= ? AND sale_date < ?
+        GROUP BY 1 ORDER BY 1
+    '''
+    top_raw_query = '''
+        SELECT product_id, SUM(total_price) FROM sales
+        GROUP BY product_id ORDER BY 2 DESC, product_id LIMIT 10
+    '''
+    
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        with GroceryStoreManager(os.path.join(tmp, 'bench.db')) as manager:
+            ids = seed_products(manager, products)
+            
+            rng = random.Random(42)
+            first = datetime(2022, 1, 1)
+            span = years * 365 * 24 * 3600
+            rows = []
+            for _ in range(sales):
+                quantity = rng.randint(1, 5)
+                rows.append((rng.choice(ids), quantity, quantity * 2.5,
+                             first + timedelta(seconds=rng.randrange(span))))
+            
+            start = time.perf_counter()
+            with manager.db.writer() as conn:
+                conn.executemany('''
+                    INSERT INTO sales (product_id, quantity_sold, total_price, sale_date)
+                    VALUES (?, ?, ?, ?)
+                ''', rows)
+            insert_seconds = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            manager.rebuild_sales_rollups()
+            rebuild_seconds = time.perf_counter() - start
+            
+            def raw(query, params=()):
+                with manager.db.connection() as conn:
+                    return conn.execute(query, params).fetchall()
+            
+            year = first.year + 1
+            year_range = (f'{year}-01-01', f'{year + 1}-01-01')
+            
+            # التحقق من مطابقة التجميعات للحساب المباشر
+            daily = manager.get_revenue_by_period('day', f'{year}-01-01', f'{year}-12-31')
+            daily_raw = raw(daily_raw_query, year_range)
+            assert len(daily) == len(daily_raw) and all(
+                row.bucket == bucket and row.quantity == quantity and row.sale_count == count
+                and abs(row.revenue - revenue) < 1e-6
+                for row, (bucket, quantity, revenue, count) in zip(daily, daily_raw)
+            ), "تجميع الأيام لا يطابق سجل المبيعات"
+            top = manager.get_top_sellers(10)
+            assert [row.product_id for row in top] == [row[0] for row in raw(top_raw_query)], \
+                "أكثر السلع مبيعاً لا يطابق سجل المبيعات"
+            
+            results = [
+                ('إيراد يومي لسنة (مباشر)', summarize(time_calls(
+                    lambda _: raw(daily_raw_query, year_range), iterations))),
+                ('إيراد يومي لسنة (تجميع)', summarize(time_calls(
+                    lambda _: manager.get_revenue_by_period('day', f'{year}-01-01', f'{year}-12-31'), iterations))),
+                ('إيراد شهري كامل (تجميع)', summarize(time_calls(
+                    lambda _: manager.get_revenue_by_period('month'), iterations))),
+                ('أكثر 10 مبيعاً (مباشر)', summarize(time_calls(
+                    lambda _: raw(top_raw_query), iterations))),
+                ('أكثر 10 مبيعاً (تجميع)', summarize(time_calls(
+                    lambda _: manager.get_top_sellers(10), iterations))),
+                ('حسب الفئة لسنة (تجميع)', summarize(time_calls(
+                    lambda _: manager.get_category_breakdown(f'{year}-01', f'{year}-12'), iterations))),
+            ]
+    
+    print(f"إدخال {sales} بيع مع تحديث التجميعات: {insert_seconds:.2f} ثانية، "
+          f"إعادة البناء من الصفر: {rebuild_seconds:.2f} ثانية")
+    print_table(f"تقارير المبيعات ({sales} بيع على {years} سنوات)", results)
+    return results
+
+
+def bench_lots(iterations=300, products=20_000, lots_per_product=10):
+    """استعلام الدفعات القريبة من الانتهاء والبيع بالصرف حسب الأقرب انتهاءً على عدد كبير من الدفعات"""
+    import random
+    from datetime import date, timedelta
+    
+    today = date.today()
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        with GroceryStoreManager(os.path.join(tmp, 'bench.db')) as manager:
+            rng = random.Random(7)
+            with manager.db.writer() as conn:
+                conn.executemany(
+                    'INSERT INTO products (name, category, price, quantity) VALUES (?, ?, ?, ?)',
+                    [(f"سلعة {i}", f"فئة {i % 10}", 2.5, 100 * lots_per_product) for i in range(products)])
+                conn.executemany('''
+                    INSERT INTO stock_lots (product_id, quantity, expiry_date, received_date)
+                    VALUES (?, ?, ?, ?)
+                ''', [(product_id, 100, (today + timedelta(days=rng.randrange(-30, 720))).isoformat(), today)
+                      for product_id in range(1, products + 1) for _ in range(lots_per_product)])
+            
+            # التحقق من الصرف حسب الأقرب انتهاءً
+            lots = manager.get_product_lots(1)
+            manager.sell_product(1, 150)
+            remaining = manager.get_product_lots(1)
+            assert remaining[0].lot_id == lots[1].lot_id and remaining[0].quantity == 50, "لم تُصرف الدفعة الأقرب انتهاءً"
+            
+            ids = list(range(2, products + 1))
+            results = [
+                ('تنتهي خلال 7 أيام', summarize(time_calls(
+                    lambda _: manager.get_expiring_lots(7, include_expired=False), iterations))),
+                ('تنتهي خلال 7 أيام (أول 50)', summarize(time_calls(
+                    lambda _: manager.get_expiring_lots(7, limit=50), iterations))),
+                ('دفعات سلعة', summarize(time_calls(
+                    lambda i: manager.get_product_lots(ids[i % len(ids)]), iterations))),
+                ('بيع مع صرف الدفعات', summarize(time_calls(
+                    lambda i: manager.sell_product(ids[i % len(ids)], 150), iterations))),
+            ]
+            expiring = len(manager.get_expiring_lots(7, include_expired=False))
+    
+    print_table(f"دفعات المخزون ({products * lots_per_product} دفعة، {expiring} تنتهي خلال 7 أيام)", results)
+    return results
+
+
+def bench_forecast(iterations=5, products=100_000, days=56, workers=4):
+    """محرك إعادة الطلب المتجه على بيانات اصطناعية مقابل حلقة Python لكل سلعة"""
+    import numpy as np
+    from grocery_forecast import ReplenishmentEngine, compute_plan, compute_plan_parallel
+    
+    rng = np.random.default_rng(3)
+    rates = rng.gamma(0.8, 4.0, products)
+    matrix = rng.poisson(rates[:, None], (products, days)).astype(np.float64)
+    stock = rng.integers(0, 200, products).astype(np.float64)
+    min_stock = np.full(products, 5.0)
+    
+    def python_loop(count):
+        # الحساب نفسه (تمهيد أسي + أيام التغطية) بحلقة عادية على جزء من السلع
+        for row, quantity in zip(matrix[:count].tolist(), stock[:count].tolist()):
+            level = row[0]
+            for value in row[1:]:
+                level = 0.3 * value + 0.7 * level
+            cover = quantity / level if level else float('inf')
+    
+    loop_products = min(products, 10_000)
+    loop = summarize(time_calls(lambda _: python_loop(loop_products), 1))
+    for key in ('mean_us', 'p50_us', 'p95_us', 'p99_us'):
+        loop[key] *= products / loop_products
+    loop['ops_per_sec'] *= loop_products / products
+    
+    results = [
+        (f'حلقة Python (مقدّرة)', loop),
+        ('NumPy ewma', summarize(time_calls(
+            lambda _: compute_plan(stock, matrix, min_stock, method='ewma'), iterations))),
+        ('NumPy sma', summarize(time_calls(
+            lambda _: compute_plan(stock, matrix, min_stock, method='sma'), iterations))),
+        (f'NumPy ewma ({workers} عمليات)', summarize(time_calls(
+            lambda _: compute_plan_parallel(stock, matrix, min_stock, workers, method='ewma'), iterations))),
+    ]
+    
+    serial = compute_plan(stock, matrix, min_stock)
+    parallel = compute_plan_parallel(stock, matrix, min_stock, workers)
+    assert all(np.allclose(serial[key], parallel[key]) for key in serial), "نتيجة الحساب الموزع مختلفة"
+    
+    # المسار الكامل من قاعدة البيانات (تحميل جدول التجميع اليومي ثم الحساب)
+    db_products = 5_000
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        with GroceryStoreManager(os.path.join(tmp, 'bench.db')) as manager:
+            today = np.datetime64('today', 'D')
+            with manager.db.writer() as conn:
+                conn.executemany('INSERT INTO products (name, category, price, quantity) VALUES (?, ?, ?, ?)',
+                                 [(f"سلعة {i}", f"فئة {i % 10}", 2.5, int(stock[i])) for i in range(db_products)])
+                conn.executemany('''
+                    INSERT INTO sales_daily (bucket, product_id, category, quantity, revenue, sale_count)
+                    VALUES (?, ?, '', ?, 0, 1)
+                ''', [(str(today - (days - 1 - day)), i + 1, int(matrix[i, day]))
+                      for i in range(db_products) for day in range(days) if matrix[i, day]])
+            
+            engine = ReplenishmentEngine(manager, days=days)
+            results.append((f'من قاعدة البيانات ({db_products} سلعة)', summarize(time_calls(
+                lambda _: engine.suggestions(), iterations))))
+            suggested = len(engine.suggestions())
+    
+    print_table(f"توقع الطلب وإعادة الطلب ({products} سلعة × {days} يوماً)", results)
+    print(f"\nسلع تحتاج إعادة طلب من {db_products}: {suggested}")
+    return results
+
+
+def bench_suite(iterations=300, products=10_000, years=1, sales_per_day=200, seed=42):
+    """حمل قابل للتكرار على قاعدة اصطناعية: إضافة، بيع، بحث، عرض، إحصائيات ونقص مخزون
+    
+    تُولَّد القاعدة بـ grocery_datagen بالبذرة نفسها في كل مرة، وتُنفَّذ القراءات
+    قبل الكتابات بترتيب ثابت حتى تكون النتائج قابلة للمقارنة بين الإصدارات.
+    """
+    import random
+    from datetime import date, timedelta
+    from grocery_datagen import LATIN_WORDS, PRODUCT_WORDS, populate
+    
+    rng = random.Random(seed)
+    terms = [word for words in list(PRODUCT_WORDS.values()) + list(LATIN_WORDS.values()) for word in words]
+    today = date.today()
+    month_ago = (today - timedelta(days=30)).isoformat()
+    
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        with GroceryStoreManager(os.path.join(tmp, 'bench.db')) as manager:
+            start = time.perf_counter()
+            ids, sales = populate(manager, products, years, sales_per_day, seed)
+            setup_seconds = time.perf_counter() - start
+            
+            picks = [rng.choice(ids) for _ in range(iterations)]
+            baskets = [[(rng.choice(ids), 1) for _ in range(5)] for _ in range(iterations)]
+            scans = max(1, iterations // 10)
+            
+            results = [
+                ('get_product', summarize(time_calls(
+                    lambda i: manager.get_product(picks[i]), iterations))),
+                ('search_products', summarize(time_calls(
+                    lambda i: manager.search_products(terms[i % len(terms)], limit=50), iterations))),
+                ('get_products_page', summarize(time_calls(
+                    lambda i: manager.get_products_page(100, after_id=picks[i]), iterations))),
+                ('iter_products (الكل)', summarize(time_calls(
+                    lambda _: list(manager.iter_products()), scans))),
+                ('get_product_stats', summarize(time_calls(
+                    lambda _: manager.get_product_stats(), iterations))),
+                ('iter_low_stock_products', summarize(time_calls(
+                    lambda _: list(manager.iter_low_stock_products()), scans))),
+                ('إيراد يومي لشهر', summarize(time_calls(
+                    lambda _: manager.get_revenue_by_period('day', month_ago, today.isoformat()), iterations))),
+                ('get_top_sellers', summarize(time_calls(
+                    lambda _: manager.get_top_sellers(10), iterations))),
+                ('sell_product', summarize(time_calls(
+                    lambda i: manager.sell_product(picks[i], 1), iterations))),
+                ('sell_many (5 سلع)', summarize(time_calls(
+                    lambda i: manager.sell_many(baskets[i]), iterations))),
+                ('add_product', summarize(time_calls(
+                    lambda i: manager.add_product(f"سلعة جديدة {i}", "ألبان", 3.5, 20), iterations))),
+            ]
+    
+    print(f"\nتوليد {products} سلعة و{sales} بيع ({years} سنة): {setup_seconds:.1f} ثانية")
+    print_table(f"حمل المحل ({products} سلعة، {sales} بيع)", results)
+    return {
+        'params': {'products': products, 'years': years, 'sales_per_day': sales_per_day,
+                   'seed': seed, 'iterations': iterations, 'sales': sales},
+        'setup_seconds': setup_seconds,
+        'results': results,
+    }
+
+
+def bench_metrics(iterations=300, products=2_000):
+    """كلفة القياس على العمليات الساخنة: معطل، أزمنة العمليات فقط، ومع توقيت كل أمر SQL"""
+    modes = [
+        ('القياس معطل', False),
+        ('أزمنة العمليات', {'profile_sql': False}),
+        ('العمليات + SQL', {'profile_sql': True}),
+    ]
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, metrics in modes:
+            with GroceryStoreManager(os.path.join(tmp, f'{len(results)}.db'), metrics=metrics) as manager:
+                ids = seed_products(manager, products)
+                rows = [
+                    ('get_product', summarize(time_calls(
+                        lambda i: manager.get_product(ids[i % len(ids)]), iterations))),
+                    ('sell_product', summarize(time_calls(
+                        lambda i: manager.sell_product(ids[i % len(ids)], 1), iterations))),
+                    ('search_products', summarize(time_calls(
+                        lambda i: manager.search_products(f"سلعة {i % 50}", limit=20), iterations))),
+                    ('get_product_stats', summarize(time_calls(
+                        lambda _: manager.get_product_stats(), iterations))),
+                ]
+                snapshot = manager.get_metrics()
+            results[label] = rows
+            if metrics:
+                assert snapshot['methods']['sell_product']['calls'] == iterations, "لم تُسجل كل الاستدعاءات"
+    
+    for label, rows in results.items():
+        print_table(label, rows)
+    queries = list(snapshot['queries'].items())[:5]
+    print(f"\nأغلى الاستعلامات إجمالاً ({snapshot['counters'].get('sql.statements', 0)} أمر):")
+    for sql, data in queries:
+        print(f"{data['total_ms']:>10.1f} ms {data['calls']:>8}  {sql[:90]}")
+    return results
+
+
+def bench_gui_startup(iterations=5, products=20_000):
+    """زمن أول رسم وزمن جاهزية الواجهة: البدء العادي مقابل البدء السريع (يحتاج شاشة)"""
+    import json
+    from grocery_datagen import populate
+    
+    if sys.platform.startswith('linux') and not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')):
+        print("لا توجد شاشة (DISPLAY)، تم تخطي قياس بدء الواجهة")
+        return []
+    
+    gui = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'grocery_gui.py')
+    runs = max(3, min(iterations, 20))
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        with GroceryStoreManager(db_path) as manager:
+            populate(manager, products, years=0.25, sales_per_day=100)
+        
+        for label, flags in (('البدء العادي', []), ('البدء السريع', ['--fast-start'])):
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                output = subprocess.run(
+                    [sys.executable, gui, '--db', db_path, '--log-level', 'WARNING', '--startup-report'] + flags,
+                    capture_output=True, text=True, check=True).stdout
+                wall_ms = (time.perf_counter() - start) * 1000
+                samples.append(dict(json.loads(output.strip().splitlines()[-1]), wall_ms=wall_ms))
+            rows.append((label, {key: statistics.median(sample[key] for sample in samples)
+                                 for key in ('first_paint_ms', 'ready_ms', 'wall_ms')}))
+    
+    print(f"\n{'الوضع':<16}{'أول رسم ms':>14}{'جاهزية ms':>14}{'حتى الخروج ms':>16}")
+    for label, result in rows:
+        print(f"{label:<16}{result['first_paint_ms']:>14.1f}{result['ready_ms']:>14.1f}{result['wall_ms']:>16.1f}")
+    return rows
+
+
+def bench_journal(iterations=200, products=50_000, changes=5):
+    """مزامنة الذاكرة المؤقتة بعد تعديلات طرفية أخرى: إعادة القراءة الكاملة مقابل سجل التغييرات"""
+    import random
+    
+    rng = random.Random(5)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        with GroceryStoreManager(db_path) as reader, GroceryStoreManager(db_path, cache=False) as terminal:
+            with terminal.db.writer() as conn:
+                conn.executemany('INSERT INTO products (name, category, price, quantity) VALUES (?, ?, ?, ?)',
+                                 [(f"سلعة {i}", f"فئة {i % 25}", 1.5, 1_000_000) for i in range(products)])
+            reader.count_products()
+            
+            for label, journal in (('إعادة قراءة كاملة', False), ('سجل التغييرات', True)):
+                reader.cache.journal = journal
+                reader.cache.invalidate()
+                reader.count_products()
+                latencies = []
+                for _ in range(iterations):
+                    for _ in range(changes):
+                        terminal.sell_product(rng.randrange(1, products + 1), 1)
+                    start = time.perf_counter()
+                    reader.get_product(1)
+                    latencies.append(time.perf_counter() - start)
+                results.append((f'مزامنة ({label})', summarize(latencies)))
+            
+            seq = reader.latest_change_seq()
+            latencies = []
+            for _ in range(iterations):
+                for _ in range(changes):
+                    terminal.sell_product(rng.randrange(1, products + 1), 1)
+                start = time.perf_counter()
+                feed = reader.changes_since(seq)
+                latencies.append(time.perf_counter() - start)
+                assert not feed.more and len(feed.upserts) <= changes and len(feed.sales) == changes
+                seq = feed.seq
+            results.append((f'changes_since ({changes} بيع)', summarize(latencies)))
+            results.append(('get_products_page (نافذة كاملة)', summarize(time_calls(
+                lambda i: reader.get_products_page(100, after_id=i * 97 % products), iterations))))
+            stats = reader.cache.stats()
+    
+    print_table(f"مزامنة {products} سلعة بعد {changes} تغييرات من طرفية أخرى", results)
+    print(f"\nالذاكرة المؤقتة: إعادة قراءة {stats['reloads']}، تحديثات من السجل {stats['deltas']}")
+    return results
+
+
+def bench_barcode(iterations=2000, products=100_000):
+    """مسار المسح والبيع: البحث بالباركود (الذاكرة ثم SQL) مقابل البحث بالاسم، ثم scan_and_sell"""
+    import random
+    
+    rng = random.Random(9)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        with GroceryStoreManager(db_path) as manager, GroceryStoreManager(db_path, cache=False) as uncached:
+            with manager.db.writer() as conn:
+                conn.executemany('INSERT INTO products (name, category, price, quantity) VALUES (?, ?, ?, ?)',
+                                 [(f"سلعة {i}", f"فئة {i % 25}", 1.5, 1_000_000) for i in range(products)])
+                conn.executemany('INSERT INTO product_barcodes (barcode, product_id) VALUES (?, ?)',
+                                 [(f"628{i:010d}", i) for i in range(1, products + 1)])
+            manager.count_products()
+            codes = [f"628{rng.randrange(1, products + 1):010d}" for _ in range(iterations)]
+            
+            def check(row, i):
+                assert row is not None and row.product_id == int(codes[i][3:])
+            
+            results.append(('find_by_barcode (الذاكرة)', summarize(time_calls(
+                lambda i: check(manager.find_by_barcode(codes[i]), i), iterations))))
+            results.append(('find_by_barcode (SQL)', summarize(time_calls(
+                lambda i: check(uncached.find_by_barcode(codes[i]), i), iterations))))
+            results.append(('search_products (الاسم)', summarize(time_calls(
+                lambda i: manager.search_products(f"سلعة {int(codes[i][3:]) - 1}", limit=1),
+                iterations // 10))))
+            results.append(('scan_and_sell', summarize(time_calls(
+                lambda i: check(manager.scan_and_sell(codes[i]), i), iterations))))
+            results.append(('sell_product (بالرقم)', summarize(time_calls(
+                lambda i: manager.sell_product(int(codes[i][3:]), 1), iterations))))
+            stats = manager.cache.stats()
+    
+    print_table(f"مسح الباركود في {products} سلعة", results)
+    print(f"\nالذاكرة المؤقتة: {stats['barcodes']} باركود، إعادة قراءة {stats['reloads']}")
+    return results
+
+
+def bench_replica(iterations=300, products=20_000, years=1, sales_per_day=300, seed=42):
+    """زمن البيع أثناء تشغيل تقارير ثقيلة في خيط آخر: التقارير على القاعدة الأصلية مقابل النسخة المتماثلة"""
+    import random
+    import threading
+    from grocery_datagen import populate
+    
+    rng = random.Random(seed)
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        with GroceryStoreManager(db_path) as manager:
+            ids, _ = populate(manager, products, years, sales_per_day, seed)
+        picks = [rng.choice(ids) for _ in range(iterations)]
+        
+        def reports(manager, stop, counts):
+            while not stop.is_set():
+                manager.get_all_products()
+                manager.get_product_stats()
+                manager.get_top_sellers(20)
+                manager.get_category_breakdown()
+                manager.get_low_stock_products()
+                manager.search_products('حليب')
+                counts[0] += 1
+        
+        for label, replica in (('التقارير على القاعدة الأصلية', None),
+                               ('التقارير على النسخة المتماثلة', {'interval': 0.5, 'max_lag': 5})):
+            with GroceryStoreManager(db_path, replica=replica) as manager:
+                if replica:
+                    manager.replica.refresh()
+                stop = threading.Event()
+                counts = [0]
+                thread = threading.Thread(target=reports, args=(manager, stop, counts))
+                thread.start()
+                try:
+                    latencies = time_calls(lambda i: manager.sell_product(picks[i], 1), iterations)
+                finally:
+                    stop.set()
+                    thread.join()
+                results.append((f'sell_product ({label})', summarize(latencies)))
+                if replica:
+                    status = manager.replica.status()
+                    print(f"النسخة المتماثلة: {status['snapshots']} لقطة، آخر نسخ {status['last_copy_ms']:.0f} ms "
+                          f"في {status['last_steps']} خطوة، عمرها {status['lag_seconds']:.2f} ث، "
+                          f"قراءات موجهة {status['routed']} وعلى الأصل {status['fallbacks']}")
+                print(f"{label}: {counts[0]} دورة تقارير")
+        
+        with sqlite3.connect(db_path) as conn:
+            pages = conn.execute('PRAGMA page_count').fetchall()[0][0]
+    
+    print_table(f"البيع أثناء التقارير ({products} سلعة، {pages} صفحة)", results)
+    return results
+
+
+def bench_chain(iterations=20, products=5_000, years=0.25, sales_per_day=200, seed=42, max_branches=8):
+    """استعلامات السلسلة مع زيادة عدد الفروع: زمن الدمج الكلي وزمن أبطأ فرع، بالخيوط وبالعمليات"""
+    from grocery_chain import ChainStoreCoordinator
+    from grocery_datagen import populate
+    
+    counts = [count for count in (1, 2, 4, 8, 16) if count <= max_branches]
+    queries = {
+        'get_chain_stats': lambda chain: chain.get_chain_stats(),
+        'get_low_stock_products': lambda chain: chain.get_low_stock_products(),
+        'search_products': lambda chain: chain.search_products('حليب'),
+        'get_top_sellers': lambda chain: chain.get_top_sellers(20),
+    }
+    query_methods = {
+        'get_chain_stats': 'get_product_stats',
+        'get_low_stock_products': 'iter_low_stock_products',
+        'search_products': 'iter_search_results',
+        'get_top_sellers': 'get_top_sellers',
+    }
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = {}
+        with contextlib.redirect_stdout(io.StringIO()):
+            for index in range(counts[-1]):
+                paths[f'branch{index}'] = os.path.join(tmp, f'branch{index}.db')
+                with GroceryStoreManager(paths[f'branch{index}']) as manager:
+                    populate(manager, products, years, sales_per_day, seed + index)
+        
+        for executor in ('thread', 'process'):
+            for count in counts:
+                branches = dict(list(paths.items())[:count])
+                with ChainStoreCoordinator(branches, executor=executor) as chain:
+                    for query in queries.values():
+                        query(chain)  # تحميل الذاكرة المؤقتة وفتح الاتصالات في العمليات
+                    chain.metrics.reset()
+                    for name, query in queries.items():
+                        latencies = time_calls(lambda i: query(chain), iterations)
+                        shards = chain.shard_latency()
+                        slowest = max(shards[branch, query_methods[name]]['mean_us'] for branch in branches)
+                        results.append((f'{name} ({executor}، {count} فرع، أبطأ فرع {slowest / 1e3:.1f} ms)',
+                                        summarize(latencies)))
+    
+    print_table(f"استعلامات السلسلة ({products} سلعة لكل فرع، {os.cpu_count()} نواة)", results)
+    return results
+
+
+def bench_async(iterations=2000, products=20_000, clients=50, threads=8):
+    """طلبات متزامنة مختلطة (قراءة 70%، بيع 20%، بحث 10%): الواجهة المتزامنة مقابل AsyncGroceryStoreManager
+    
+    يُقاس أيضاً تأخر حلقة الأحداث (مؤقت كل 1 ms) عند استدعاء المدير المتزامن
+    مباشرة من الكوروتينات مقارنة بالواجهة async.
+    """
+    import asyncio
+    import itertools
+    import random
+    from concurrent.futures import ThreadPoolExecutor
+    from grocery_async import AsyncGroceryStoreManager
+    
+    rng = random.Random(11)
+    picks = [rng.randrange(1, products + 1) for _ in range(iterations)]
+    terms = ['سلعة 1', 'فئة 3', 'سلعة 42', 'فئة 7']
+    
+    def sync_request(manager, i):
+        kind = i % 10
+        if kind < 7:
+            return manager.get_product(picks[i])
+        if kind < 9:
+            return manager.sell_product(picks[i], 1)
+        return manager.search_products(terms[i % len(terms)], limit=20)
+    
+    async def async_request(store, i):
+        kind = i % 10
+        if kind < 7:
+            return await store.get_product(picks[i])
+        if kind < 9:
+            return await store.sell_product(picks[i], 1)
+        return await store.search_products(terms[i % len(terms)], limit=20)
+    
+    async def run_clients(request):
+        """clients كوروتين تتقاسم الطلبات، مع مؤقت يقيس تأخر حلقة الأحداث"""
+        latencies = [0.0] * iterations
+        lags = []
+        done = asyncio.Event()
+        counter = itertools.count()
+        
+        async def ticker():
+            while not done.is_set():
+                start = time.perf_counter()
+                await asyncio.sleep(0.001)
+                lags.append(time.perf_counter() - start - 0.001)
+        
+        async def client():
+            for i in iter(lambda: next(counter), None):
+                if i >= iterations:
+                    return
+                start = time.perf_counter()
+                await request(i)
+                latencies[i] = time.perf_counter() - start
+        
+        tick = asyncio.create_task(ticker())
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(clients)))
+        elapsed = time.perf_counter() - start
+        done.set()
+        await tick
+        return latencies, elapsed, lags
+    
+    async def sync_in_loop(manager):
+        async def request(i):
+            return sync_request(manager, i)
+        return await run_clients(request)
+    
+    async def async_api(manager):
+        store = AsyncGroceryStoreManager(manager, readers=4, max_pending=max(1, clients // 2))
+        try:
+            return await run_clients(lambda i: async_request(store, i)) + (store.stats(),)
+        finally:
+            await store.close()
+    
+    results = []
+    throughput = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'bench.db')
+        with GroceryStoreManager(db_path) as manager:
+            with manager.db.writer() as conn:
+                conn.executemany('INSERT INTO products (name, category, price, quantity) VALUES (?, ?, ?, ?)',
+                                 [(f"سلعة {i}", f"فئة {i % 25}", 1.5, 1_000_000) for i in range(products)])
+            manager.count_products()
+            
+            start = time.perf_counter()
+            latencies = time_calls(lambda i: sync_request(manager, i), iterations)
+            throughput.append(('متزامن (تسلسلي)', time.perf_counter() - start, None))
+            results.append(('متزامن (تسلسلي)', summarize(latencies)))
+            
+            with ThreadPoolExecutor(threads) as pool:
+                def timed_request(i):
+                    start = time.perf_counter()
+                    sync_request(manager, i)
+                    return time.perf_counter() - start
+                start = time.perf_counter()
+                latencies = list(pool.map(timed_request, range(iterations)))
+                throughput.append((f'متزامن ({threads} خيوط)', time.perf_counter() - start, None))
+            results.append((f'متزامن ({threads} خيوط)', summarize(latencies)))
+            
+            latencies, elapsed, lags = asyncio.run(sync_in_loop(manager))
+            throughput.append((f'متزامن داخل asyncio ({clients} عميل)', elapsed, lags))
+            results.append((f'متزامن داخل asyncio ({clients} عميل)', summarize(latencies)))
+            
+            latencies, elapsed, lags, stats = asyncio.run(async_api(manager))
+            throughput.append((f'AsyncGroceryStoreManager ({clients} عميل)', elapsed, lags))
+            results.append((f'AsyncGroceryStoreManager ({clients} عميل)', summarize(latencies)))
+    
+    print_table(f"{iterations} طلب مختلط على {products} سلعة", results)
+    print()
+    for label, elapsed, lags in throughput:
+        line = f"{label}: {iterations / elapsed:.0f} طلب/ث"
+        if lags:
+            lags.sort()
+            line += (f"، تأخر حلقة الأحداث p50 {lags[len(lags) // 2] * 1e3:.2f} ms "
+                     f"والأقصى {lags[-1] * 1e3:.2f} ms ({len(lags)} نبضة)")
+        print(line)
+    print(f"الضغط العكسي: أقصى طلبات جارية {stats['max_in_flight']} من {stats['max_pending']}، "
+          f"انتظر دوره {stats['waited']} طلب")
+    return results
+
+
+SCENARIOS = {
+    'connections': bench_connections,
+    'bulk_import': bench_bulk_import,
+    'rows': bench_rows,
+    'cache': bench_cache,
+    'stress': bench_stress,
+    'write_behind': bench_write_behind,
+    'server': bench_server,
+    'rollups': bench_rollups,
+    'lots': bench_lots,
+    'forecast': bench_forecast,
+    'suite': bench_suite,
+    'metrics': bench_metrics,
+    'gui_startup': bench_gui_startup,
+    'journal': bench_journal,
+    'barcode': bench_barcode,
+    'replica': bench_replica,
+    'chain': bench_chain,
+    'async': bench_async,
+}
+
+
+def _environment():
+    """بيانات الإصدار والبيئة المحفوظة مع النتائج"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def _result_rows(result):
+    """صفوف (الاسم، الملخص) من نتيجة سيناريو إن كانت بهذا الشكل"""
+    if isinstance(result, dict):
+        result = result.get('results', ())
+    return {name: summary for name, summary in result
+            if isinstance(name, str) and isinstance(summary, dict) and 'p50_us' in summary}
+
+
+def compare_results(current, baseline):
+    """مقارنة p50 و p95 لكل عملية مع نتيجة سابقة محفوظة (النسبة > 1 تعني تراجعاً)"""
+    rows = _result_rows(current)
+    old_rows = _result_rows(baseline)
+    print(f"\n{'العملية':<28}{'p50 السابق':>12}{'p50 الحالي':>12}{'النسبة':>10}{'p95 النسبة':>12}")
+    for name, summary in rows.items():
+        old = old_rows.get(name)
+        if old is None:
+            continue
+        ratio = summary['p50_us'] / old['p50_us'] if old['p50_us'] else float('inf')
+        ratio95 = summary['p95_us'] / old['p95_us'] if old['p95_us'] else float('inf')
+        print(f"{name:<28}{old['p50_us']:>12.1f}{summary['p50_us']:>12.1f}{ratio:>10.2f}{ratio95:>12.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="قياس أداء مدير محل المواد الغذائية")
+    parser.add_argument('scenario', choices=sorted(SCENARIOS), help="السيناريو المطلوب قياسه")
+    parser.add_argument('--iterations', type=int, default=300, help="عدد الاستدعاءات لكل عملية")
+    parser.add_argument('--products', type=int, help="عدد السلع (للسيناريوهات التي تدعمه)")
+    parser.add_argument('--years', type=float, help="سنوات المبيعات المولّدة (سيناريو suite)")
+    parser.add_argument('--seed', type=int, help="بذرة توليد البيانات (سيناريو suite)")
+    parser.add_argument('--json', metavar='PATH', help="حفظ النتائج في ملف JSON")
+    parser.add_argument('--baseline', metavar='PATH', help="مقارنة النتائج بملف JSON سابق")
+    args = parser.parse_args(argv)
+    
+    scenario = SCENARIOS[args.scenario]
+    accepted = inspect.signature(scenario).parameters
+    options = {name: value for name, value in
+               (('products', args.products), ('years', args.years), ('seed', args.seed))
+               if value is not None and name in accepted}
+    result = scenario(iterations=args.iterations, **options)
+    
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            compare_results(result, json.load(f)['results'])
+    if args.json:
+        report = {'scenario': args.scenario, 'environment': _environment(),
+                  'options': dict(options, iterations=args.iterations), 'results': result}
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2, default=str)
+        print(f"\nحُفظت النتائج في {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,325 @@
+# grocery_bulk.py - استيراد وتصدير السلع بكميات كبيرة (CSV / Parquet)
+import argparse
+import csv
+import os
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+
+from grocery_manager import GroceryStoreManager
+from grocery_metrics import configure_logging, logger
+
+PRODUCT_COLUMNS = ['product_id', 'name', 'category', 'price', 'quantity',
+                   'sold_quantity', 'min_stock_level', 'expiry_date']
+
+EXPORT_QUERIES = {
+    'products': '''
+        SELECT product_id, name, category, price, quantity, sold_quantity,
+               min_stock_level, expiry_date, created_date, last_updated
+        FROM products
+        ORDER BY product_id
+    ''',
+    'sales': '''
+        SELECT sale_id, product_id, quantity_sold, sale_date, total_price
+        FROM sales
+        ORDER BY sale_id
+    ''',
+}
+
+# الإعدادات المؤقتة أثناء التحميل السريع
+FAST_LOAD_PRAGMAS = {
+    'synchronous': 'OFF',
+    'cache_size': '-200000',
+    'temp_store': 'MEMORY',
+}
+
+
+def _file_format(path, file_format=None):
+    """تحديد صيغة الملف من الامتداد إذا لم تُحدد"""
+    if file_format:
+        return file_format.lower()
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.parquet', '.pq'):
+        return 'parquet'
+    return 'csv'
+
+
+def _require_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("دعم Parquet يتطلب تثبيت مكتبة pyarrow: pip install pyarrow")
+    return pyarrow
+
+
+def _parquet_schema(pyarrow, table):
+    """مخطط Parquet ثابت لكل جدول حتى لا يختلف نوع العمود بين الدفعات"""
+    types = {
+        'products': [
+            ('product_id', pyarrow.int64()), ('name', pyarrow.string()), ('category', pyarrow.string()),
+            ('price', pyarrow.float64()), ('quantity', pyarrow.int64()), ('sold_quantity', pyarrow.int64()),
+            ('min_stock_level', pyarrow.int64()), ('expiry_date', pyarrow.string()),
+            ('created_date', pyarrow.string()), ('last_updated', pyarrow.string()),
+        ],
+        'sales': [
+            ('sale_id', pyarrow.int64()), ('product_id', pyarrow.int64()), ('quantity_sold', pyarrow.int64()),
+            ('sale_date', pyarrow.string()), ('total_price', pyarrow.float64()),
+        ],
+    }
+    return pyarrow.schema(types[table])
+
+
+def iter_chunks(path, chunksize=50_000, file_format=None):
+    """قراءة ملف السلع على دفعات دون تحميله كاملاً في الذاكرة"""
+    if _file_format(path, file_format) == 'parquet':
+        pyarrow = _require_pyarrow()
+        parquet_file = pyarrow.parquet.ParquetFile(path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize, dtype={'name': str, 'category': str, 'expiry_date': str})
+
+
+def validate_chunk(df):
+    """التحقق من دفعة سلع بعمليات متجهة
+    
+    تعيد (الدفعة الصالحة بأعمدة PRODUCT_COLUMNS، عدد الصفوف المرفوضة).
+    """
+    missing = {'name', 'category', 'price', 'quantity'} - set(df.columns)
+    if missing:
+        raise ValueError(f"أعمدة مطلوبة غير موجودة في الملف: {', '.join(sorted(missing))}")
+    
+    df = df.reindex(columns=PRODUCT_COLUMNS)
+    
+    # رقم سلعة مكتوب لكنه ليس عدداً صحيحاً يُرفض، ولا يُعامل كسلعة جديدة أو يُقتطع
+    has_id = df['product_id'].notna()
+    
+    df['name'] = df['name'].astype('string').str.strip()
+    df['category'] = df['category'].astype('string').str.strip()
+    for column in ('product_id', 'price', 'quantity', 'sold_quantity', 'min_stock_level'):
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    
+    df['sold_quantity'] = df['sold_quantity'].fillna(0)
+    df['min_stock_level'] = df['min_stock_level'].fillna(5)
+    
+    valid = (
+        (~has_id | ((df['product_id'] > 0) & (df['product_id'] % 1 == 0))) &
+        df['name'].notna() & (df['name'] != '') &
+        df['category'].notna() & (df['category'] != '') &
+        df['price'].notna() & (df['price'] >= 0) &
+        df['quantity'].notna() & (df['quantity'] >= 0) &
+        (df['quantity'] % 1 == 0) &
+        (df['sold_quantity'] >= 0) & (df['min_stock_level'] >= 0)
+    ).fillna(False).astype(bool)
+    
+    rejected = int((~valid).sum())
+    df = df[valid]
+    
+    df = df.astype({'quantity': 'int64', 'sold_quantity': 'int64', 'min_stock_level': 'int64', 'price': 'float64'})
+    return df, rejected
+
+
+def _records(df, now):
+    """تحويل الدفعة إلى صفوف جاهزة لـ executemany (القيم المفقودة تصبح NULL)"""
+    df = df.astype(object).where(df.notna(), None)
+    for row in df.itertuples(index=False, name=None):
+        product_id = int(row[0]) if row[0] is not None else None
+        yield (product_id,) + row[1:] + (now,)
+
+
+@contextmanager
+def fast_load_pragmas(manager, enabled=True):
+    """تطبيق إعدادات التحميل السريع مؤقتاً على اتصال الكتابة ثم استعادة القيم السابقة"""
+    if not enabled:
+        yield
+        return
+    
+    with manager.db.writer(immediate=False) as conn:
+        previous = {name: conn.execute(f'PRAGMA {name}').fetchall()[0][0] for name in FAST_LOAD_PRAGMAS}
+        for name, value in FAST_LOAD_PRAGMAS.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+    try:
+        yield
+    finally:
+        with manager.db.writer(immediate=False) as conn:
+            for name, value in previous.items():
+                conn.execute(f'PRAGMA {name} = {value}')
+
+
+def _drop_deleted_ids(conn, df):
+    """استبعاد صفوف تحمل رقم سلعة محذوفة (حذفاً ناعماً)
+    
+    استيرادها كان سيكرر الرقم في product_catalog ويمنع استعادة السلعة المحذوفة.
+    تعيد (الدفعة بدون هذه الصفوف، عددها).
+    """
+    ids = df['product_id'].dropna().astype('int64').tolist()
+    deleted = set()
+    for i in range(0, len(ids), 500):
+        batch = ids[i:i + 500]
+        placeholders = ', '.join('?' * len(batch))
+        deleted.update(row[0] for row in conn.execute(
+            f'SELECT product_id FROM deleted_products WHERE product_id IN ({placeholders})', batch))
+    if not deleted:
+        return df, 0
+    
+    logger.warning("تم رفض %s صف برقم سلعة محذوفة (استعدها بـ restore_product أولاً)", len(deleted))
+    tombstoned = df['product_id'].isin(deleted)
+    return df[~tombstoned], int(tombstoned.sum())
+
+
+def _add_import_lots(conn, product_ids, last_id, now):
+    """دفعة مخزون لكل سلعة في الدفعة المستوردة كميتها أكبر من مجموع دفعاتها الحالية
+    
+    السلع المعنية: أرقام الصفوف المحدّثة والسلع المضافة بعد last_id.
+    """
+    conn.execute('CREATE TEMP TABLE IF NOT EXISTS import_ids (product_id INTEGER PRIMARY KEY)')
+    conn.executemany('INSERT OR IGNORE INTO temp.import_ids VALUES (?)', [(pid,) for pid in product_ids])
+    conn.execute('INSERT OR IGNORE INTO temp.import_ids SELECT product_id FROM products WHERE product_id > ?',
+                 (last_id,))
+    conn.execute('''
+        INSERT INTO stock_lots (product_id, quantity, expiry_date, received_date)
+        SELECT product_id, quantity - in_lots,
+               CASE WHEN expiry_date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'
+                    THEN substr(expiry_date, 1, 10) END,
+               ?
+        FROM (
+            SELECT p.product_id, p.quantity, p.expiry_date,
+                   (SELECT IFNULL(SUM(l.quantity), 0) FROM stock_lots l
+                    WHERE l.product_id = p.product_id AND l.quantity > 0) AS in_lots
+            FROM temp.import_ids i
+            JOIN products p ON p.product_id = i.product_id
+        )
+        WHERE quantity > in_lots
+    ''', (now,))
+    conn.execute('DELETE FROM temp.import_ids')
+
+
+def import_products(manager, path, chunksize=50_000, file_format=None, fast=False):
+    """استيراد السلع من ملف CSV أو Parquet على دفعات
+    
+    الصفوف التي تحمل product_id موجوداً تُحدّث (upsert)، والبقية تُضاف كسلع جديدة.
+    الصفوف التي تحمل رقم سلعة محذوفة تُرفض، فالاستعادة تتم بـ restore_product.
+    كل دفعة تُكتب بـ executemany ضمن معاملة واحدة على اتصال الكتابة المشترك
+    (BEGIN IMMEDIATE مع إعادة المحاولة)، فلا تتعارض مع كتابات المدير الأخرى.
+    
+    المخزون المستورد الزائد عن دفعات السلعة الحالية يُسجّل دفعة جديدة بتاريخ
+    انتهاء الصف، فيبقى الصرف حسب الأقرب انتهاءً (FEFO) صحيحاً للسلع المستوردة؛
+    ونقص الكمية يُصرف من الدفعات عبر مشغل stock_lots_fefo كالمعتاد.
+    """
+    upsert_query = '''
+        INSERT INTO products (product_id, name, category, price, quantity,
+                              sold_quantity, min_stock_level, expiry_date, last_updated)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(product_id) DO UPDATE SET
+            name = excluded.name,
+            category = excluded.category,
+            price = excluded.price,
+            quantity = excluded.quantity,
+            sold_quantity = excluded.sold_quantity,
+            min_stock_level = excluded.min_stock_level,
+            expiry_date = excluded.expiry_date,
+            last_updated = excluded.last_updated
+    '''
+    
+    summary = {'imported': 0, 'rejected': 0, 'chunks': 0, 'seconds': 0.0}
+    start = time.perf_counter()
+    
+    with fast_load_pragmas(manager, fast):
+        for chunk in iter_chunks(path, chunksize, file_format):
+            valid, rejected = validate_chunk(chunk)
+            now = datetime.now()
+            with manager.db.writer() as conn:
+                valid, tombstoned = _drop_deleted_ids(conn, valid)
+                rejected += tombstoned
+                last_id = conn.execute('SELECT IFNULL(MAX(product_id), 0) FROM products').fetchall()[0][0]
+                conn.executemany(upsert_query, _records(valid, now))
+                _add_import_lots(conn, valid['product_id'].dropna().astype('int64').tolist(), last_id, now)
+            summary['imported'] += len(valid)
+            summary['rejected'] += rejected
+            summary['chunks'] += 1
+    
+    manager.sync_search_index()
+    
+    # الكتابة تمت على اتصال الكتابة نفسه فلا يتغير data_version الذي تراقبه الذاكرة المؤقتة
+    if manager.cache is not None:
+        manager.cache.invalidate()
+    
+    summary['seconds'] = time.perf_counter() - start
+    logger.info("تم استيراد %s سلعة (مرفوض: %s) في %.2f ثانية",
+                summary['imported'], summary['rejected'], summary['seconds'])
+    return summary
+
+
+def export_table(manager, table, path, chunksize=50_000, file_format=None):
+    """تصدير جدول products أو sales إلى ملف على دفعات بذاكرة ثابتة"""
+    if table not in EXPORT_QUERIES:
+        raise ValueError(f"جدول غير مدعوم للتصدير: {table}")
+    
+    file_format = _file_format(path, file_format)
+    rows_written = 0
+    
+    # اتصال الخيط داخل connection() حتى يُغلق بعد التصدير إذا لم تكن الاتصالات دائمة
+    with manager.db.connection() as conn:
+        cursor = conn.execute(EXPORT_QUERIES[table])
+        columns = [description[0] for description in cursor.description]
+        
+        if file_format == 'parquet':
+            pyarrow = _require_pyarrow()
+            schema = _parquet_schema(pyarrow, table)
+            with pyarrow.parquet.ParquetWriter(path, schema, compression='zstd') as writer:
+                while True:
+                    rows = cursor.fetchmany(chunksize)
+                    if not rows:
+                        break
+                    writer.write_table(pyarrow.Table.from_pylist([dict(zip(columns, row)) for row in rows], schema=schema))
+                    rows_written += len(rows)
+        else:
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                writer.writerow(columns)
+                while True:
+                    rows = cursor.fetchmany(chunksize)
+                    if not rows:
+                        break
+                    writer.writerows(rows)
+                    rows_written += len(rows)
+        
+        cursor.close()
+    
+    logger.info("تم تصدير %s صف من جدول %s إلى %s", rows_written, table, path)
+    return rows_written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="استيراد وتصدير بيانات محل المواد الغذائية")
+    parser.add_argument('--db', default='grocery_store.db', help="ملف قاعدة البيانات")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    import_parser = subparsers.add_parser('import', help="استيراد السلع من ملف CSV أو Parquet")
+    import_parser.add_argument('path')
+    import_parser.add_argument('--chunksize', type=int, default=50_000)
+    import_parser.add_argument('--format', choices=['csv', 'parquet'])
+    import_parser.add_argument('--fast', action='store_true',
+                               help="تعطيل المزامنة مؤقتاً أثناء التحميل (أسرع وأقل أماناً عند انقطاع الكهرباء)")
+    
+    export_parser = subparsers.add_parser('export', help="تصدير جدول إلى ملف CSV أو Parquet")
+    export_parser.add_argument('table', choices=sorted(EXPORT_QUERIES))
+    export_parser.add_argument('path')
+    export_parser.add_argument('--chunksize', type=int, default=50_000)
+    export_parser.add_argument('--format', choices=['csv', 'parquet'])
+    
+    args = parser.parse_args(argv)
+    configure_logging()
+    
+    with GroceryStoreManager(args.db) as manager:
+        if args.command == 'import':
+            import_products(manager, args.path, args.chunksize, args.format, args.fast)
+        else:
+            export_table(manager, args.table, args.path, args.chunksize, args.format)
+
+
+if __name__ == "__main__":
+    main()
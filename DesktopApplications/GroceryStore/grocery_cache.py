@@ -0,0 +1,260 @@
+# grocery_cache.py - نسخة في الذاكرة من جدول السلع
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class ProductCache:
+    """ذاكرة مؤقتة للسلع داخل العملية مع فهارس ثانوية حسب الفئة وحالة المخزون
+    
+    تُحمّل السلع كاملة عند أول قراءة، ثم تُحدَّث مباشرة بعد كل كتابة يجريها
+    المدير (write-through) بإعادة قراءة الصفوف المتأثرة فقط.
+    
+    مع journal=True يُقرأ آخر رقم في سجل التغييرات (change_journal) على اتصال
+    الخيط المستدعي قبل كل قراءة من الذاكرة، دون قفل الكتابة، فتتوازى القراءات
+    من عدة خيوط. إذا زاد الرقم عما طبّقته الذاكرة تُقرأ السلع المتغيرة من السجل
+    وتُحدّث وحدها، ولا تُعاد القراءة الكاملة إلا إذا زادت التغييرات عن
+    max_delta أو قُصّ السجل بعد آخر رقم قرأته الذاكرة.
+    
+    بدون السجل تُقرأ قيمة PRAGMA data_version على اتصال الكتابة المشترك (تحت
+    قفله)؛ تغيّرها يعني أن اتصالاً آخر عدّل قاعدة البيانات، فتُعاد القراءة الكاملة.
+    
+    قفل الذاكرة (_lock) يحمي القواميس فقط: يُمسك أثناء قراءتها وأثناء تحديثها.
+    
+    مع barcodes=True تُحمّل رموز الباركود أيضاً في قاموس (رمز -> سلعة) لمسار
+    المسح والبيع، وتُحدّث مع صفوف سلعها.
+    """
+    
+    def __init__(self, db, query, row_factory, journal=False, max_delta=2000, barcodes=False):
+        self.db = db
+        self.query = query
+        self.row_factory = row_factory
+        self.journal = journal
+        self.max_delta = max_delta
+        self.barcodes = barcodes
+        
+        self._rows = {}                       # رقم السلعة -> الصف
+        self._by_category = defaultdict(set)  # الفئة -> أرقام السلع
+        self._by_status = defaultdict(set)    # حالة المخزون -> أرقام السلع
+        self._barcodes = {}                   # الباركود -> رقم السلعة
+        self._product_barcodes = defaultdict(set)  # رقم السلعة -> رموزها
+        self._data_version = None
+        self._journal_seq = 0
+        self._loaded = False
+        self._ordered = True                  # هل ترتيب القاموس مطابق لترتيب الأرقام
+        self._lock = threading.RLock()
+        
+        self.hits = 0
+        self.reloads = 0
+        self.invalidations = 0
+        self.deltas = 0
+    
+    def _index(self, row):
+        old = self._rows.get(row.product_id)
+        if old is not None:
+            self._by_category[old.category].discard(row.product_id)
+            self._by_status[old.status].discard(row.product_id)
+        elif self._rows and row.product_id < next(reversed(self._rows)):
+            self._ordered = False
+        
+        # الإسناد لمفتاح موجود يحافظ على موضعه في القاموس
+        self._rows[row.product_id] = row
+        self._by_category[row.category].add(row.product_id)
+        self._by_status[row.status].add(row.product_id)
+    
+    def _unindex(self, product_id):
+        row = self._rows.pop(product_id, None)
+        if row is None:
+            return
+        self._by_category[row.category].discard(product_id)
+        if not self._by_category[row.category]:
+            del self._by_category[row.category]
+        self._by_status[row.status].discard(product_id)
+    
+    def _index_barcodes(self, conn, product_ids=None):
+        """قراءة رموز كل السلع أو سلع محددة (بعد إسقاط رموزها القديمة)"""
+        if product_ids is None:
+            rows = conn.execute('SELECT barcode, product_id FROM product_barcodes').fetchall()
+        else:
+            for product_id in product_ids:
+                for barcode in self._product_barcodes.pop(product_id, ()):
+                    # الرمز قد يكون نُقل لسلعة أخرى قُرئت قبل هذه
+                    if self._barcodes.get(barcode) == product_id:
+                        del self._barcodes[barcode]
+            placeholders = ', '.join('?' * len(product_ids))
+            rows = conn.execute(f'SELECT barcode, product_id FROM product_barcodes WHERE product_id IN ({placeholders})',
+                                product_ids).fetchall()
+        
+        for barcode, product_id in rows:
+            old = self._barcodes.get(barcode)
+            if old is not None and old != product_id:
+                self._product_barcodes[old].discard(barcode)
+            self._barcodes[barcode] = product_id
+            self._product_barcodes[product_id].add(barcode)
+    
+    def _select(self, conn, where='', params=()):
+        cursor = conn.cursor()
+        cursor.row_factory = self.row_factory
+        return cursor.execute(self.query + where, params).fetchall()
+    
+    @contextmanager
+    def _fresh(self):
+        """سياق قراءة من الذاكرة بعد التحقق من حداثتها، مع إمساك قفل الذاكرة"""
+        if not self.journal:
+            with self.db.writer(immediate=False) as conn, self._lock:
+                self._ensure_fresh(conn)
+                yield
+            return
+        
+        with self.db.connection() as conn:
+            # الرقم لا ينقص، فالرقم الأقدم مما طُبّق (لقطة قراءة أقدم) لا يحمل جديداً
+            seq = conn.execute('SELECT IFNULL(MAX(seq), 0) FROM change_journal').fetchall()[0][0]
+            with self._lock:
+                if self._loaded and seq <= self._journal_seq:
+                    self.hits += 1
+                else:
+                    self._catch_up(conn)
+                yield
+    
+    def _catch_up(self, conn):
+        """تطبيق التغييرات الجديدة في السجل، أو إعادة التحميل الكامل إذا تعذر ذلك"""
+        if self._loaded:
+            self.invalidations += 1
+            if self._apply_journal(conn):
+                self.deltas += 1
+                return
+        self._load(conn)
+    
+    def _ensure_fresh(self, conn):
+        """التحقق من عدم تعديل قاعدة البيانات من اتصال آخر وإعادة التحميل عند الحاجة (بدون السجل)"""
+        data_version = conn.execute('PRAGMA data_version').fetchall()[0][0]
+        if self._loaded and data_version == self._data_version:
+            self.hits += 1
+            return
+        
+        if self._loaded:
+            self.invalidations += 1
+        self._load(conn)
+        self._data_version = data_version
+    
+    def _load(self, conn):
+        """قراءة كل السلع (ورموزها) من جديد"""
+        # ما يُكتب بعد قراءة الرقم يظهر في السجل لاحقاً ويُعاد تطبيقه دون ضرر
+        if self.journal:
+            self._journal_seq = conn.execute(
+                'SELECT IFNULL(MAX(seq), 0) FROM change_journal').fetchall()[0][0]
+        
+        self._rows.clear()
+        self._by_category.clear()
+        self._by_status.clear()
+        self._ordered = True
+        for row in self._select(conn, ' ORDER BY p.product_id'):
+            self._index(row)
+        if self.barcodes:
+            self._barcodes.clear()
+            self._product_barcodes.clear()
+            self._index_barcodes(conn)
+        
+        self._loaded = True
+        self.reloads += 1
+    
+    def _apply_journal(self, conn):
+        """تحديث السلع المتغيرة منذ آخر رقم مقروء من السجل؛ False إذا لزمت إعادة القراءة الكاملة"""
+        first = conn.execute('SELECT MIN(seq) FROM change_journal').fetchall()[0][0]
+        if first is not None and self._journal_seq + 1 < first:
+            return False
+        
+        entries = conn.execute('''
+            SELECT seq, table_name, row_id FROM change_journal WHERE seq > ? ORDER BY seq LIMIT ?
+        ''', (self._journal_seq, self.max_delta + 1)).fetchall()
+        if len(entries) > self.max_delta:
+            return False
+        if not entries:
+            return True
+        
+        product_ids = list({row_id for _, table_name, row_id in entries if table_name == 'products'})
+        if product_ids:
+            self._reload_rows(conn, product_ids)
+        self._journal_seq = entries[-1][0]
+        return True
+    
+    def _reload_rows(self, conn, product_ids):
+        placeholders = ', '.join('?' * len(product_ids))
+        rows = self._select(conn, f' WHERE p.product_id IN ({placeholders})', product_ids)
+        
+        found = set()
+        for row in rows:
+            self._index(row)
+            found.add(row.product_id)
+        for product_id in product_ids:
+            if product_id not in found:
+                self._unindex(product_id)
+        if self.barcodes:
+            self._index_barcodes(conn, product_ids)
+    
+    def refresh(self, product_ids):
+        """إعادة قراءة سلع محددة بعد كتابتها (تُحذف من الذاكرة إذا لم تعد موجودة)
+        
+        مع السجل تُطبّق كل التغييرات بعد آخر رقم مقروء، وهي تشمل هذه السلع
+        وأي تعديل سبقها من اتصال آخر، فتبقى القراءة التالية إصابة مباشرة.
+        """
+        if not self.journal:
+            with self.db.writer(immediate=False) as conn, self._lock:
+                if self._loaded:
+                    self._reload_rows(conn, list(product_ids))
+            return
+        
+        with self.db.connection() as conn, self._lock:
+            if self._loaded and not self._apply_journal(conn):
+                self._loaded = False
+    
+    def invalidate(self):
+        """تفريغ الذاكرة لتُعاد قراءتها عند الاستخدام التالي"""
+        with self._lock:
+            self._loaded = False
+    
+    def get(self, product_id):
+        with self._fresh():
+            return self._rows.get(product_id)
+    
+    def get_many(self, product_ids):
+        """عدة سلع بتحقق واحد من حداثة الذاكرة (الموجودة فقط)"""
+        with self._fresh():
+            rows = (self._rows.get(product_id) for product_id in product_ids)
+            return [row for row in rows if row is not None]
+    
+    def by_barcode(self, barcode):
+        """السلعة المرتبطة برمز باركود (بحث في قاموس) أو None"""
+        with self._fresh():
+            return self._rows.get(self._barcodes.get(barcode))
+    
+    def all(self):
+        """جميع السلع مرتبة حسب الرقم"""
+        with self._fresh():
+            if not self._ordered:
+                self._rows = dict(sorted(self._rows.items()))
+                self._ordered = True
+            return list(self._rows.values())
+    
+    def by_category(self, category):
+        with self._fresh():
+            return sorted(self._rows[product_id] for product_id in self._by_category.get(category, ()))
+    
+    def by_status(self, status):
+        with self._fresh():
+            return [self._rows[product_id] for product_id in self._by_status.get(status, ())]
+    
+    def count(self):
+        with self._fresh():
+            return len(self._rows)
+    
+    def stats(self):
+        """إحصائيات استخدام الذاكرة المؤقتة"""
+        return {
+            'products': len(self._rows),
+            'hits': self.hits,
+            'reloads': self.reloads,
+            'invalidations': self.invalidations,
+            'deltas': self.deltas,
+            'barcodes': len(self._barcodes),
+        }
@@ -0,0 +1,259 @@
+# grocery_chain.py - سلسلة فروع: قاعدة بيانات لكل فرع واستعلامات على مستوى السلسلة
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from grocery_manager import GroceryStoreManager, ProductRow
+from grocery_metrics import Metrics, logger
+
+BranchProduct = namedtuple('BranchProduct', ('branch',) + ProductRow._fields)
+ChainTopSeller = namedtuple('ChainTopSeller', ['name', 'category', 'quantity', 'revenue', 'sale_count', 'branches'])
+
+# مدير لكل قاعدة فرع داخل كل عملية من مجمع العمليات (يُفتح عند أول طلب)
+_process_managers = {}
+
+
+def _timed_call(manager, method, args, kwargs):
+    """تنفيذ دالة المدير وإرجاع (النتيجة، الزمن)؛ المولّدات تُقرأ كاملة داخل الخيط نفسه"""
+    start = time.perf_counter()
+    result = getattr(manager, method)(*args, **kwargs)
+    if hasattr(result, '__next__'):
+        result = list(result)
+    return result, time.perf_counter() - start
+
+
+def _reader_options(options):
+    """إعدادات المنسق التي تنطبق على مديري القراءة في العمليات
+    
+    تُستبعد إعدادات الكتابة (الطابور المؤجل والنسخة المتماثلة) وما لا يُنقل
+    بين العمليات (كائن Metrics مشترك).
+    """
+    return {key: value for key, value in options.items()
+            if key not in ('write_behind', 'replica') and not isinstance(value, Metrics)}
+
+
+def _process_call(db_name, options, method, args, kwargs):
+    # القاعدة هيأها مدير الفرع في العملية الأم، فيُفتح هنا للقراءة فقط دون ترحيلات
+    manager = _process_managers.get(db_name)
+    if manager is None:
+        manager = _process_managers[db_name] = GroceryStoreManager(db_name, read_only=True, **options)
+    return _timed_call(manager, method, args, kwargs)
+
+
+class ChainStoreCoordinator:
+    """إدارة فروع السلسلة: مدير وقاعدة بيانات مستقلة لكل فرع
+    
+    الكتابات تُوجّه إلى مدير الفرع المعني فقط. استعلامات السلسلة تُرسل إلى كل
+    الفروع معاً عبر مجمع خيوط أو عمليات ثم تُدمج النتائج الجزئية، ويُسجّل زمن
+    كل فرع لكل عملية في self.metrics.
+    
+    executor:
+        'thread'  - خيط لكل فرع (الافتراضي): SQLite تحرر GIL أثناء الاستعلام،
+                    فتتوازى قراءات الفروع دون كلفة نقل النتائج بين العمليات.
+                    كل فرع مثبت على خيط واحد (ومع workers تتقاسم الفروع الخيوط
+                    بالتناوب)، فلا يفتح مدير الفرع اتصالاً لكل خيط في المجمع ولا
+                    يتجاوز max_connections مهما زاد عدد الفروع.
+        'process' - مجمع عمليات بعدد الأنوية، لكل عملية مدير قراءة لكل فرع
+                    (read_only بإعدادات المنسق)؛ يفيد حين يغلب عمل Python (بناء
+                    الصفوف والفرز) على الاستعلام.
+    
+    تُسجّل الأزمنة بمفاتيح (الفرع، العملية) و(None، العملية) للزمن الكلي، فلا
+    يتداخل اسم فرع مع غيره مهما كان.
+    """
+    
+    def __init__(self, branches, directory='.', executor='thread', workers=None, **manager_options):
+        if executor not in ('thread', 'process'):
+            raise ValueError(f"نوع المجمع غير مدعوم: {executor}")
+        
+        self.directory = directory
+        self.executor = executor
+        self.workers = workers
+        self.manager_options = manager_options
+        self._reader_options = _reader_options(manager_options)
+        self.metrics = Metrics(profile_sql=False)
+        
+        self.paths = {}
+        self.managers = {}
+        self._pool = None
+        self._lanes = []           # مجمعات بخيط واحد (executor='thread')
+        self._branch_lanes = {}    # الفرع -> مجمع خيطه
+        if not isinstance(branches, dict):
+            branches = {name: None for name in branches}
+        for name, path in branches.items():
+            self._open_branch(name, path)
+        self._start_pool()
+    
+    def _open_branch(self, name, path=None):
+        if name in self.managers:
+            raise ValueError(f"الفرع {name} موجود مسبقاً")
+        path = path or os.path.join(self.directory, f'grocery_{name}.db')
+        self.paths[name] = path
+        self.managers[name] = GroceryStoreManager(path, **self.manager_options)
+    
+    def _start_pool(self):
+        if self.executor == 'thread':
+            for name in self.managers:
+                self._assign_lane(name)
+            return
+        if self._pool is not None:
+            self._pool.shutdown()
+        # spawn: اتصالات SQLite المفتوحة في العملية الأم لا تُورث للعمليات
+        workers = self.workers or max(1, min(len(self.managers), os.cpu_count() or 1))
+        self._pool = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context('spawn'))
+    
+    def _assign_lane(self, name):
+        """تثبيت الفرع على خيط: خيط جديد لكل فرع، أو بالتناوب على workers خيطاً"""
+        if self.workers is None or len(self._lanes) < self.workers:
+            self._lanes.append(ThreadPoolExecutor(1, thread_name_prefix=f'chain-{len(self._lanes)}'))
+        self._branch_lanes[name] = self._lanes[len(self._branch_lanes) % len(self._lanes)]
+    
+    def add_branch(self, name, path=None):
+        """إضافة فرع جديد (يُوسَّع المجمع ليشمله إذا لم يُحدد workers)"""
+        self._open_branch(name, path)
+        if self.executor == 'thread':
+            self._assign_lane(name)
+        elif self.workers is None:
+            self._start_pool()
+        logger.info("تمت إضافة الفرع %s", name)
+        return self.managers[name]
+    
+    @property
+    def branches(self):
+        return list(self.managers)
+    
+    def branch(self, name):
+        """مدير فرع محدد"""
+        try:
+            return self.managers[name]
+        except KeyError:
+            raise ValueError(f"فرع غير معروف: {name}") from None
+    
+    # الكتابات: تُوجّه إلى فرع واحد
+    
+    def add_product(self, branch, *args, **kwargs):
+        return self.branch(branch).add_product(*args, **kwargs)
+    
+    def update_product(self, branch, product_id, **kwargs):
+        return self.branch(branch).update_product(product_id, **kwargs)
+    
+    def delete_product(self, branch, product_id):
+        return self.branch(branch).delete_product(product_id)
+    
+    def receive_stock(self, branch, product_id, quantity, expiry_date=None):
+        return self.branch(branch).receive_stock(product_id, quantity, expiry_date)
+    
+    def sell_product(self, branch, product_id, quantity):
+        return self.branch(branch).sell_product(product_id, quantity)
+    
+    def sell_many(self, branch, lines):
+        return self.branch(branch).sell_many(lines)
+    
+    def scan_and_sell(self, branch, barcode, quantity=1):
+        return self.branch(branch).scan_and_sell(barcode, quantity)
+    
+    # القراءات على مستوى السلسلة
+    
+    def fan_out(self, method, *args, **kwargs):
+        """تنفيذ دالة المدير على كل الفروع معاً؛ تعيد قاموس (الفرع -> النتيجة) بترتيب الفروع"""
+        start = time.perf_counter()
+        if self.executor == 'thread':
+            futures = {name: self._branch_lanes[name].submit(_timed_call, manager, method, args, kwargs)
+                       for name, manager in self.managers.items()}
+        else:
+            futures = {name: self._pool.submit(_process_call, self.paths[name], self._reader_options,
+                                               method, args, kwargs)
+                       for name in self.managers}
+        
+        results = {}
+        for name, future in futures.items():
+            results[name], seconds = future.result()
+            self.metrics.record((name, method), seconds)
+        self.metrics.record((None, method), time.perf_counter() - start)
+        return results
+    
+    def get_chain_stats(self):
+        """إحصائيات السلسلة: مجموع إحصائيات الفروع (كل القيم قابلة للجمع)"""
+        totals = {}
+        for stats in self.fan_out('get_product_stats').values():
+            for key, value in stats.items():
+                totals[key] = totals.get(key, 0) + value
+        return totals
+    
+    def iter_low_stock_products(self):
+        """السلع المنخفضة المخزون في كل الفروع، الأقل كمية أولاً"""
+        rows = [BranchProduct(name, *row)
+                for name, part in self.fan_out('iter_low_stock_products').items() for row in part]
+        return iter(sorted(rows, key=lambda row: (row.quantity, row.branch, row.product_id)))
+    
+    def get_low_stock_products(self):
+        return _to_dataframe(self.iter_low_stock_products(),
+                             ['branch', 'product_id', 'name', 'category', 'price', 'quantity', 'min_stock_level'])
+    
+    def iter_search_results(self, search_term, use_fts=True, limit=50):
+        """البحث في كل الفروع؛ تُدمج النتائج حسب ترتيبها داخل كل فرع (الأول من كل فرع أولاً)"""
+        if self.executor == 'process':
+            # مديرو العمليات للقراءة فقط، ففهرسة السلع المعلّقة تتم هنا قبل البحث
+            for manager in self.managers.values():
+                manager.sync_search_index()
+        parts = self.fan_out('iter_search_results', search_term, use_fts, limit)
+        ranked = sorted(
+            (rank, index, BranchProduct(name, *row))
+            for index, (name, part) in enumerate(parts.items()) for rank, row in enumerate(part)
+        )
+        rows = [row for _, _, row in ranked]
+        return iter(rows if limit is None else rows[:limit])
+    
+    def search_products(self, search_term, use_fts=True, limit=50):
+        return _to_dataframe(self.iter_search_results(search_term, use_fts, limit),
+                             ['branch', 'product_id', 'name', 'category', 'price', 'quantity', 'sold_quantity'])
+    
+    def get_top_sellers(self, n=10, start=None, end=None, by='revenue', category=None):
+        """أكثر السلع مبيعاً في السلسلة، والسلعة نفسها في عدة فروع تُجمع بالاسم والفئة
+        
+        يُطلب من كل فرع ترتيب كل سلعه (لا أول n فقط)، فسلعة متوسطة في كل
+        الفروع قد تتصدر السلسلة.
+        """
+        if by not in ('revenue', 'quantity'):
+            raise ValueError(f"ترتيب غير مدعوم: {by}")
+        
+        merged = {}
+        for name, sellers in self.fan_out('get_top_sellers', -1, start, end, by, category).items():
+            for seller in sellers:
+                key = (seller.name, seller.category)
+                quantity, revenue, sale_count, branches = merged.get(key, (0, 0.0, 0, ()))
+                merged[key] = (quantity + seller.quantity, revenue + seller.revenue,
+                               sale_count + seller.sale_count, branches + (name,))
+        
+        sellers = [ChainTopSeller(name, category, *values) for (name, category), values in merged.items()]
+        sellers.sort(key=lambda seller: (-getattr(seller, by), seller.name))
+        return sellers[:n]
+    
+    def shard_latency(self):
+        """أزمنة كل فرع لكل عملية: {(الفرع، العملية): القياسات}، والمفتاح (None، العملية) للزمن الكلي"""
+        return dict(self.metrics.snapshot()['methods'])
+    
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+        for lane in self._lanes:
+            lane.shutdown()
+        self._lanes = []
+        self._branch_lanes = {}
+        for manager in self.managers.values():
+            manager.close()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def _to_dataframe(rows, columns):
+    import pandas as pd
+    
+    return pd.DataFrame.from_records(list(rows), columns=BranchProduct._fields)[columns]
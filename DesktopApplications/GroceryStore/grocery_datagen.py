@@ -0,0 +1,147 @@
+# grocery_datagen.py - توليد بيانات اصطناعية (سلع وسنوات من المبيعات) للقياس واختبار الحمل
+import argparse
+import random
+from datetime import date, datetime, timedelta
+
+from grocery_manager import GroceryStoreManager
+from grocery_metrics import configure_logging, logger
+
+PRODUCT_WORDS = {
+    'ألبان': ['حليب', 'لبن', 'جبن', 'زبدة', 'قشطة', 'زبادي'],
+    'مخبوزات': ['خبز', 'صامولي', 'كرواسون', 'كعك', 'توست'],
+    'حبوب': ['أرز', 'برغل', 'عدس', 'فول', 'حمص', 'شوفان'],
+    'مشروبات': ['شاي', 'قهوة', 'عصير برتقال', 'ماء', 'مشروب غازي'],
+    'زيوت': ['زيت زيتون', 'زيت ذرة', 'سمن', 'زيت دوار الشمس'],
+    'حلويات': ['تمر', 'عسل', 'شوكولاتة', 'بسكويت', 'حلاوة'],
+    'منظفات': ['صابون', 'مسحوق غسيل', 'سائل جلي', 'معقم'],
+}
+
+LATIN_WORDS = {
+    'Dairy': ['Milk', 'Laban', 'Cheddar', 'Butter', 'Cream', 'Yogurt'],
+    'Bakery': ['Bread', 'Croissant', 'Bagel', 'Toast', 'Muffin'],
+    'Beverages': ['Coffee', 'Green Tea', 'Orange Juice', 'Water', 'Cola'],
+    'Snacks': ['Chips', 'Cookies', 'Crackers', 'Chocolate', 'Granola'],
+}
+
+BRANDS = ['المراعي', 'نادك', 'الصافي', 'ربيع', 'Almarai', 'Nestle', 'Lipton', 'Nescafe', 'Kraft', 'Puck']
+SIZES = ['1 لتر', '2 لتر', '500 غ', '1 كغ', '250ml', '330ml', '1kg', '400g']
+
+
+def generate_products(count, seed=42, latin_ratio=0.3):
+    """توليد سلع بأسماء عربية ولاتينية (الاسم، الفئة، السعر، الكمية، الحد الأدنى، تاريخ الانتهاء)"""
+    rng = random.Random(seed)
+    arabic = list(PRODUCT_WORDS.items())
+    latin = list(LATIN_WORDS.items())
+    today = date.today()
+    
+    for i in range(count):
+        category, words = rng.choice(latin if rng.random() < latin_ratio else arabic)
+        name = f"{rng.choice(words)} {rng.choice(BRANDS)} {rng.choice(SIZES)} #{i}"
+        price = round(rng.uniform(0.5, 80.0), 2)
+        quantity = rng.randint(0, 500)
+        expiry = (today + timedelta(days=rng.randint(-10, 400))).isoformat()
+        yield name, category, price, quantity, rng.choice((5, 10, 20)), expiry
+
+
+def generate_sales(product_ids, prices, years=1, sales_per_day=200, seed=42, end=None):
+    """توليد مبيعات موزعة على years سنوات (product_id, quantity, total_price, sale_date)
+    
+    بعض السلع أكثر مبيعاً من غيرها (توزيع قريب من Zipf)، والمبيعات أكثر في
+    عطلة نهاية الأسبوع وفي ساعات المساء.
+    """
+    rng = random.Random(seed)
+    end = end or datetime.now().replace(minute=0, second=0, microsecond=0)
+    first = end - timedelta(days=int(years * 365))
+    
+    # أوزان الشعبية: السلعة رقم k في ترتيب عشوائي وزنها 1 / k
+    order = list(range(len(product_ids)))
+    rng.shuffle(order)
+    weights = [0.0] * len(product_ids)
+    for rank, index in enumerate(order, start=1):
+        weights[index] = 1.0 / rank
+    hours = list(range(8, 23))
+    hour_weights = [1, 1, 2, 2, 3, 2, 2, 2, 3, 4, 5, 5, 4, 3, 2]
+    
+    day = first
+    while day < end:
+        count = int(sales_per_day * (1.4 if day.weekday() in (3, 4) else 1.0) * rng.uniform(0.8, 1.2))
+        chosen = rng.choices(range(len(product_ids)), weights, k=count)
+        chosen_hours = rng.choices(hours, hour_weights, k=count)
+        for index, hour in zip(chosen, chosen_hours):
+            quantity = rng.randint(1, 4)
+            sale_date = day.replace(hour=hour, minute=rng.randrange(60), second=rng.randrange(60))
+            yield product_ids[index], quantity, round(prices[index] * quantity, 2), sale_date
+        day += timedelta(days=1)
+
+
+def populate(manager, products=10_000, years=1, sales_per_day=200, seed=42, batch_size=50_000):
+    """ملء قاعدة بيانات المدير بسلع ومبيعات اصطناعية بكتابات مجمّعة
+    
+    تُحدَّث الإحصائيات وجداول التجميع عبر المشغلات كما في الاستخدام العادي،
+    ويُفهرس البحث في نهاية التوليد (المشغلات تضع السلع في طابور الفهرسة فقط)،
+    فتعكس القاعدة الناتجة حالة محل حقيقي ولا يدفع أول بحث كلفة فهرسة الكتالوج.
+    تعيد (أرقام السلع، عدد المبيعات).
+    """
+    rows = list(generate_products(products, seed))
+    now = datetime.now()
+    with manager.db.writer() as conn:
+        first_id = conn.execute('SELECT IFNULL(MAX(product_id), 0) FROM products').fetchall()[0][0] + 1
+        conn.executemany('''
+            INSERT INTO products (name, category, price, quantity, min_stock_level, expiry_date, last_updated)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', [row + (now,) for row in rows])
+        product_ids = [product_id for (product_id,) in conn.execute(
+            'SELECT product_id FROM products WHERE product_id >= ? ORDER BY product_id', (first_id,)).fetchall()]
+        conn.executemany('''
+            INSERT INTO stock_lots (product_id, quantity, expiry_date, received_date)
+            VALUES (?, ?, ?, ?)
+        ''', [(product_id, row[3], row[5], now) for product_id, row in zip(product_ids, rows) if row[3] > 0])
+    
+    sold = {}
+    batch = []
+    total = 0
+    for sale in generate_sales(product_ids, [row[2] for row in rows], years, sales_per_day, seed):
+        batch.append(sale)
+        sold[sale[0]] = sold.get(sale[0], 0) + sale[1]
+        if len(batch) >= batch_size:
+            total += _insert_sales(manager, batch)
+            batch = []
+    total += _insert_sales(manager, batch)
+    
+    with manager.db.writer() as conn:
+        conn.executemany('UPDATE products SET sold_quantity = sold_quantity + ? WHERE product_id = ?',
+                         [(quantity, product_id) for product_id, quantity in sold.items()])
+    manager.sync_search_index()
+    
+    if manager.cache is not None:
+        manager.cache.invalidate()
+    logger.info("تم توليد %s سلعة و%s عملية بيع على %s سنة", len(product_ids), total, years)
+    return product_ids, total
+
+
+def _insert_sales(manager, batch):
+    if batch:
+        with manager.db.writer() as conn:
+            conn.executemany('''
+                INSERT INTO sales (product_id, quantity_sold, total_price, sale_date)
+                VALUES (?, ?, ?, ?)
+            ''', batch)
+    return len(batch)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="توليد بيانات اصطناعية لمحل المواد الغذائية")
+    parser.add_argument('--db', default='grocery_store.db', help="ملف قاعدة البيانات")
+    parser.add_argument('--products', type=int, default=10_000)
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--sales-per-day', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+    configure_logging()
+    
+    with GroceryStoreManager(args.db) as manager:
+        populate(manager, args.products, args.years, args.sales_per_day, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+# grocery_db.py - طبقة إدارة اتصالات قاعدة البيانات
+import os
+import random
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+# إعدادات تُطبق على كل اتصال جديد
+DEFAULT_PRAGMAS = {
+    'synchronous': 'NORMAL',   # آمن مع وضع WAL وأسرع من FULL
+    'cache_size': -16000,      # حوالي 16 ميغابايت من الصفحات في الذاكرة
+    'temp_store': 'MEMORY',
+}
+
+
+class ConnectionManager:
+    """إدارة اتصالات SQLite طويلة العمر: اتصال واحد دائم لكل خيط تنفيذ
+    
+    يحتفظ كل خيط باتصاله الخاص طوال عمر المدير، فلا تتكرر كلفة فتح
+    الملف وتهيئته مع كل عملية، وتبقى الاستعلامات المحضّرة في ذاكرة
+    التخزين المؤقت للاتصال (cached_statements) ويعاد استخدامها.
+    
+    مع read_only=True تُفتح الاتصالات بـ URI فيه mode=ro، فلا يُنشأ الملف إذا
+    لم يوجد ويُرفض أي تعديل، ولا يُتاح اتصال الكتابة.
+    """
+    
+    def __init__(self, db_name, persistent=True, timeout=5.0, cached_statements=256, max_connections=16,
+                 pragmas=None, begin_retries=8, retry_backoff=0.005, read_only=False):
+        self.db_name = db_name
+        self.persistent = persistent
+        self.read_only = read_only
+        self.begin_retries = begin_retries
+        self.retry_backoff = retry_backoff
+        self.pragmas = DEFAULT_PRAGMAS if pragmas is None else pragmas
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.max_connections = max_connections
+        
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}  # معرف الخيط -> (الخيط، الاتصال)
+        self._closed = False
+        
+        # اتصال كتابة واحد مشترك بين الخيوط (كاتب واحد داخل العملية)
+        self._write_lock = threading.RLock()
+        self._writer = None
+        
+        # مقياس زمن الاستعلامات (SqlProfiler) يُركّب على كل اتصال عند تفعيله
+        self.profiler = None
+    
+    def _connect(self):
+        """فتح اتصال جديد وتهيئته"""
+        if self.read_only:
+            database, uri = f'file:{pathname2url(os.path.abspath(self.db_name))}?mode=ro', True
+        else:
+            database, uri = self.db_name, False
+        conn = sqlite3.connect(
+            database,
+            timeout=self.timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+            uri=uri
+        )
+        self.configure(conn)
+        return conn
+    
+    def configure(self, conn):
+        """تهيئة الاتصال بعد فتحه مباشرة"""
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        if self.profiler is not None:
+            self.profiler.attach(conn)
+    
+    def set_profiler(self, profiler):
+        """تركيب مقياس الاستعلامات على كل الاتصالات المفتوحة والجديدة (أو إزالته مع None)"""
+        with self._write_lock, self._lock:
+            connections = [conn for _, conn in self._connections.values()]
+            if self._writer is not None:
+                connections.append(self._writer)
+            for conn in connections:
+                if self.profiler is not None:
+                    self.profiler.detach(conn)
+                if profiler is not None:
+                    profiler.attach(conn)
+            self.profiler = profiler
+    
+    def _finish_profile(self, conn):
+        profiler = self.profiler
+        if profiler is not None:
+            if self.persistent:
+                profiler.finish(conn)
+            else:
+                profiler.detach(conn)
+    
+    def _prune_dead_threads(self):
+        """إغلاق اتصالات الخيوط التي انتهت (يُستدعى مع الحصول على القفل)"""
+        for ident, (thread, conn) in list(self._connections.items()):
+            if not thread.is_alive():
+                conn.close()
+                del self._connections[ident]
+    
+    def get(self):
+        """الحصول على اتصال الخيط الحالي (يُنشأ عند أول استخدام)"""
+        if self._closed:
+            raise sqlite3.ProgrammingError("تم إغلاق مدير الاتصالات")
+        
+        if not self.persistent:
+            return self._connect()
+        
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            with self._lock:
+                self._prune_dead_threads()
+                if len(self._connections) >= self.max_connections:
+                    raise sqlite3.OperationalError(
+                        f"تم تجاوز الحد الأقصى للاتصالات ({self.max_connections})")
+                conn = self._connect()
+                thread = threading.current_thread()
+                self._connections[thread.ident] = (thread, conn)
+            self._local.conn = conn
+        return conn
+    
+    @contextmanager
+    def connection(self):
+        """سياق عمل على اتصال الخيط الحالي: اعتماد عند النجاح وتراجع عند الخطأ"""
+        conn = self.get()
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            self._finish_profile(conn)
+            if not self.persistent:
+                conn.close()
+    
+    def begin_immediate(self, conn):
+        """بدء معاملة BEGIN IMMEDIATE مع إعادة المحاولة عند انشغال قاعدة البيانات
+        
+        يحجز قفل الكتابة من بداية المعاملة، فلا تفشل المعاملة لاحقاً عند
+        ترقية قفل القراءة إلى كتابة بسبب عملية أخرى. إذا انتهت مهلة الانتظار
+        (timeout) تُعاد المحاولة بتأخير متزايد عشوائي.
+        """
+        for attempt in range(self.begin_retries + 1):
+            try:
+                conn.execute('BEGIN IMMEDIATE')
+                return
+            except sqlite3.OperationalError as e:
+                busy = 'locked' in str(e) or 'busy' in str(e)
+                if not busy or attempt == self.begin_retries:
+                    raise
+                time.sleep(self.retry_backoff * (2 ** attempt) * (0.5 + random.random()))
+    
+    @contextmanager
+    def writer(self, immediate=True):
+        """سياق عمل على اتصال الكتابة المشترك
+        
+        تمر كتابات المدير عبر اتصال واحد محمي بقفل، فلا تتنافس خيوط العملية
+        على أقفال SQLite، ويبقى PRAGMA data_version على هذا الاتصال مؤشراً
+        على تغييرات الاتصالات والعمليات الأخرى فقط. مع immediate=True تبدأ
+        المعاملة بـ BEGIN IMMEDIATE فتكون القراءة والكتابة داخلها ذرية بين العمليات.
+        """
+        if self.read_only:
+            raise sqlite3.OperationalError("قاعدة البيانات مفتوحة للقراءة فقط")
+        with self._write_lock:
+            if self._closed:
+                raise sqlite3.ProgrammingError("تم إغلاق مدير الاتصالات")
+            
+            conn = self._writer
+            if conn is None:
+                conn = self._connect()
+                if self.persistent:
+                    self._writer = conn
+            try:
+                if immediate and not conn.in_transaction:
+                    self.begin_immediate(conn)
+                yield conn
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                self._finish_profile(conn)
+                if not self.persistent:
+                    conn.close()
+    
+    def close(self):
+        """إغلاق جميع الاتصالات المفتوحة"""
+        with self._write_lock:
+            if self._writer is not None:
+                self._writer.close()
+                self._writer = None
+        
+        with self._lock:
+            for _, conn in self._connections.values():
+                conn.close()
+            self._connections.clear()
+            self._closed = True
+        self._local = threading.local()
+    
+    @property
+    def open_connections(self):
+        """عدد الاتصالات المفتوحة حالياً"""
+        with self._lock:
+            return len(self._connections)
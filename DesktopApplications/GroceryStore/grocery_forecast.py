@@ -0,0 +1,194 @@
+# grocery_forecast.py - توقع الطلب ونقاط إعادة الطلب بعمليات NumPy متجهة
+import math
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+
+ReorderSuggestion = namedtuple('ReorderSuggestion', [
+    'product_id', 'name', 'category', 'quantity', 'daily_demand', 'days_of_cover',
+    'reorder_point', 'reorder_quantity'
+])
+
+# أقل عدد من السلع يستحق توزيع الحساب على عدة عمليات
+PARALLEL_THRESHOLD = 50_000
+
+SALES_DAY_DTYPE = np.dtype([('product_id', np.int64), ('quantity', np.float64)])
+
+
+def load_daily_sales(manager, days=56, end=None):
+    """تحميل مبيعات كل سلعة يومياً لآخر days يوماً في مصفوفة (السلع × الأيام)
+    
+    تُقرأ من جدول التجميع اليومي sales_daily (يشمل الأشهر المؤرشفة) بدلاً من
+    سجل المبيعات الخام. تظهر كل السلع الحالية حتى التي لم تُبع (صف أصفار).
+    تعيد (أرقام السلع، الأسماء، الفئات، المخزون، الحد الأدنى، المصفوفة).
+    """
+    end = end or date.today()
+    start = end - timedelta(days=days - 1)
+    
+    with manager.db.connection() as conn:
+        products = conn.execute(
+            'SELECT product_id, name, category, quantity, min_stock_level FROM products ORDER BY product_id'
+        ).fetchall()
+        
+        if products:
+            ids, names, categories, stock, min_stock = zip(*products)
+        else:
+            ids = names = categories = stock = min_stock = ()
+        ids = np.array(ids, dtype=np.int64)
+        matrix = np.zeros((len(ids), days), dtype=np.float64)
+        
+        # استعلام لكل يوم (بحث في المفتاح الأساسي) يملأ عموداً كاملاً من المصفوفة
+        # مباشرة من المؤشر دون تحويل التواريخ أو بناء قوائم وسيطة
+        for column in range(days if len(ids) else 0):
+            bucket = (start + timedelta(days=column)).isoformat()
+            day = np.fromiter(
+                conn.execute('SELECT product_id, quantity FROM sales_daily WHERE bucket = ?', (bucket,)),
+                dtype=SALES_DAY_DTYPE)
+            rows = np.searchsorted(ids, day['product_id'])
+            # مبيعات السلع المحذوفة لا صف لها
+            known = (rows < len(ids)) & (ids[np.minimum(rows, len(ids) - 1)] == day['product_id'])
+            matrix[rows[known], column] = day['quantity'][known]
+    
+    return (ids, list(names), list(categories), np.array(stock, dtype=np.float64),
+            np.array(min_stock, dtype=np.float64), matrix)
+
+
+def moving_average(matrix, window=28):
+    """متوسط الطلب اليومي لآخر window يوماً لكل سلعة"""
+    window = min(window, matrix.shape[1])
+    return matrix[:, -window:].mean(axis=1)
+
+
+def exponential_smoothing(matrix, alpha=0.3):
+    """التمهيد الأسي البسيط لكل صف في ضرب مصفوفي واحد
+    
+    s_t = alpha * x_t + (1 - alpha) * s_(t-1) مع s_0 = x_0، ومكتوبة كمجموع موزون
+    للأيام فلا حاجة لحلقة على الأيام.
+    """
+    days = matrix.shape[1]
+    if days == 0:
+        return np.zeros(matrix.shape[0])
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1, dtype=np.float64)
+    weights[0] = (1 - alpha) ** (days - 1)
+    return matrix @ weights
+
+
+def compute_plan(stock, matrix, min_stock=None, method='ewma', window=28, alpha=0.3,
+                 lead_time_days=3, review_days=7, service_z=1.65):
+    """حساب الطلب المتوقع وأيام التغطية وكمية إعادة الطلب لكل السلع دفعة واحدة
+    
+    نقطة إعادة الطلب = الطلب خلال مدة التوريد + مخزون أمان (service_z × الانحراف
+    المعياري × جذر مدة التوريد)، ولا تقل عن الحد الأدنى الثابت للسلعة. تُقترح
+    كمية تغطي مدة التوريد وفترة المراجعة لكل سلعة وصل مخزونها إلى نقطة الطلب.
+    """
+    if method == 'ewma':
+        demand = exponential_smoothing(matrix, alpha)
+    elif method == 'sma':
+        demand = moving_average(matrix, window)
+    else:
+        raise ValueError(f"طريقة توقع غير مدعومة: {method}")
+    
+    window = min(window, matrix.shape[1])
+    deviation = matrix[:, -window:].std(axis=1) if window else np.zeros(len(stock))
+    safety = service_z * deviation * math.sqrt(lead_time_days)
+    
+    reorder_point = demand * lead_time_days + safety
+    if min_stock is not None:
+        reorder_point = np.maximum(reorder_point, min_stock)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        days_of_cover = np.where(demand > 0, stock / demand, np.inf)
+    
+    target = demand * (lead_time_days + review_days) + safety
+    if min_stock is not None:
+        target = np.maximum(target, min_stock)
+    reorder_quantity = np.where(stock <= reorder_point, np.ceil(np.maximum(target - stock, 0)), 0)
+    
+    return {
+        'daily_demand': demand,
+        'days_of_cover': days_of_cover,
+        'reorder_point': reorder_point,
+        'reorder_quantity': reorder_quantity.astype(np.int64),
+    }
+
+
+def _plan_chunk(args):
+    stock, matrix, min_stock, options = args
+    return compute_plan(stock, matrix, min_stock, **options)
+
+
+def _process_context():
+    """سياق عمليات لا يستخدم fork: المستدعي (الواجهة أو الخادم) يشغّل خيوطاً،
+    ونسخ عملية فيها خيوط قد يرث أقفالاً ممسوكة فتتوقف العملية الجديدة"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def compute_plan_parallel(stock, matrix, min_stock=None, workers=None, chunk_size=25_000, **options):
+    """compute_plan مقسومة على مجموعات من السلع في مجمع عمليات
+    
+    تُنشأ العمليات بـ forkserver (أو spawn) لا بـ fork، فيمكن استدعاؤها من عملية
+    تشغّل خيوطاً؛ تُنسخ كل مجموعة إلى عمليتها.
+    """
+    bounds = [(i, min(i + chunk_size, len(stock))) for i in range(0, len(stock), chunk_size)]
+    chunks = [(stock[start:stop], matrix[start:stop],
+               None if min_stock is None else min_stock[start:stop], options) for start, stop in bounds]
+    with ProcessPoolExecutor(workers, mp_context=_process_context()) as executor:
+        parts = list(executor.map(_plan_chunk, chunks))
+    
+    if not parts:
+        return compute_plan(stock, matrix, min_stock, **options)
+    return {key: np.concatenate([part[key] for part in parts]) for key in parts[0]}
+
+
+class ReplenishmentEngine:
+    """اقتراح كميات إعادة الطلب من مبيعات السلع اليومية
+    
+    بديل لمقارنة الكمية بالحد الأدنى الثابت: السلع السريعة تُطلب قبل نفادها
+    حسب طلبها الفعلي، والبطيئة لا تُطلب ما دام مخزونها يغطي مدة التوريد.
+    مع workers يُوزّع الحساب على عدة عمليات إذا زاد عدد السلع عن PARALLEL_THRESHOLD.
+    """
+    
+    def __init__(self, manager, days=56, method='ewma', window=28, alpha=0.3,
+                 lead_time_days=3, review_days=7, service_z=1.65, workers=None):
+        self.manager = manager
+        self.days = days
+        self.workers = workers
+        self.options = {
+            'method': method,
+            'window': window,
+            'alpha': alpha,
+            'lead_time_days': lead_time_days,
+            'review_days': review_days,
+            'service_z': service_z,
+        }
+    
+    def compute(self, end=None):
+        """تحميل المبيعات وحساب الخطة لكل السلع؛ تعيد (البيانات، النتائج كمصفوفات)"""
+        ids, names, categories, stock, min_stock, matrix = load_daily_sales(self.manager, self.days, end)
+        if self.workers and len(ids) >= PARALLEL_THRESHOLD:
+            plan = compute_plan_parallel(stock, matrix, min_stock, self.workers, **self.options)
+        else:
+            plan = compute_plan(stock, matrix, min_stock, **self.options)
+        return (ids, names, categories, stock), plan
+    
+    def suggestions(self, end=None, limit=None):
+        """السلع التي تحتاج إعادة طلب، الأقل أيام تغطية أولاً"""
+        (ids, names, categories, stock), plan = self.compute(end)
+        
+        needed = np.flatnonzero(plan['reorder_quantity'] > 0)
+        order = needed[np.lexsort((ids[needed], plan['days_of_cover'][needed]))]
+        if limit is not None:
+            order = order[:limit]
+        
+        return [
+            ReorderSuggestion(
+                int(ids[i]), names[i], categories[i], int(stock[i]),
+                float(plan['daily_demand'][i]), float(plan['days_of_cover'][i]),
+                float(plan['reorder_point'][i]), int(plan['reorder_quantity'][i])
+            )
+            for i in order
+        ]
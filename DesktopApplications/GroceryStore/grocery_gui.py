@@ -1,24 +1,359 @@
 # grocery_gui.py - الواجهة الرسومية (الإصدار المصحح)
+import queue
+import threading
+import time
+
+# بداية تحميل الواجهة (مرجع زمن أول رسم وزمن الجاهزية)
+STARTED = time.perf_counter()
+
+from collections import deque
 import tkinter as tk
 from tkinter import ttk, messagebox, scrolledtext
-import pandas as pd
-from grocery_manager import GroceryStoreManager
+
+class AsyncSearch:
+    """بحث في خيط منفصل مع تأخير الإدخال وإهمال نتائج الاستعلامات القديمة
+    
+    كل ضغطة مفتاح ترفع رقم الجيل؛ لا يُرسل الاستعلام إلا بعد توقف الكتابة
+    مدة delay_ms، وأي نتيجة تعود بجيل أقدم من الجيل الحالي تُهمل. تُسلّم
+    النتائج إلى واجهة Tk من الخيط الرئيسي عبر after().
+    """
+    
+    def __init__(self, root, search_func, on_results, delay_ms=250, poll_ms=30):
+        self.root = root
+        self.search_func = search_func
+        self.on_results = on_results
+        self.delay_ms = delay_ms
+        self.poll_ms = poll_ms
+        
+        self.generation = 0
+        self.dropped = 0
+        self.latencies = deque(maxlen=500)
+        self._after_id = None
+        self._requests = queue.Queue()
+        self._results = queue.Queue()
+        
+        self._worker = threading.Thread(target=self._run, name='search-worker', daemon=True)
+        self._worker.start()
+        self.root.after(self.poll_ms, self._poll)
+    
+    def submit(self, term):
+        """طلب بحث جديد يلغي أي طلب سابق لم يكتمل"""
+        self.cancel()
+        generation = self.generation
+        self._after_id = self.root.after(self.delay_ms, lambda: self._dispatch(generation, term))
+    
+    def cancel(self):
+        """إلغاء الطلب المعلّق وإهمال أي نتيجة قيد التنفيذ"""
+        self.generation += 1
+        if self._after_id is not None:
+            self.root.after_cancel(self._after_id)
+            self._after_id = None
+    
+    def _dispatch(self, generation, term):
+        self._after_id = None
+        self._requests.put((generation, term))
+    
+    def _run(self):
+        while True:
+            generation, term = self._requests.get()
+            
+            # الاكتفاء بأحدث طلب في الطابور
+            try:
+                while True:
+                    generation, term = self._requests.get_nowait()
+            except queue.Empty:
+                pass
+            
+            if generation is None:
+                return
+            if generation != self.generation:
+                self.dropped += 1
+                continue
+            
+            start = time.perf_counter()
+            try:
+                result, error = self.search_func(term), None
+            except Exception as e:
+                result, error = None, e
+            self._results.put((generation, term, result, error, time.perf_counter() - start))
+    
+    def _poll(self):
+        try:
+            while True:
+                generation, term, result, error, elapsed = self._results.get_nowait()
+                if generation != self.generation:
+                    self.dropped += 1
+                    continue
+                self.latencies.append(elapsed)
+                self.on_results(term, result, error, elapsed)
+        except queue.Empty:
+            pass
+        self.root.after(self.poll_ms, self._poll)
+    
+    def latency_stats(self):
+        """إحصائيات زمن الاستعلامات المكتملة بالملي ثانية"""
+        if not self.latencies:
+            return {'queries': 0, 'dropped': self.dropped, 'last_ms': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0}
+        ordered = sorted(self.latencies)
+        return {
+            'queries': len(ordered),
+            'dropped': self.dropped,
+            'last_ms': self.latencies[-1] * 1000,
+            'p50_ms': ordered[len(ordered) // 2] * 1000,
+            'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        }
+    
+    def stop(self):
+        """إيقاف خيط البحث"""
+        self.cancel()
+        self._requests.put((None, None))
+
+class VirtualProductTable:
+    """جدول سلع افتراضي فوق Treeview
+    
+    لا يُنشئ في الجدول إلا الصفوف الظاهرة مع هامش قبلها وبعدها، ويجلب
+    البقية من المصدر عند التمرير. عند التحديث تُقارن الصفوف الجديدة
+    بالموجودة فلا يُعدّل إلا ما تغيّر فعلاً.
+    """
+    
+    def __init__(self, tree, scrollbar, buffer_rows=40):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.visible_rows = int(tree.cget('height'))
+        self.buffer_rows = buffer_rows
+        
+        self.count = lambda: 0
+        self.fetch = lambda offset, limit, after_id: []
+        self.total = 0
+        self.first = 0           # أول صف ظاهر
+        self.window_start = 0    # موضع أول صف منشأ في الجدول
+        self.window = []         # الصفوف المنشأة حالياً بالترتيب
+        
+        self.scrollbar.configure(command=self.on_scrollbar)
+        self.tree.configure(yscrollcommand=lambda *args: None)
+        for sequence in ('<MouseWheel>', '<Button-4>', '<Button-5>'):
+            self.tree.bind(sequence, self.on_mousewheel)
+    
+    def set_source(self, count, fetch):
+        """تعيين مصدر صفوف مقسّم إلى صفحات: count() و fetch(offset, limit, after_id)"""
+        self.count = count
+        self.fetch = fetch
+        self.first = 0
+        self.refresh()
+    
+    def set_rows(self, rows):
+        """تعيين قائمة صفوف جاهزة في الذاكرة (نتائج البحث مثلاً)"""
+        self.set_source(lambda: len(rows), lambda offset, limit, after_id: rows[offset:offset + limit])
+    
+    def patch(self, rows, deleted=()):
+        """تطبيق صفوف متغيرة على الجزء المنشأ فقط دون إعادة الجلب
+        
+        إذا حُذفت صفوف أو تغيّر العدد الكلي (سلع جديدة) تُعاد قراءة النافذة الحالية.
+        """
+        if deleted or self.count() != self.total:
+            self.refresh()
+            return
+        
+        positions = {row[0]: index for index, row in enumerate(self.window)}
+        window = list(self.window)
+        for row in rows:
+            index = positions.get(row[0])
+            if index is not None:
+                window[index] = row
+        if window != self.window:
+            self._apply_rows(window)
+    
+    def refresh(self):
+        """إعادة جلب النافذة الحالية مع الحفاظ على موضع التمرير"""
+        self.total = self.count()
+        self.first = max(0, min(self.first, self.total - self.visible_rows))
+        self._load_window(force=True)
+    
+    def _load_window(self, force=False):
+        window_end = self.window_start + len(self.window)
+        if not force and self.window_start <= self.first and self.first + self.visible_rows <= window_end:
+            self._place_view()
+            return
+        
+        start = max(0, self.first - self.buffer_rows)
+        limit = self.visible_rows + 2 * self.buffer_rows
+        
+        # إذا كانت النافذة الجديدة تبدأ داخل النافذة الحالية نجلب بـ keyset بعد آخر صف معروف
+        after_id = None
+        if not force and self.window_start < start <= window_end:
+            after_id = self.window[start - self.window_start - 1][0]
+        
+        self.window_start = start
+        self._apply_rows(list(self.fetch(start, limit, after_id)))
+        self._place_view()
+    
+    def _apply_rows(self, rows):
+        """مطابقة محتوى الجدول مع الصفوف الجديدة بأقل عدد من التعديلات"""
+        new_ids = [str(row[0]) for row in rows]
+        keep = set(new_ids)
+        
+        stale = [iid for iid in self.tree.get_children() if iid not in keep]
+        if stale:
+            self.tree.delete(*stale)
+        
+        old_values = {str(row[0]): row for row in self.window}
+        for index, (iid, row) in enumerate(zip(new_ids, rows)):
+            values = self.format_row(row)
+            if not self.tree.exists(iid):
+                self.tree.insert('', index, iid=iid, values=values)
+                continue
+            if old_values.get(iid) != row:
+                self.tree.item(iid, values=values)
+            if self.tree.index(iid) != index:
+                self.tree.move(iid, '', index)
+        
+        self.window = rows
+    
+    @staticmethod
+    def format_row(row):
+        product_id, name, category, price, quantity, sold_quantity, status = row
+        return (product_id, name, category, f"{price:.2f}", quantity, sold_quantity, status)
+    
+    def _place_view(self):
+        offset = self.first - self.window_start
+        if self.window:
+            self.tree.yview_moveto(offset / len(self.window))
+        if self.total:
+            self.scrollbar.set(self.first / self.total, min(1.0, (self.first + self.visible_rows) / self.total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+    
+    def scroll_to(self, first):
+        self.first = max(0, min(first, self.total - self.visible_rows))
+        self._load_window()
+    
+    def on_scrollbar(self, action, amount, unit=None):
+        if action == 'moveto':
+            self.scroll_to(int(float(amount) * self.total))
+        elif unit == 'pages':
+            self.scroll_to(self.first + int(amount) * self.visible_rows)
+        else:
+            self.scroll_to(self.first + int(amount))
+    
+    def on_mousewheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.first - 3)
+        else:
+            self.scroll_to(self.first + 3)
+        return 'break'
 
 class GroceryStoreGUI:
-    def __init__(self, root):
+    def __init__(self, root, diagnostics=False, db_name='grocery_store.db', fast_start=False, replica_lag=None):
         self.root = root
         self.root.title("نظام إدارة محل المواد الغذائية")
         self.root.geometry("1000x700")
         self.root.configure(bg='#f0f0f0')
         
-        # إنشاء كائن المدير
-        self.manager = GroceryStoreManager()
+        self.diagnostics = diagnostics
+        self.db_name = db_name
+        self.fast_start = fast_start
+        self.replica_lag = replica_lag
+        self.manager = None
+        self.search = None
+        self.change_seq = 0
+        self.poll_changes_ms = 1000
+        
+        # زمن أول رسم للنافذة وزمن جاهزية البيانات بالثواني منذ STARTED
+        self.first_paint_seconds = None
+        self.ready_seconds = None
+        self.root.bind('<Map>', self.on_map, add='+')
         
         # إنشاء واجهة المستخدم
         self.create_widgets()
         
-        # تحميل البيانات الأولية
-        self.refresh_products()
+        if fast_start:
+            # البدء السريع: تظهر النافذة فوراً ويُنشأ المدير وتُحمّل أول صفحة في الخلفية
+            self.search_status.config(text="جاري تحميل السلع...")
+            self._startup = queue.Queue()
+            limit = self.product_table.visible_rows + 2 * self.product_table.buffer_rows
+            threading.Thread(target=self._load_in_background, args=(limit,),
+                             name='startup-loader', daemon=True).start()
+            self.root.after(20, self._poll_startup)
+        else:
+            self.manager = self.create_manager()
+            self.on_manager_ready()
+            
+            # تحميل البيانات الأولية
+            self.refresh_products()
+            self.ready_seconds = time.perf_counter() - STARTED
+    
+    def create_manager(self):
+        # استيراد المدير وتهيئة قاعدة البيانات (في خيط الخلفية عند البدء السريع)
+        from grocery_manager import GroceryStoreManager
+        
+        # قياس الأزمنة مفعّل إذا طُلبت لوحة التشخيص، والتقارير من نسخة متماثلة إذا حُدد عمرها الأقصى
+        replica = {'max_lag': self.replica_lag} if self.replica_lag else None
+        return GroceryStoreManager(self.db_name, metrics=self.diagnostics, replica=replica)
+    
+    def on_manager_ready(self):
+        # البحث أثناء الكتابة يعمل في خيط منفصل
+        self.search = AsyncSearch(
+            self.root, lambda term: list(self.manager.iter_search_results(term)), self.show_search_results)
+        
+        for tab in self.notebook.tabs():
+            self.notebook.tab(tab, state='normal')
+        for button in self.products_buttons:
+            button.config(state='normal')
+        if self.diagnostics and str(self.diagnostics_tab) in self.built_tabs:
+            self.metrics_enabled.set(self.manager.metrics.enabled)
+        
+        # متابعة تغييرات نقاط البيع الأخرى من سجل التغييرات
+        self.change_seq = self.manager.latest_change_seq()
+        self.root.after(self.poll_changes_ms, self.poll_changes)
+    
+    def _load_in_background(self, limit):
+        try:
+            manager = self.create_manager()
+            # أول قراءة تملأ ذاكرة السلع المؤقتة أيضاً، فتبقى خارج الخيط الرئيسي
+            total = manager.count_products()
+            rows = manager.get_products_page(limit)
+            self._startup.put((manager, total, rows, None))
+        except Exception as e:
+            self._startup.put((None, 0, [], e))
+    
+    def _poll_startup(self):
+        try:
+            manager, total, rows, error = self._startup.get_nowait()
+        except queue.Empty:
+            self.root.after(20, self._poll_startup)
+            return
+        
+        if error is not None:
+            self.search_status.config(text="")
+            messagebox.showerror("خطأ", f"تعذر فتح قاعدة البيانات: {error}")
+            return
+        
+        self.manager = manager
+        self.on_manager_ready()
+        
+        # أول صفحة محمّلة مسبقاً، وبقية الصفحات تُجلب من المدير عند التمرير
+        preloaded = [rows]
+        
+        def fetch(offset, limit, after_id):
+            if preloaded:
+                first_page = preloaded.pop()
+                if offset == 0 and (limit <= len(first_page) or len(first_page) == total):
+                    return first_page[:limit]
+            return self.manager.get_products_page(limit, offset, after_id)
+        
+        self.showing_all_products = True
+        self.product_table.set_source(lambda: total if preloaded else self.manager.count_products(), fetch)
+        self.search_status.config(text="")
+        self.ready_seconds = time.perf_counter() - STARTED
+    
+    def on_map(self, event):
+        # تسجيل زمن أول رسم بعد ظهور النافذة واكتمال رسمها
+        if event.widget is self.root and self.first_paint_seconds is None:
+            self.root.after_idle(self._record_first_paint)
+    
+    def _record_first_paint(self):
+        if self.first_paint_seconds is None:
+            self.first_paint_seconds = time.perf_counter() - STARTED
     
     def create_widgets(self):
         # إنشاء تبويبات
@@ -41,16 +376,52 @@ class GroceryStoreGUI:
         self.sell_tab = ttk.Frame(self.notebook)
         self.notebook.add(self.sell_tab, text="بيع سلعة")
         
+        # تبويب الصلاحية ودفعات المخزون
+        self.expiry_tab = ttk.Frame(self.notebook)
+        self.notebook.add(self.expiry_tab, text="الصلاحية")
+        
         # تبويب الإحصائيات
         self.stats_tab = ttk.Frame(self.notebook)
         self.notebook.add(self.stats_tab, text="الإحصائيات")
         
-        # بناء كل تبويب
-        self.build_products_tab()
-        self.build_add_tab()
-        self.build_edit_tab()
-        self.build_sell_tab()
-        self.build_stats_tab()
+        # تبويب التشخيص (اختياري)
+        if self.diagnostics:
+            self.diagnostics_tab = ttk.Frame(self.notebook)
+            self.notebook.add(self.diagnostics_tab, text="التشخيص")
+        
+        self.tab_builders = {
+            str(self.products_tab): self.build_products_tab,
+            str(self.add_tab): self.build_add_tab,
+            str(self.edit_tab): self.build_edit_tab,
+            str(self.sell_tab): self.build_sell_tab,
+            str(self.expiry_tab): self.build_expiry_tab,
+            str(self.stats_tab): self.build_stats_tab,
+        }
+        if self.diagnostics:
+            self.tab_builders[str(self.diagnostics_tab)] = self.build_diagnostics_tab
+        self.built_tabs = set()
+        
+        if self.fast_start:
+            # يُبنى تبويب السلع فقط، وبقية التبويبات عند اختيارها أول مرة
+            # (معطلة حتى يجهز المدير)
+            self.build_tab(self.products_tab)
+            for tab in self.notebook.tabs()[1:]:
+                self.notebook.tab(tab, state='disabled')
+            self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+        else:
+            # بناء كل تبويب
+            for tab in list(self.tab_builders):
+                self.build_tab(tab)
+    
+    def build_tab(self, tab):
+        # بناء محتوى التبويب مرة واحدة فقط
+        tab = str(tab)
+        if tab not in self.built_tabs:
+            self.built_tabs.add(tab)
+            self.tab_builders[tab]()
+    
+    def on_tab_changed(self, event):
+        self.build_tab(self.notebook.select())
     
     def build_products_tab(self):
         # إطار البحث
@@ -62,11 +433,22 @@ class GroceryStoreGUI:
         self.search_entry.pack(side='right', padx=5)
         self.search_entry.bind('<KeyRelease>', self.on_search)
         
-        ttk.Button(search_frame, text="عرض الكل", 
-                  command=self.refresh_products).pack(side='right', padx=5)
+        show_all = ttk.Button(search_frame, text="عرض الكل", 
+                             command=self.refresh_products)
+        show_all.pack(side='right', padx=5)
         
-        ttk.Button(search_frame, text="السلع المنخفضة", 
-                  command=self.show_low_stock).pack(side='right', padx=5)
+        low_stock = ttk.Button(search_frame, text="السلع المنخفضة", 
+                              command=self.show_low_stock)
+        low_stock.pack(side='right', padx=5)
+        
+        # أزرار تحتاج المدير (معطلة في البدء السريع حتى يجهز)
+        self.products_buttons = (show_all, low_stock)
+        if self.fast_start:
+            for button in self.products_buttons:
+                button.config(state='disabled')
+        
+        self.search_status = ttk.Label(search_frame, text="")
+        self.search_status.pack(side='left', padx=5)
         
         # جدول السلع
         columns = ('رقم السلعة', 'الاسم', 'الفئة', 'السعر', 'الكمية', 'المباع', 'الحالة')
@@ -78,11 +460,14 @@ class GroceryStoreGUI:
             self.products_tree.column(col, width=120)
         
         # شريط التمرير
-        scrollbar = ttk.Scrollbar(self.products_tab, orient='vertical', command=self.products_tree.yview)
-        self.products_tree.configure(yscrollcommand=scrollbar.set)
+        scrollbar = ttk.Scrollbar(self.products_tab, orient='vertical')
         
         self.products_tree.pack(side='left', fill='both', expand=True, padx=10, pady=10)
         scrollbar.pack(side='right', fill='y', pady=10)
+        
+        # عرض افتراضي: لا تُنشأ إلا الصفوف الظاهرة وتُجلب البقية عند التمرير
+        self.product_table = VirtualProductTable(self.products_tree, scrollbar)
+        self.showing_all_products = False
     
     def build_add_tab(self):
         # نموذج إضافة سلعة
@@ -114,12 +499,16 @@ class GroceryStoreGUI:
         self.add_expiry = ttk.Entry(form_frame, width=30)
         self.add_expiry.grid(row=5, column=0, padx=10, pady=10, sticky='w')
         
+        ttk.Label(form_frame, text="الباركود (مفصولة بفواصل):").grid(row=6, column=1, padx=10, pady=10, sticky='e')
+        self.add_barcodes = ttk.Entry(form_frame, width=30)
+        self.add_barcodes.grid(row=6, column=0, padx=10, pady=10, sticky='w')
+        
         ttk.Button(form_frame, text="إضافة السلعة", 
-                  command=self.add_product).grid(row=6, column=0, columnspan=2, pady=20)
+                  command=self.add_product).grid(row=7, column=0, columnspan=2, pady=20)
         
         # منطقة النتائج
         self.add_result = scrolledtext.ScrolledText(form_frame, width=60, height=10, state='disabled')
-        self.add_result.grid(row=7, column=0, columnspan=2, padx=10, pady=10)
+        self.add_result.grid(row=8, column=0, columnspan=2, padx=10, pady=10)
     
     def build_edit_tab(self):
         # نموذج تعديل سلعة
@@ -167,6 +556,16 @@ class GroceryStoreGUI:
         self.edit_result.grid(row=8, column=0, columnspan=3, padx=10, pady=10)
     
     def build_sell_tab(self):
+        # البيع بمسح الباركود: الماسح يكتب الرمز ثم Enter فتُباع قطعة واحدة
+        scan_frame = ttk.LabelFrame(self.sell_tab, text="البيع بالباركود")
+        scan_frame.pack(fill='x', padx=20, pady=(10, 0))
+        
+        ttk.Label(scan_frame, text="الباركود:").pack(side='right', padx=5, pady=5)
+        self.scan_entry = ttk.Entry(scan_frame, width=30)
+        self.scan_entry.pack(side='right', padx=5)
+        self.scan_entry.bind('<Return>', lambda event: self.scan_and_sell())
+        self.scan_entry.focus_set()
+        
         # نموذج البيع
         form_frame = ttk.Frame(self.sell_tab)
         form_frame.pack(fill='both', expand=True, padx=20, pady=20)
@@ -182,9 +581,67 @@ class GroceryStoreGUI:
         ttk.Button(form_frame, text="إتمام البيع", 
                   command=self.sell_product).grid(row=2, column=0, columnspan=2, pady=20)
         
+        # سلة المشتريات (بيع عدة سلع في فاتورة واحدة)
+        basket_buttons = ttk.Frame(form_frame)
+        basket_buttons.grid(row=3, column=0, columnspan=2, pady=5)
+        
+        ttk.Button(basket_buttons, text="إضافة إلى السلة", 
+                  command=self.add_to_basket).pack(side='right', padx=5)
+        ttk.Button(basket_buttons, text="إتمام بيع السلة", 
+                  command=self.sell_basket).pack(side='right', padx=5)
+        ttk.Button(basket_buttons, text="تفريغ السلة", 
+                  command=self.clear_basket).pack(side='right', padx=5)
+        
+        self.basket = []
+        self.basket_list = tk.Listbox(form_frame, width=60, height=6)
+        self.basket_list.grid(row=4, column=0, columnspan=2, padx=10, pady=5)
+        
         # منطقة النتائج
-        self.sell_result = scrolledtext.ScrolledText(form_frame, width=60, height=15, state='disabled')
-        self.sell_result.grid(row=3, column=0, columnspan=2, padx=10, pady=10)
+        self.sell_result = scrolledtext.ScrolledText(form_frame, width=60, height=10, state='disabled')
+        self.sell_result.grid(row=5, column=0, columnspan=2, padx=10, pady=10)
+    
+    def build_expiry_tab(self):
+        # استلام دفعة جديدة
+        receive_frame = ttk.LabelFrame(self.expiry_tab, text="استلام دفعة")
+        receive_frame.pack(fill='x', padx=10, pady=10)
+        
+        ttk.Label(receive_frame, text="رقم السلعة:").pack(side='right', padx=5, pady=5)
+        self.lot_product_id = ttk.Entry(receive_frame, width=10)
+        self.lot_product_id.pack(side='right', padx=5)
+        
+        ttk.Label(receive_frame, text="الكمية:").pack(side='right', padx=5)
+        self.lot_quantity = ttk.Entry(receive_frame, width=10)
+        self.lot_quantity.pack(side='right', padx=5)
+        
+        ttk.Label(receive_frame, text="تاريخ الانتهاء (YYYY-MM-DD):").pack(side='right', padx=5)
+        self.lot_expiry = ttk.Entry(receive_frame, width=14)
+        self.lot_expiry.pack(side='right', padx=5)
+        
+        ttk.Button(receive_frame, text="استلام", 
+                  command=self.receive_stock).pack(side='right', padx=5)
+        
+        # الدفعات القريبة من الانتهاء
+        filter_frame = ttk.Frame(self.expiry_tab)
+        filter_frame.pack(fill='x', padx=10)
+        
+        ttk.Label(filter_frame, text="تنتهي خلال (أيام):").pack(side='right', padx=5)
+        self.expiry_days = ttk.Entry(filter_frame, width=6)
+        self.expiry_days.insert(0, "7")
+        self.expiry_days.pack(side='right', padx=5)
+        
+        ttk.Button(filter_frame, text="عرض", 
+                  command=self.show_expiring_lots).pack(side='right', padx=5)
+        
+        self.expiry_status = ttk.Label(filter_frame, text="")
+        self.expiry_status.pack(side='left', padx=5)
+        
+        columns = ('رقم الدفعة', 'رقم السلعة', 'الاسم', 'الفئة', 'الكمية', 'تاريخ الانتهاء', 'الأيام المتبقية')
+        self.expiry_tree = ttk.Treeview(self.expiry_tab, columns=columns, show='headings', height=15)
+        for col in columns:
+            self.expiry_tree.heading(col, text=col)
+            self.expiry_tree.column(col, width=110)
+        self.expiry_tree.tag_configure('expired', foreground='red')
+        self.expiry_tree.pack(fill='both', expand=True, padx=10, pady=10)
     
     def build_stats_tab(self):
         # عرض الإحصائيات
@@ -200,58 +657,112 @@ class GroceryStoreGUI:
         # عرض الإحصائيات عند فتح التبويب - مؤقتاً سنعلق هذا السطر
         # self.show_stats()  # تم تعليق هذا السطر لحل المشكلة
     
+    def build_diagnostics_tab(self):
+        # أزمنة العمليات والاستعلامات وسجل الاستعلامات البطيئة
+        control_frame = ttk.Frame(self.diagnostics_tab)
+        control_frame.pack(fill='x', padx=10, pady=10)
+        
+        # قد يُبنى التبويب قبل إنشاء المدير: القياس يُفعّل عند إنشائه مع لوحة التشخيص
+        self.metrics_enabled = tk.BooleanVar(
+            value=self.manager.metrics.enabled if self.manager is not None else self.diagnostics)
+        ttk.Checkbutton(control_frame, text="تفعيل القياس", variable=self.metrics_enabled,
+                        command=self.toggle_metrics).pack(side='right', padx=5)
+        ttk.Button(control_frame, text="تحديث", 
+                  command=self.show_diagnostics).pack(side='right', padx=5)
+        ttk.Button(control_frame, text="تصفير", 
+                  command=self.reset_diagnostics).pack(side='right', padx=5)
+        
+        self.diagnostics_status = ttk.Label(control_frame, text="")
+        self.diagnostics_status.pack(side='left', padx=5)
+        
+        columns = ('الاسم', 'الاستدعاءات', 'الإجمالي ms', 'p50 µs', 'p95 µs', 'p99 µs', 'الأقصى µs')
+        self.diagnostics_tree = ttk.Treeview(self.diagnostics_tab, columns=columns, show='headings', height=14)
+        for col in columns:
+            self.diagnostics_tree.heading(col, text=col)
+            self.diagnostics_tree.column(col, width=90)
+        self.diagnostics_tree.column('الاسم', width=380)
+        self.diagnostics_tree.tag_configure('query', foreground='#1f4e9c')
+        self.diagnostics_tree.pack(fill='both', expand=True, padx=10)
+        
+        ttk.Label(self.diagnostics_tab, text="الاستعلامات البطيئة:").pack(anchor='e', padx=10, pady=(10, 0))
+        self.slow_queries_text = scrolledtext.ScrolledText(self.diagnostics_tab, height=8, state='disabled')
+        self.slow_queries_text.pack(fill='both', padx=10, pady=10)
+    
     def refresh_products(self):
-        # تحديث جدول السلع
-        for item in self.products_tree.get_children():
-            self.products_tree.delete(item)
-        
-        df = self.manager.get_all_products()
-        for _, row in df.iterrows():
-            self.products_tree.insert('', 'end', values=(
-                row['product_id'],
-                row['name'],
-                row['category'],
-                f"{row['price']:.2f}",
-                row['quantity'],
-                row['sold_quantity'],
-                row['status']
-            ))
+        # تحديث جدول السلع (تُحدّث الصفوف المتغيرة فقط إذا كان الجدول يعرض كل السلع)
+        self.search.cancel()
+        if self.showing_all_products:
+            self.product_table.refresh()
+        else:
+            self.showing_all_products = True
+            self.product_table.set_source(
+                self.manager.count_products,
+                lambda offset, limit, after_id: self.manager.get_products_page(limit, offset, after_id)
+            )
+    
+    def poll_changes(self):
+        # فحص دوري رخيص لسجل التغييرات (يلتقط تعديلات الطرفيات الأخرى)
+        try:
+            self.apply_changes(show_all=False)
+        finally:
+            self.root.after(self.poll_changes_ms, self.poll_changes)
+    
+    def apply_changes(self, show_all=True):
+        # تحديث الصفوف التي تغيرت منذ آخر فحص فقط، أو إعادة القراءة إذا قُصّ السجل
+        # (بعد تعديل من هذه الواجهة يُعرض جدول كل السلع كما في السابق)
+        feed = self.manager.changes_since(self.change_seq)
+        self.change_seq = feed.seq
+        if not self.showing_all_products:
+            if show_all:
+                self.refresh_products()
+            return
+        
+        if feed.reset or feed.more:
+            # تغييرات كثيرة أو سجل مقصوص: إعادة قراءة النافذة والتقدم إلى آخر السجل
+            self.change_seq = self.manager.latest_change_seq()
+            self.product_table.refresh()
+        elif feed.upserts or feed.deleted:
+            self.product_table.patch(
+                [(row.product_id, row.name, row.category, row.price, row.quantity, row.sold_quantity, row.status)
+                 for row in feed.upserts],
+                feed.deleted)
     
     def on_search(self, event):
-        # البحث أثناء الكتابة
+        # البحث أثناء الكتابة (يُرسل إلى خيط البحث بعد توقف الكتابة)
+        if self.search is None:
+            return
         search_term = self.search_entry.get()
         if search_term:
-            df = self.manager.search_products(search_term)
-            for item in self.products_tree.get_children():
-                self.products_tree.delete(item)
-            
-            for _, row in df.iterrows():
-                self.products_tree.insert('', 'end', values=(
-                    row['product_id'],
-                    row['name'],
-                    row['category'],
-                    f"{row['price']:.2f}",
-                    row['quantity'],
-                    row['sold_quantity'],
-                    '---'
-                ))
+            self.search.submit(search_term)
+        else:
+            self.search.cancel()
+    
+    def show_search_results(self, search_term, results, error, elapsed):
+        # عرض نتائج البحث (تُستدعى من الخيط الرئيسي)
+        if error is not None:
+            self.search_status.config(text=f"خطأ في البحث: {error}")
+            return
+        
+        rows = [
+            (row.product_id, row.name, row.category, row.price, row.quantity, row.sold_quantity, '---')
+            for row in results
+        ]
+        self.showing_all_products = False
+        self.product_table.set_rows(rows)
+        
+        stats = self.search.latency_stats()
+        self.search_status.config(
+            text=f"{len(rows)} نتيجة في {elapsed * 1000:.1f} ms (p95: {stats['p95_ms']:.1f} ms)")
     
     def show_low_stock(self):
         # عرض السلع المنخفضة المخزون
-        df = self.manager.get_low_stock_products()
-        for item in self.products_tree.get_children():
-            self.products_tree.delete(item)
-        
-        for _, row in df.iterrows():
-            self.products_tree.insert('', 'end', values=(
-                row['product_id'],
-                row['name'],
-                row['category'],
-                f"{row['price']:.2f}",
-                row['quantity'],
-                '---',
-                'منخفض'
-            ))
+        self.search.cancel()
+        rows = [
+            (row.product_id, row.name, row.category, row.price, row.quantity, '---', 'منخفض')
+            for row in self.manager.iter_low_stock_products()
+        ]
+        self.showing_all_products = False
+        self.product_table.set_rows(rows)
     
     def add_product(self):
         # إضافة سلعة جديدة
@@ -262,12 +773,18 @@ class GroceryStoreGUI:
             quantity = int(self.add_quantity.get())
             min_stock = int(self.add_min_stock.get() or "5")
             expiry = self.add_expiry.get() or None
+            barcodes = [code.strip() for code in self.add_barcodes.get().split(',') if code.strip()]
             
             if not name or not category:
                 messagebox.showerror("خطأ", "الاسم والفئة مطلوبان")
                 return
             
-            product_id = self.manager.add_product(name, category, price, quantity, min_stock, expiry)
+            for code in barcodes:
+                if self.manager.find_by_barcode(code) is not None:
+                    messagebox.showerror("خطأ", f"الباركود {code} مستخدم لسلعة أخرى")
+                    return
+            
+            product_id = self.manager.add_product(name, category, price, quantity, min_stock, expiry, barcodes)
             
             self.add_result.config(state='normal')
             self.add_result.delete(1.0, tk.END)
@@ -281,11 +798,12 @@ class GroceryStoreGUI:
             self.add_quantity.delete(0, tk.END)
             self.add_min_stock.delete(0, tk.END)
             self.add_expiry.delete(0, tk.END)
+            self.add_barcodes.delete(0, tk.END)
             self.add_min_stock.insert(0, "5")
             
-            # تحديث جدول السلع
-            self.refresh_products()
-            
+            # تحديث الصفوف المتغيرة فقط من سجل التغييرات
+            self.apply_changes()
+        
         except ValueError as e:
             messagebox.showerror("خطأ", "تأكد من صحة البيانات المدخلة")
         except Exception as e:
@@ -295,39 +813,36 @@ class GroceryStoreGUI:
         # جلب بيانات سلعة للتعديل
         try:
             product_id = int(self.edit_id.get())
-            df = self.manager.get_all_products()
-            product = df[df['product_id'] == product_id]
+            product = self.manager.get_product(product_id)
             
-            if product.empty:
+            if product is None:
                 messagebox.showerror("خطأ", "لم يتم العثور على السلعة")
                 return
             
-            product = product.iloc[0]
-            
             self.edit_name.delete(0, tk.END)
-            self.edit_name.insert(0, product['name'])
+            self.edit_name.insert(0, product.name)
             
             self.edit_category.delete(0, tk.END)
-            self.edit_category.insert(0, product['category'])
+            self.edit_category.insert(0, product.category)
             
             self.edit_price.delete(0, tk.END)
-            self.edit_price.insert(0, str(product['price']))
+            self.edit_price.insert(0, str(product.price))
             
             self.edit_quantity.delete(0, tk.END)
-            self.edit_quantity.insert(0, str(product['quantity']))
+            self.edit_quantity.insert(0, str(product.quantity))
             
             self.edit_min_stock.delete(0, tk.END)
-            self.edit_min_stock.insert(0, str(product['min_stock_level']))
+            self.edit_min_stock.insert(0, str(product.min_stock_level))
             
             self.edit_expiry.delete(0, tk.END)
-            if pd.notna(product['expiry_date']):
-                self.edit_expiry.insert(0, str(product['expiry_date']))
+            if product.expiry_date is not None:
+                self.edit_expiry.insert(0, str(product.expiry_date))
             
             self.edit_result.config(state='normal')
             self.edit_result.delete(1.0, tk.END)
-            self.edit_result.insert(tk.END, f"تم تحميل بيانات السلعة:\n{product['name']}")
+            self.edit_result.insert(tk.END, f"تم تحميل بيانات السلعة:\n{product.name}")
             self.edit_result.config(state='disabled')
-            
+        
         except ValueError:
             messagebox.showerror("خطأ", "رقم السلعة يجب أن يكون رقماً")
         except Exception as e:
@@ -360,13 +875,13 @@ class GroceryStoreGUI:
                     self.edit_result.insert(tk.END, "تم تحديث بيانات السلعة بنجاح")
                     self.edit_result.config(state='disabled')
                     
-                    # تحديث جدول السلع
-                    self.refresh_products()
+                    # تحديث الصفوف المتغيرة فقط من سجل التغييرات
+                    self.apply_changes()
                 else:
                     messagebox.showerror("خطأ", "فشل في تحديث البيانات")
             else:
                 messagebox.showwarning("تحذير", "لم تدخل أي بيانات للتحديث")
-                
+        
         except ValueError:
             messagebox.showerror("خطأ", "تأكد من صحة البيانات المدخلة")
         except Exception as e:
@@ -394,11 +909,11 @@ class GroceryStoreGUI:
                     self.edit_min_stock.delete(0, tk.END)
                     self.edit_expiry.delete(0, tk.END)
                     
-                    # تحديث جدول السلع
-                    self.refresh_products()
+                    # تحديث الصفوف المتغيرة فقط من سجل التغييرات
+                    self.apply_changes()
                 else:
                     messagebox.showerror("خطأ", "فشل في حذف السلعة")
-                    
+        
         except ValueError:
             messagebox.showerror("خطأ", "رقم السلعة يجب أن يكون رقماً")
         except Exception as e:
@@ -421,16 +936,139 @@ class GroceryStoreGUI:
                 self.sell_id.delete(0, tk.END)
                 self.sell_quantity.delete(0, tk.END)
                 
-                # تحديث جدول السلع
-                self.refresh_products()
+                # تحديث الصفوف المتغيرة فقط من سجل التغييرات
+                self.apply_changes()
             else:
                 messagebox.showerror("خطأ", "فشل في عملية البيع")
-                
+        
         except ValueError:
             messagebox.showerror("خطأ", "تأكد من صحة البيانات المدخلة")
         except Exception as e:
             messagebox.showerror("خطأ", f"حدث خطأ: {str(e)}")
     
+    def scan_and_sell(self):
+        # بيع قطعة من السلعة الممسوحة وتجهيز الحقل للمسح التالي
+        barcode = self.scan_entry.get().strip()
+        self.scan_entry.delete(0, tk.END)
+        if not barcode:
+            return
+        
+        try:
+            product = self.manager.scan_and_sell(barcode)
+        except Exception as e:
+            messagebox.showerror("خطأ", f"حدث خطأ: {str(e)}")
+            return
+        
+        self.sell_result.config(state='normal')
+        self.sell_result.delete(1.0, tk.END)
+        if product is None:
+            self.sell_result.insert(tk.END, f"لم يتم البيع: الباركود {barcode} غير معروف أو المخزون غير كافٍ")
+        else:
+            self.sell_result.insert(tk.END, f"تم البيع بنجاح!\n\n{product.name}\nالسعر: {product.price} ريال")
+            self.apply_changes()
+        self.sell_result.config(state='disabled')
+    
+    def add_to_basket(self):
+        # إضافة سطر إلى السلة
+        try:
+            product_id = int(self.sell_id.get())
+            quantity = int(self.sell_quantity.get())
+            
+            if quantity <= 0:
+                messagebox.showerror("خطأ", "الكمية يجب أن تكون أكبر من صفر")
+                return
+            
+            self.basket.append((product_id, quantity))
+            self.basket_list.insert(tk.END, f"رقم السلعة: {product_id} - الكمية: {quantity}")
+            
+            # تفريغ الحقول
+            self.sell_id.delete(0, tk.END)
+            self.sell_quantity.delete(0, tk.END)
+        
+        except ValueError:
+            messagebox.showerror("خطأ", "تأكد من صحة البيانات المدخلة")
+    
+    def clear_basket(self):
+        # تفريغ السلة
+        self.basket = []
+        self.basket_list.delete(0, tk.END)
+    
+    def sell_basket(self):
+        # بيع جميع سلع السلة في فاتورة واحدة
+        if not self.basket:
+            messagebox.showwarning("تحذير", "السلة فارغة")
+            return
+        
+        try:
+            receipt = self.manager.sell_many(self.basket)
+            
+            self.sell_result.config(state='normal')
+            self.sell_result.delete(1.0, tk.END)
+            
+            if receipt['success']:
+                self.sell_result.insert(tk.END, "تم بيع السلة بنجاح!\n\n")
+                for line in receipt['lines']:
+                    self.sell_result.insert(tk.END, f"{line['name']} × {line['quantity']} = {line['total_price']:.2f} ريال\n")
+                self.sell_result.insert(tk.END, f"\nالمجموع: {receipt['total_price']:.2f} ريال")
+                self.clear_basket()
+                
+                # تحديث الصفوف المتغيرة فقط من سجل التغييرات
+                self.apply_changes()
+            else:
+                self.sell_result.insert(tk.END, "فشل بيع السلة، لم يتم تنفيذ أي سطر:\n\n")
+                for line in receipt['lines']:
+                    if line['error']:
+                        self.sell_result.insert(tk.END, f"رقم السلعة {line['product_id']}: {line['error']}\n")
+            
+            self.sell_result.config(state='disabled')
+        
+        except Exception as e:
+            messagebox.showerror("خطأ", f"حدث خطأ: {str(e)}")
+    
+    def receive_stock(self):
+        # استلام دفعة جديدة بتاريخ انتهائها
+        try:
+            product_id = int(self.lot_product_id.get())
+            quantity = int(self.lot_quantity.get())
+            expiry = self.lot_expiry.get() or None
+            
+            lot_id = self.manager.receive_stock(product_id, quantity, expiry)
+            if lot_id is None:
+                messagebox.showerror("خطأ", f"لا توجد سلعة برقم {product_id}")
+                return
+            
+            messagebox.showinfo("نجاح", f"تم استلام الدفعة رقم {lot_id}")
+            self.lot_product_id.delete(0, tk.END)
+            self.lot_quantity.delete(0, tk.END)
+            self.lot_expiry.delete(0, tk.END)
+            self.show_expiring_lots()
+            self.apply_changes()
+        
+        except ValueError as e:
+            messagebox.showerror("خطأ", f"تأكد من صحة البيانات المدخلة\n{e}")
+    
+    def show_expiring_lots(self):
+        # عرض الدفعات التي تنتهي خلال المدة المحددة (والمنتهية بالأحمر)
+        try:
+            days = int(self.expiry_days.get() or "7")
+        except ValueError:
+            messagebox.showerror("خطأ", "عدد الأيام غير صالح")
+            return
+        
+        start = time.perf_counter()
+        lots = self.manager.get_expiring_lots(days)
+        elapsed = time.perf_counter() - start
+        
+        self.expiry_tree.delete(*self.expiry_tree.get_children())
+        for lot in lots:
+            self.expiry_tree.insert('', 'end', values=(
+                lot.lot_id, lot.product_id, lot.name, lot.category, lot.quantity, lot.expiry_date, lot.days_left
+            ), tags=('expired',) if lot.days_left < 0 else ())
+        
+        expired = sum(1 for lot in lots if lot.days_left < 0)
+        self.expiry_status.config(
+            text=f"{len(lots)} دفعة (منتهية: {expired}) في {elapsed * 1000:.2f} ms")
+    
     def show_stats(self):
         # عرض الإحصائيات
         stats = self.manager.get_product_stats()
@@ -452,8 +1090,80 @@ class GroceryStoreGUI:
                 self.stats_text.insert(tk.END, f"{key}: {value}\n")
         
         self.stats_text.config(state='disabled')
+    
+    def toggle_metrics(self):
+        # تفعيل القياس أو إيقافه أثناء التشغيل
+        if self.metrics_enabled.get():
+            self.manager.enable_metrics()
+        else:
+            self.manager.disable_metrics()
+        self.show_diagnostics()
+    
+    def reset_diagnostics(self):
+        self.manager.metrics.reset()
+        self.show_diagnostics()
+    
+    def show_diagnostics(self):
+        # عرض أزمنة العمليات ثم الاستعلامات، الأغلى إجمالاً أولاً
+        metrics = self.manager.get_metrics()
+        
+        self.diagnostics_tree.delete(*self.diagnostics_tree.get_children())
+        for kind, tags in (('methods', ()), ('queries', ('query',))):
+            for name, data in metrics[kind].items():
+                self.diagnostics_tree.insert('', 'end', values=(
+                    name, data['calls'], f"{data['total_ms']:.1f}", f"{data['p50_us']:.0f}",
+                    f"{data['p95_us']:.0f}", f"{data['p99_us']:.0f}", f"{data['max_us']:.0f}"
+                ), tags=tags)
+        
+        self.slow_queries_text.config(state='normal')
+        self.slow_queries_text.delete(1.0, tk.END)
+        for entry in reversed(metrics['slow_queries']):
+            self.slow_queries_text.insert(tk.END, f"{entry['time']}  {entry['ms']:.1f} ms  {entry['sql']}\n")
+        self.slow_queries_text.config(state='disabled')
+        
+        counters = metrics['counters']
+        status = f"أوامر SQL: {counters.get('sql.statements', 0)}، خطوات SQLite: {counters.get('sql.vm_steps', 0)}"
+        if self.manager.replica is not None:
+            lag = self.manager.replica.lag()
+            status += "، عمر نسخة التقارير: " + ("لم تُنسخ بعد" if lag is None else f"{lag:.1f} ث")
+        self.diagnostics_status.config(text=status)
 
-if __name__ == "__main__":
+def main(argv=None):
+    import argparse
+    import json
+    from grocery_metrics import configure_logging
+    
+    parser = argparse.ArgumentParser(description="واجهة محل المواد الغذائية")
+    parser.add_argument('--db', default='grocery_store.db', help="ملف قاعدة البيانات")
+    parser.add_argument('--fast-start', action='store_true',
+                        help="إظهار النافذة فوراً وبناء التبويبات وتحميل البيانات عند الحاجة")
+    parser.add_argument('--diagnostics', action='store_true', help="قياس الأزمنة وإظهار تبويب التشخيص")
+    parser.add_argument('--replica-lag', type=float, default=None,
+                        help="قراءة التقارير من نسخة متماثلة لا يتجاوز عمرها هذا العدد من الثواني")
+    parser.add_argument('--log-level', default='INFO', help="مستوى رسائل السجل (DEBUG، INFO، WARNING ...)")
+    parser.add_argument('--startup-report', action='store_true',
+                        help="طباعة زمن أول رسم وزمن الجاهزية (JSON) ثم الخروج")
+    args = parser.parse_args(argv)
+    configure_logging(args.log_level.upper())
+    
     root = tk.Tk()
-    app = GroceryStoreGUI(root)
+    app = GroceryStoreGUI(root, diagnostics=args.diagnostics, db_name=args.db, fast_start=args.fast_start,
+                          replica_lag=args.replica_lag)
+    
+    if args.startup_report:
+        def report():
+            if app.first_paint_seconds is None or app.ready_seconds is None:
+                root.after(5, report)
+                return
+            print(json.dumps({
+                'fast_start': args.fast_start,
+                'first_paint_ms': app.first_paint_seconds * 1000,
+                'ready_ms': app.ready_seconds * 1000,
+            }))
+            root.destroy()
+        root.after(5, report)
+    
     root.mainloop()
+
+if __name__ == "__main__":
+    main()
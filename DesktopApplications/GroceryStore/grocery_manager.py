@@ -1,105 +1,958 @@
 # grocery_manager.py - نفس الكود السابق تماماً
+import functools
 import sqlite3
 import os
-from datetime import datetime
-import pandas as pd
+from collections import namedtuple
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+from grocery_cache import ProductCache
+from grocery_db import ConnectionManager
+from grocery_metrics import Metrics, SqlProfiler, instrument_methods, logger, untimed
+from grocery_replica import ReportingReplica
+from grocery_text import fts_query, search_text
+from grocery_writebehind import SalesWriteBehind
 
+# ترحيلات المخطط: (رقم الإصدار، أوامر SQL) تُطبق بالترتيب حسب PRAGMA user_version
+SCHEMA_MIGRATIONS = [
+    (1, [
+        'CREATE INDEX IF NOT EXISTS idx_sales_product_date ON sales (product_id, sale_date)',
+        'CREATE INDEX IF NOT EXISTS idx_products_category ON products (category)',
+        'CREATE INDEX IF NOT EXISTS idx_products_stock ON products (quantity, min_stock_level)',
+    ]),
+    (2, [
+        lambda conn: create_search_index(conn),
+    ]),
+    (3, [
+        lambda conn: create_stats_summary(conn),
+    ]),
+    (4, [
+        lambda conn: create_sales_rollups(conn),
+    ]),
+    (5, [
+        'CREATE INDEX IF NOT EXISTS idx_sales_date ON sales (sale_date)',
+        lambda conn: create_deleted_products(conn),
+        lambda conn: create_sales_archive_log(conn),
+    ]),
+    (6, [
+        lambda conn: create_stock_lots(conn),
+    ]),
+    (7, [
+        lambda conn: create_change_journal(conn),
+    ]),
+    (8, [
+        lambda conn: create_product_barcodes(conn),
+    ]),
+    (9, [
+        lambda conn: create_search_triggers(conn),
+    ]),
+]
+
+# الإحصائيات العامة محسوبة بمسح كامل لجدول السلع (تُستخدم للبناء والتحقق فقط)
+STATS_AGGREGATE_QUERY = '''
+    SELECT 
+        COUNT(*),
+        IFNULL(SUM(quantity), 0),
+        IFNULL(SUM(sold_quantity), 0),
+        IFNULL(SUM(price * quantity), 0),
+        IFNULL(SUM(price * sold_quantity), 0),
+        IFNULL(SUM(quantity <= min_stock_level AND quantity > 0), 0),
+        IFNULL(SUM(quantity = 0), 0)
+    FROM products
+'''
+
+STATS_COLUMNS = ['total_products', 'total_quantity', 'total_sold', 'stock_value',
+                 'sales_value', 'low_stock_count', 'out_of_stock_count']
+
+# صف سلعة خفيف (namedtuple بدون قاموس لكل كائن) يُبنى مباشرة من المؤشر
+ProductRow = namedtuple('ProductRow', [
+    'product_id', 'name', 'category', 'price', 'quantity', 'sold_quantity',
+    'min_stock_level', 'expiry_date', 'status', 'total_value'
+])
+
+PRODUCT_ROW_QUERY = '''
+    SELECT 
+        p.product_id,
+        p.name,
+        p.category,
+        p.price,
+        p.quantity,
+        p.sold_quantity,
+        p.min_stock_level,
+        p.expiry_date,
+        CASE 
+            WHEN p.quantity = 0 THEN 'منتهي'
+            WHEN p.quantity <= p.min_stock_level THEN 'منخفض'
+            ELSE 'متوفر'
+        END as status,
+        (p.price * (p.quantity + p.sold_quantity)) as total_value
+    FROM products p
+'''
+
+# أعمدة السلعة المشتركة بين products وdeleted_products
+PRODUCT_COLUMNS = '''product_id, name, category, price, quantity, sold_quantity,
+               min_stock_level, expiry_date, created_date, last_updated'''
+
+def product_row_factory(cursor, row):
+    return ProductRow._make(row)
+
+def rows_to_dataframe(rows, columns=ProductRow._fields):
+    """تحويل صفوف السلع إلى DataFrame (تُستورد pandas عند الحاجة فقط)"""
+    import pandas as pd
+    
+    df = pd.DataFrame.from_records(list(rows), columns=ProductRow._fields)
+    return df[list(columns)]
+
+# الاستعلامات الأكثر استخداماً والفهرس المتوقع لكل منها
+HOT_QUERIES = {
+    'low_stock': (
+        'SELECT product_id FROM products WHERE quantity <= min_stock_level AND quantity > 0 ORDER BY quantity ASC',
+        (), 'idx_products_stock'),
+    'out_of_stock': (
+        'SELECT COUNT(*) FROM products WHERE quantity = 0',
+        (), 'idx_products_stock'),
+    'by_category': (
+        'SELECT product_id FROM products WHERE category = ?',
+        ('',), 'idx_products_category'),
+    'sales_before': (
+        'SELECT MIN(sale_date) FROM sales WHERE sale_date < ?',
+        ('',), 'idx_sales_date'),
+    'product_sales_period': (
+        'SELECT SUM(total_price) FROM sales WHERE product_id = ? AND sale_date >= ?',
+        (0, ''), 'idx_sales_product_date'),
+    'expiring_lots': (
+        'SELECT lot_id FROM stock_lots WHERE quantity > 0 AND expiry_date <= ? ORDER BY expiry_date',
+        ('',), 'idx_stock_lots_expiry'),
+    'product_lots': (
+        'SELECT lot_id FROM stock_lots WHERE product_id = ? AND quantity > 0',
+        (0,), 'idx_stock_lots_product'),
+    'changes_since': (
+        'SELECT seq, table_name, row_id, operation FROM change_journal WHERE seq > ? ORDER BY seq LIMIT ?',
+        (0, 1000), 'USING INTEGER PRIMARY KEY (rowid>?)'),
+    'barcode': (
+        'SELECT product_id FROM product_barcodes WHERE barcode = ?',
+        ('',), 'USING PRIMARY KEY (barcode=?)'),
+}
+
+def create_search_index(conn):
+    """إنشاء فهرس البحث النصي FTS5 وملئه من جدول السلع
+    
+    يُخزّن في الفهرس نص موحّد (بدون تشكيل وبأشكال حروف موحدة) تحسبه
+    search_text في Python. إذا لم تدعم نسخة SQLite وحدة FTS5 يبقى البحث
+    على LIKE.
+    """
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_fts
+            USING fts5(name, category, tokenize = 'unicode61 remove_diacritics 2')
+        ''')
+    except sqlite3.OperationalError:
+        logger.warning("وحدة FTS5 غير متاحة، سيُستخدم البحث العادي")
+        return
+    
+    create_search_triggers(conn)
+    conn.execute('INSERT OR IGNORE INTO products_fts_pending (product_id) SELECT product_id FROM products')
+    update_search_index(conn)
+
+def create_search_triggers(conn):
+    """مشغلات تسجّل السلع التي تغير اسمها أو فئتها في products_fts_pending
+    
+    لا تستدعي المشغلات أي دالة Python، فيبقى المخطط صالحاً لأي اتصال
+    (sqlite3 من سطر الأوامر أو أداة أخرى). توحيد النص وكتابته في الفهرس
+    يتم في update_search_index. تحل محل مشغلات الإصدار 2 التي كانت تستدعي
+    search_text داخل SQL.
+    """
+    if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'").fetchall():
+        return
+    
+    for trigger in ('products_fts_insert', 'products_fts_update', 'products_fts_delete'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS products_fts_pending (
+            product_id INTEGER PRIMARY KEY
+        )
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_fts_pending_insert AFTER INSERT ON products BEGIN
+            INSERT OR IGNORE INTO products_fts_pending (product_id) VALUES (new.product_id);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_fts_pending_update AFTER UPDATE OF name, category ON products BEGIN
+            INSERT OR IGNORE INTO products_fts_pending (product_id) VALUES (new.product_id);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS products_fts_pending_delete AFTER DELETE ON products BEGIN
+            DELETE FROM products_fts WHERE rowid = old.product_id;
+            DELETE FROM products_fts_pending WHERE product_id = old.product_id;
+        END
+    ''')
+
+def update_search_index(conn):
+    """كتابة النص الموحّد للسلع المسجلة في products_fts_pending في فهرس البحث
+    
+    تُستدعى داخل معاملة كتابة؛ تعيد عدد السلع التي أعيدت فهرستها.
+    """
+    rows = conn.execute('''
+        SELECT q.product_id, p.name, p.category
+        FROM products_fts_pending q
+        JOIN products p ON p.product_id = q.product_id
+    ''').fetchall()
+    if not rows:
+        conn.execute('DELETE FROM products_fts_pending')
+        return 0
+    
+    conn.execute('DELETE FROM products_fts WHERE rowid IN (SELECT product_id FROM products_fts_pending)')
+    conn.executemany('INSERT INTO products_fts (rowid, name, category) VALUES (?, ?, ?)',
+                     [(product_id, search_text(name), search_text(category)) for product_id, name, category in rows])
+    conn.execute('DELETE FROM products_fts_pending')
+    return len(rows)
+
+def _stats_delta(row, sign):
+    """تعبير SQL لمساهمة صف (new أو old) في الإحصائيات بالإشارة المحددة"""
+    return {
+        'total_products': f'{sign}1',
+        'total_quantity': f'{sign}IFNULL({row}.quantity, 0)',
+        'total_sold': f'{sign}IFNULL({row}.sold_quantity, 0)',
+        'stock_value': f'{sign}IFNULL({row}.price * {row}.quantity, 0)',
+        'sales_value': f'{sign}IFNULL({row}.price * {row}.sold_quantity, 0)',
+        'low_stock_count': f'{sign}IFNULL({row}.quantity <= {row}.min_stock_level AND {row}.quantity > 0, 0)',
+        'out_of_stock_count': f'{sign}IFNULL({row}.quantity = 0, 0)',
+    }
+
+def create_stats_summary(conn):
+    """إنشاء جدول الإحصائيات المجمّعة ومشغلات تحديثه التدريجي
+    
+    صف واحد يُحدَّث بفرق كل إضافة أو تعديل أو حذف على جدول السلع، فتصبح
+    قراءة الإحصائيات ثابتة الكلفة مهما كبر عدد السلع.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS product_stats (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            total_products INTEGER NOT NULL DEFAULT 0,
+            total_quantity INTEGER NOT NULL DEFAULT 0,
+            total_sold INTEGER NOT NULL DEFAULT 0,
+            stock_value REAL NOT NULL DEFAULT 0,
+            sales_value REAL NOT NULL DEFAULT 0,
+            low_stock_count INTEGER NOT NULL DEFAULT 0,
+            out_of_stock_count INTEGER NOT NULL DEFAULT 0
+        )
+    ''')
+    
+    insert = _stats_delta('new', '+')
+    delete = _stats_delta('old', '-')
+    triggers = {
+        'product_stats_insert': ('AFTER INSERT ON products',
+                                 {column: f'{column} {insert[column]}' for column in STATS_COLUMNS}),
+        'product_stats_delete': ('AFTER DELETE ON products',
+                                 {column: f'{column} {delete[column]}' for column in STATS_COLUMNS}),
+        'product_stats_update': ('AFTER UPDATE OF price, quantity, sold_quantity, min_stock_level ON products',
+                                 {column: f'{column} {insert[column]} {delete[column]}'
+                                  for column in STATS_COLUMNS if column != 'total_products'}),
+    }
+    for name, (event, assignments) in triggers.items():
+        updates = ', '.join(f'{column} = {expression}' for column, expression in assignments.items())
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {name} {event} BEGIN
+                UPDATE product_stats SET {updates} WHERE id = 1;
+            END
+        ''')
+    
+    rebuild_stats_summary(conn)
+
+def rebuild_stats_summary(conn):
+    """إعادة حساب صف الإحصائيات من الصفر بمسح كامل لجدول السلع"""
+    values = conn.execute(STATS_AGGREGATE_QUERY).fetchall()[0]
+    conn.execute(f'''
+        INSERT OR REPLACE INTO product_stats (id, {', '.join(STATS_COLUMNS)})
+        VALUES (1, {', '.join('?' * len(STATS_COLUMNS))})
+    ''', values)
+
+# جداول تجميع المبيعات: الفترة -> (الجدول، طول بادئة sale_date التي تحدد الفترة)
+# sale_date مخزّن بصيغة 'YYYY-MM-DD HH:MM:SS' فتكون البادئات 'YYYY-MM' و'YYYY-MM-DD' و'YYYY-MM-DD HH'
+SALES_ROLLUPS = {
+    'hour': ('sales_hourly', 13),
+    'day': ('sales_daily', 10),
+    'month': ('sales_monthly', 7),
+}
+
+PeriodRevenue = namedtuple('PeriodRevenue', ['bucket', 'quantity', 'revenue', 'sale_count'])
+TopSeller = namedtuple('TopSeller', ['product_id', 'name', 'category', 'quantity', 'revenue', 'sale_count'])
+CategorySales = namedtuple('CategorySales', ['category', 'quantity', 'revenue', 'sale_count', 'share'])
+
+StockLot = namedtuple('StockLot', ['lot_id', 'product_id', 'quantity', 'expiry_date', 'received_date'])
+# دفعة تغييرات من سجل التغييرات: seq آخر رقم مقروء (يُمرر في الطلب التالي)، reset يعني
+# أن السجل قُصّ بعد seq فيجب إعادة التحميل الكامل، more يعني وجود تغييرات لم تُقرأ بعد
+ChangeFeed = namedtuple('ChangeFeed', ['seq', 'reset', 'more', 'upserts', 'deleted', 'sales'])
+
+ExpiringLot = namedtuple('ExpiringLot', [
+    'lot_id', 'product_id', 'name', 'category', 'quantity', 'expiry_date', 'received_date', 'days_left'
+])
+
+def create_sales_rollups(conn):
+    """إنشاء جداول تجميع المبيعات بالساعة واليوم والشهر ومشغلات تحديثها
+    
+    لكل فترة وسلعة صف واحد (الكمية والإيراد وعدد المبيعات) يُحدَّث مع كل
+    بيع يُسجل أو يُحذف، فتُجاب تقارير الفترات من عدد صغير من الصفوف بدلاً
+    من مسح سجل المبيعات كاملاً. تُخزّن فئة السلعة وقت آخر بيع في الفترة.
+    """
+    inserts = []
+    for table, length in SALES_ROLLUPS.values():
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                bucket TEXT NOT NULL,
+                product_id INTEGER NOT NULL,
+                category TEXT NOT NULL DEFAULT '',
+                quantity INTEGER NOT NULL DEFAULT 0,
+                revenue REAL NOT NULL DEFAULT 0,
+                sale_count INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (bucket, product_id)
+            ) WITHOUT ROWID
+        ''')
+        conn.execute(f'CREATE INDEX IF NOT EXISTS idx_{table}_category ON {table} (category, bucket)')
+        
+        inserts.append(f'''
+            INSERT INTO {table} (bucket, product_id, category, quantity, revenue, sale_count)
+            VALUES (
+                substr(new.sale_date, 1, {length}), new.product_id,
+                IFNULL((SELECT category FROM products WHERE product_id = new.product_id), ''),
+                new.quantity_sold, new.total_price, 1
+            )
+            ON CONFLICT (bucket, product_id) DO UPDATE SET
+                category = excluded.category,
+                quantity = quantity + excluded.quantity,
+                revenue = revenue + excluded.revenue,
+                sale_count = sale_count + 1;
+        ''')
+    
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS sales_rollup_insert AFTER INSERT ON sales BEGIN
+            {''.join(inserts)}
+        END
+    ''')
+    create_sales_rollup_delete_trigger(conn)
+    
+    rebuild_sales_rollups(conn)
+
+def create_sales_rollup_delete_trigger(conn, when=''):
+    """مشغل طرح المبيعات المحذوفة من جداول التجميع (when شرط اختياري لتنفيذه)"""
+    deletes = []
+    for table, length in SALES_ROLLUPS.values():
+        deletes.append(f'''
+            UPDATE {table}
+            SET quantity = quantity - old.quantity_sold,
+                revenue = revenue - old.total_price,
+                sale_count = sale_count - 1
+            WHERE bucket = substr(old.sale_date, 1, {length}) AND product_id = old.product_id;
+            DELETE FROM {table}
+            WHERE bucket = substr(old.sale_date, 1, {length}) AND product_id = old.product_id
+              AND sale_count <= 0;
+        ''')
+    
+    conn.execute('DROP TRIGGER IF EXISTS sales_rollup_delete')
+    conn.execute(f'''
+        CREATE TRIGGER sales_rollup_delete AFTER DELETE ON sales {when} BEGIN
+            {''.join(deletes)}
+        END
+    ''')
+
+def rebuild_sales_rollups(conn):
+    """إعادة حساب جداول التجميع من سجل المبيعات (للبيانات الموجودة مسبقاً)
+    
+    الأشهر المؤرشفة لم تعد مبيعاتها في جدول sales، فتبقى تجميعاتها كما هي.
+    """
+    # تُستدعى أيضاً من ترحيلات أقدم من جدول الأرشيف وعرض product_catalog
+    existing = {row[0] for row in conn.execute('SELECT name FROM sqlite_master').fetchall()}
+    catalog = 'product_catalog' if 'product_catalog' in existing else 'products'
+    archived = ''
+    if 'sales_archive_log' in existing:
+        archived = 'WHERE substr({column}, 1, 7) NOT IN (SELECT month FROM sales_archive_log)'
+    
+    for table, length in SALES_ROLLUPS.values():
+        conn.execute(f'DELETE FROM {table} ' + archived.format(column='bucket'))
+        conn.execute(f'''
+            INSERT INTO {table} (bucket, product_id, category, quantity, revenue, sale_count)
+            SELECT substr(s.sale_date, 1, {length}), s.product_id, IFNULL(p.category, ''),
+                   SUM(s.quantity_sold), SUM(s.total_price), COUNT(*)
+            FROM sales s
+            LEFT JOIN {catalog} p ON p.product_id = s.product_id
+            {archived.format(column='s.sale_date')}
+            GROUP BY 1, 2
+        ''')
+
+def create_deleted_products(conn):
+    """جدول السلع المحذوفة (حذف ناعم) وعرض product_catalog لكل السلع
+    
+    تُنقل السلعة المحذوفة إلى deleted_products بدلاً من مسحها مع مبيعاتها،
+    فيبقى جدول products (والفهرس والإحصائيات والذاكرة المؤقتة) للسلع الحالية
+    فقط، ويبقى سجل المبيعات كاملاً مع اسم السلعة وفئتها للتقارير.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS deleted_products (
+            product_id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL,
+            category TEXT NOT NULL,
+            price REAL NOT NULL,
+            quantity INTEGER NOT NULL,
+            sold_quantity INTEGER DEFAULT 0,
+            min_stock_level INTEGER DEFAULT 5,
+            expiry_date TEXT,
+            created_date TEXT,
+            last_updated TEXT,
+            deleted_date TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute(f'''
+        CREATE VIEW IF NOT EXISTS product_catalog AS
+        SELECT {PRODUCT_COLUMNS}, 0 AS is_deleted FROM products
+        UNION ALL
+        SELECT {PRODUCT_COLUMNS}, 1 AS is_deleted FROM deleted_products
+    ''')
+
+def create_sales_archive_log(conn):
+    """سجل الأشهر المؤرشفة، وتعديل مشغل التجميعات حتى لا يطرح المبيعات المؤرشفة
+    
+    نقل مبيعات شهر مغلق إلى الأرشيف يحذفها من جدول sales دون أن تخرج من
+    تاريخ المحل، فتبقى في جداول التجميع وتبقى تقارير الفترات شاملة.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sales_archive_log (
+            month TEXT PRIMARY KEY,
+            path TEXT NOT NULL,
+            file_format TEXT NOT NULL,
+            rows INTEGER NOT NULL DEFAULT 0,
+            archived_date TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    create_sales_rollup_delete_trigger(conn, '''
+        WHEN NOT EXISTS (SELECT 1 FROM sales_archive_log WHERE month = substr(old.sale_date, 1, 7))
+    ''')
+
+def create_stock_lots(conn):
+    """إنشاء جدول دفعات المخزون ومشغل الصرف حسب الأقرب انتهاءً (FEFO)
+    
+    لكل توريد دفعة بكميتها وتاريخ انتهائها (ISO). يبقى products.quantity
+    إجمالي المخزون ومصدر التحقق الذري عند البيع، وكل نقص فيه (من أي مسار
+    بيع أو تعديل) يُصرف من الدفعات بترتيب تاريخ الانتهاء، والدفعات بدون
+    تاريخ أخيراً. ما يزيد عن مجموع الدفعات (مخزون أضيف بالتعديل أو الاستيراد)
+    مخزون بلا دفعة يُصرف بعد نفاد الدفعات.
+    
+    الفهرسان جزئيان على الدفعات غير المنتهية فقط، فلا يكبران مع الدفعات المستهلكة.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS stock_lots (
+            lot_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            product_id INTEGER NOT NULL,
+            quantity INTEGER NOT NULL CHECK (quantity >= 0),
+            expiry_date TEXT,
+            received_date TEXT DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (product_id) REFERENCES products (product_id)
+        )
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_stock_lots_expiry ON stock_lots (expiry_date) WHERE quantity > 0')
+    conn.execute('''
+        CREATE INDEX IF NOT EXISTS idx_stock_lots_product
+        ON stock_lots (product_id, expiry_date) WHERE quantity > 0
+    ''')
+    
+    # before: مجموع الدفعات التي تسبق الدفعة في ترتيب الصرف
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS stock_lots_fefo
+        AFTER UPDATE OF quantity ON products WHEN new.quantity < old.quantity BEGIN
+            UPDATE stock_lots
+            SET quantity = stock_lots.quantity
+                - MIN(stock_lots.quantity, (old.quantity - new.quantity) - fefo.before)
+            FROM (
+                SELECT lot_id, SUM(quantity) OVER (
+                    ORDER BY expiry_date IS NULL, expiry_date, lot_id ROWS UNBOUNDED PRECEDING
+                ) - quantity AS before
+                FROM stock_lots
+                WHERE product_id = new.product_id AND quantity > 0
+            ) AS fefo
+            WHERE stock_lots.lot_id = fefo.lot_id AND fefo.before < old.quantity - new.quantity;
+        END
+    ''')
+    
+    # المخزون الحالي يصبح دفعة واحدة لكل سلعة بتاريخ انتهائها إن كان بصيغة ISO
+    conn.execute('''
+        INSERT INTO stock_lots (product_id, quantity, expiry_date, received_date)
+        SELECT product_id, quantity,
+               CASE WHEN expiry_date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'
+                    THEN substr(expiry_date, 1, 10) END,
+               IFNULL(last_updated, CURRENT_TIMESTAMP)
+        FROM products
+        WHERE quantity > 0 AND product_id NOT IN (SELECT product_id FROM stock_lots)
+    ''')
+
+def create_change_journal(conn):
+    """سجل تغييرات متزايد فقط (append-only) تكتبه المشغلات مع كل تعديل على السلع والمبيعات
+    
+    لكل تغيير رقم تسلسلي seq متزايد (AUTOINCREMENT لا يعيد استخدام الأرقام)،
+    فيكفي المستهلك أن يحفظ آخر رقم قرأه ويطلب ما بعده. حذف مبيعات شهر مؤرشف
+    نقل وليس تغييراً فلا يُسجل.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_journal (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            operation TEXT NOT NULL,
+            changed_at TEXT DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    
+    for operation, row in (('insert', 'new'), ('update', 'new'), ('delete', 'old')):
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS products_journal_{operation}
+            AFTER {operation.upper()} ON products BEGIN
+                INSERT INTO change_journal (table_name, row_id, operation)
+                VALUES ('products', {row}.product_id, '{operation}');
+            END
+        ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS sales_journal_insert AFTER INSERT ON sales BEGIN
+            INSERT INTO change_journal (table_name, row_id, operation) VALUES ('sales', new.sale_id, 'insert');
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS sales_journal_delete AFTER DELETE ON sales
+        WHEN NOT EXISTS (SELECT 1 FROM sales_archive_log WHERE month = substr(old.sale_date, 1, 7)) BEGIN
+            INSERT INTO change_journal (table_name, row_id, operation) VALUES ('sales', old.sale_id, 'delete');
+        END
+    ''')
+
+def create_product_barcodes(conn):
+    """جدول الباركود/SKU: عدة رموز لكل سلعة، والرمز مفتاح أساسي فريد
+    
+    WITHOUT ROWID يجعل البحث بالرمز قراءة واحدة من شجرة المفتاح الأساسي. تغيير
+    رموز سلعة يُسجّل في سجل التغييرات كتعديل عليها، فتلتقطه الذاكرة المؤقتة
+    في العمليات الأخرى. رموز السلعة المحذوفة تبقى لاستعادتها ويمكن نقلها لسلعة أخرى.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS product_barcodes (
+            barcode TEXT PRIMARY KEY,
+            product_id INTEGER NOT NULL,
+            FOREIGN KEY (product_id) REFERENCES products (product_id)
+        ) WITHOUT ROWID
+    ''')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_product_barcodes_product ON product_barcodes (product_id)')
+    
+    for operation, rows in (('insert', ('new',)), ('delete', ('old',)), ('update', ('old', 'new'))):
+        values = ', '.join(f"('products', {row}.product_id, 'update')" for row in rows)
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS product_barcodes_journal_{operation}
+            AFTER {operation.upper()} ON product_barcodes BEGIN
+                INSERT INTO change_journal (table_name, row_id, operation) VALUES {values};
+            END
+        ''')
+
+def normalize_barcode(barcode):
+    """رمز باركود كنص بلا مسافات حوله (الماسحات ترسل أحياناً مسافة أو سطراً جديداً)"""
+    barcode = str(barcode).strip()
+    if not barcode:
+        raise ValueError("الباركود فارغ")
+    return barcode
+
+def iso_date(value, strict=True):
+    """تحويل تاريخ انتهاء (نص أو date أو datetime) إلى 'YYYY-MM-DD'
+    
+    مع strict=False تعيد None للنصوص التي ليست تاريخاً بدلاً من رفع خطأ.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    try:
+        return datetime.strptime(str(value).strip()[:10], '%Y-%m-%d').date().isoformat()
+    except ValueError:
+        if strict:
+            raise ValueError(f"تاريخ غير صالح (الصيغة المطلوبة YYYY-MM-DD): {value}")
+        return None
+
+def _bucket_bound(value):
+    """تحويل حد فترة (نص أو date أو datetime) إلى بادئة sale_date المقابلة"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.isoformat(' ')[:13]
+    return str(value)
+
+def _rollup_for_range(start, end):
+    """اختيار أخشن جدول تجميع يطابق دقة حدود الفترة
+    
+    'YYYY-MM' يُجاب من الجدول الشهري، و'YYYY-MM-DD' من اليومي، و'YYYY-MM-DD HH' من جدول الساعات.
+    """
+    length = max((len(bound) for bound in (start, end) if bound is not None), default=7)
+    for table, bucket_length in sorted(SALES_ROLLUPS.values(), key=lambda item: item[1]):
+        if bucket_length >= length:
+            return table, bucket_length
+    return SALES_ROLLUPS['hour']
+
+def _bucket_where(start, end, length, alias=''):
+    """شرط نطاق الفترات؛ الحدان مشمولان ويُقتطعان إلى دقة الجدول"""
+    conditions = []
+    params = []
+    if start is not None:
+        conditions.append(f'{alias}bucket >= ?')
+        params.append(start[:length])
+    if end is not None:
+        # كل محارف الفترة أصغر من '~'، فيشمل الحد كل الفترات التي تبدأ به ('2024-04' يشمل أيام أبريل)
+        conditions.append(f'{alias}bucket <= ?')
+        params.append(end[:length] + '~')
+    return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+def replica_read(func):
+    """مزخرف لقراءات التقارير: تُنفذ على النسخة المتماثلة إذا كانت مفعلة وحديثة بما يكفي"""
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        if self.replica is not None:
+            with self.replica.reader() as replica:
+                if replica is not None:
+                    return getattr(replica, func.__name__)(*args, **kwargs)
+        return func(self, *args, **kwargs)
+    return wrapper
+
+@instrument_methods
 class GroceryStoreManager:
-    def __init__(self, db_name='grocery_store.db'):
+    def __init__(self, db_name='grocery_store.db', persistent_connections=True, wal=True, cache=True,
+                 write_behind=None, metrics=False, replica=None, read_only=False):
+        if read_only and (write_behind or replica):
+            raise ValueError("لا تُستخدم الكتابة المؤجلة أو النسخة المتماثلة مع read_only")
         self.db_name = db_name
-        self.init_database()
+        self.wal = wal
+        # read_only: فتح قاعدة قائمة للقراءة فقط (mode=ro) دون تهيئة أو ترحيلات أو ذاكرة مؤقتة
+        self.read_only = read_only
+        # قياس زمن العمليات والاستعلامات: metrics=True أو قاموس إعدادات Metrics أو كائن Metrics
+        if isinstance(metrics, Metrics):
+            self.metrics = metrics
+        else:
+            self.metrics = Metrics(**metrics) if isinstance(metrics, dict) else Metrics(enabled=bool(metrics))
+        # اتصال دائم لكل خيط بدلاً من فتح اتصال جديد مع كل عملية
+        self.db = ConnectionManager(db_name, persistent=persistent_connections, read_only=read_only)
+        if self.metrics.enabled and self.metrics.profile_sql:
+            self.db.set_profiler(SqlProfiler(self.metrics))
+        if read_only:
+            # قاعدة قائمة (لقطة تقارير أو قاعدة فرع): لا إنشاء جداول ولا ترحيلات
+            self.fts_enabled = self._has_search_index()
+        else:
+            self.init_database()
+        
+        # ذاكرة السلع تعتمد على اتصال الكتابة الدائم لاكتشاف تغييرات الآخرين
+        self.cache = None
+        if cache and persistent_connections and not read_only:
+            self.cache = ProductCache(self.db, PRODUCT_ROW_QUERY, product_row_factory, journal=True, barcodes=True)
+        
+        # كتابة المبيعات المؤجلة المجمّعة (اختيارية): write_behind=True أو قاموس إعدادات
+        self.write_behind = None
+        if write_behind:
+            options = write_behind if isinstance(write_behind, dict) else {}
+            self.write_behind = SalesWriteBehind(self, **options)
+        
+        # نسخة متماثلة لقراءات التقارير (اختيارية): replica=True أو قاموس إعدادات ReportingReplica
+        self.replica = None
+        if replica:
+            options = replica if isinstance(replica, dict) else {}
+            self.replica = ReportingReplica(self, **options)
+    
+    @untimed
+    def close(self):
+        """إغلاق اتصالات قاعدة البيانات (بعد كتابة أي مبيعات معلّقة)"""
+        if self.replica is not None:
+            self.replica.close()
+        if self.write_behind is not None:
+            self.write_behind.close()
+        self.db.close()
+    
+    @untimed
+    def enable_metrics(self, profile_sql=True, slow_query_ms=None):
+        """تفعيل قياس زمن العمليات (ومع profile_sql زمن كل أمر SQL) أثناء التشغيل"""
+        if slow_query_ms is not None:
+            self.metrics.slow_query_ms = slow_query_ms
+        self.metrics.profile_sql = profile_sql
+        self.metrics.enabled = True
+        self.db.set_profiler(SqlProfiler(self.metrics) if profile_sql else None)
+    
+    @untimed
+    def disable_metrics(self):
+        """إيقاف القياس وإزالة دوال التتبع من الاتصالات (تبقى القياسات المجمعة)"""
+        self.metrics.enabled = False
+        self.db.set_profiler(None)
+    
+    @untimed
+    def get_metrics(self):
+        """القياسات الحالية: أزمنة العمليات والاستعلامات والعدادات وسجل الاستعلامات البطيئة"""
+        return self.metrics.snapshot()
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+    
+    def _update_search_index(self, conn):
+        """فهرسة السلع التي غيّرتها معاملة الكتابة الحالية"""
+        if self.fts_enabled:
+            update_search_index(conn)
+    
+    def sync_search_index(self):
+        """فهرسة السلع التي أضافتها أو عدّلتها اتصالات أخرى (الاستيراد أو أدوات خارجية)
+        
+        تعيد عدد السلع التي أعيدت فهرستها؛ لا تأخذ قفل الكتابة إذا لم يكن هناك ما يُفهرس.
+        """
+        if not self.fts_enabled or self.read_only:
+            return 0
+        with self.db.connection() as conn:
+            if not conn.execute('SELECT 1 FROM products_fts_pending LIMIT 1').fetchall():
+                return 0
+        with self.db.writer() as conn:
+            return update_search_index(conn)
+    
+    def _refresh_cache(self, product_ids):
+        """تحديث السلع المعدّلة في الذاكرة المؤقتة بعد اعتماد الكتابة"""
+        if self.cache is not None:
+            self.cache.refresh(product_ids)
     
     def init_database(self):
         """تهيئة قاعدة البيانات وإنشاء الجداول إذا لم تكن موجودة"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        # جدول المنتجات
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                product_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                category TEXT NOT NULL,
-                price REAL NOT NULL,
-                quantity INTEGER NOT NULL,
-                sold_quantity INTEGER DEFAULT 0,
-                min_stock_level INTEGER DEFAULT 5,
-                expiry_date TEXT,
-                created_date TEXT DEFAULT CURRENT_TIMESTAMP,
-                last_updated TEXT DEFAULT CURRENT_TIMESTAMP
-            )
-        ''')
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            
+            # جدول المنتجات
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS products (
+                    product_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    category TEXT NOT NULL,
+                    price REAL NOT NULL,
+                    quantity INTEGER NOT NULL,
+                    sold_quantity INTEGER DEFAULT 0,
+                    min_stock_level INTEGER DEFAULT 5,
+                    expiry_date TEXT,
+                    created_date TEXT DEFAULT CURRENT_TIMESTAMP,
+                    last_updated TEXT DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            # جدول المبيعات
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sales (
+                    sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    product_id INTEGER,
+                    quantity_sold INTEGER,
+                    sale_date TEXT DEFAULT CURRENT_TIMESTAMP,
+                    total_price REAL,
+                    FOREIGN KEY (product_id) REFERENCES products (product_id)
+                )
+            ''')
+            
+            # وضع WAL يسمح بالقراءة أثناء الكتابة ويقلل كلفة الاعتماد
+            if self.wal:
+                cursor.execute('PRAGMA journal_mode = WAL').fetchall()
         
-        # جدول المبيعات
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sales (
-                sale_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                product_id INTEGER,
-                quantity_sold INTEGER,
-                sale_date TEXT DEFAULT CURRENT_TIMESTAMP,
-                total_price REAL,
-                FOREIGN KEY (product_id) REFERENCES products (product_id)
-            )
-        ''')
+        self.migrate_schema()
+        self.fts_enabled = self._has_search_index()
         
-        conn.commit()
-        conn.close()
-        print(f"تم تهيئة قاعدة البيانات: {self.db_name}")
+        logger.info("تم تهيئة قاعدة البيانات: %s", self.db_name)
     
-    def add_product(self, name, category, price, quantity, min_stock_level=5, expiry_date=None):
-        """إضافة سلعة جديدة"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+    def _has_search_index(self):
+        with self.db.connection() as conn:
+            return conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'products_fts'").fetchall() != []
+    
+    def schema_version(self):
+        """رقم إصدار مخطط قاعدة البيانات الحالي"""
+        with self.db.connection() as conn:
+            return conn.execute('PRAGMA user_version').fetchall()[0][0]
+    
+    def migrate_schema(self):
+        """تطبيق ترحيلات المخطط التي لم تُطبق بعد، كل ترحيل في معاملة مستقلة"""
+        applied = []
+        for version, statements in SCHEMA_MIGRATIONS:
+            # معاملة الكتابة تبدأ بـ BEGIN IMMEDIATE مع إعادة المحاولة، فلا تطبق عمليتان
+            # الترحيل نفسه معاً؛ الإصدار يُقرأ داخلها ويُرفع مع تعديلاته في الاعتماد نفسه
+            with self.db.writer() as conn:
+                if conn.execute('PRAGMA user_version').fetchall()[0][0] < version:
+                    self._apply_migration(conn, version, statements)
+                    applied.append(version)
         
-        cursor.execute('''
-            INSERT INTO products (name, category, price, quantity, min_stock_level, expiry_date, last_updated)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (name, category, price, quantity, min_stock_level, expiry_date, datetime.now()))
+        if applied:
+            logger.info("تم ترحيل مخطط قاعدة البيانات إلى الإصدار %s", applied[-1])
+        return applied
+    
+    def _apply_migration(self, conn, version, statements):
+        for statement in statements:
+            if callable(statement):
+                statement(conn)
+            else:
+                conn.execute(statement)
+        conn.execute(f'PRAGMA user_version = {version}')
+    
+    def explain_query_plan(self, query, params=()):
+        """خطة تنفيذ الاستعلام كما يراها SQLite (EXPLAIN QUERY PLAN)"""
+        with self.db.connection() as conn:
+            rows = conn.execute(f'EXPLAIN QUERY PLAN {query}', params).fetchall()
+        return [row[-1] for row in rows]
+    
+    def check_query_plans(self):
+        """التحقق من أن الاستعلامات الأكثر استخداماً تستفيد من الفهارس
         
-        conn.commit()
-        product_id = cursor.lastrowid
-        conn.close()
+        تعيد قاموساً: اسم الاستعلام -> (هل يستخدم الفهرس المتوقع، تفاصيل الخطة).
+        يُعد الاستعلام مستفيداً إذا بحث (SEARCH) عبر الفهرس المتوقع دون أي مسح كامل (SCAN).
+        """
+        report = {}
+        for name, (query, params, index_name) in HOT_QUERIES.items():
+            plan = self.explain_query_plan(query, params)
+            uses_index = any(step.startswith('SEARCH') and index_name in step for step in plan)
+            report[name] = (uses_index and not any(step.startswith('SCAN') for step in plan), plan)
+        return report
+    
+    def add_product(self, name, category, price, quantity, min_stock_level=5, expiry_date=None, barcodes=()):
+        """إضافة سلعة جديدة (مع رموز الباركود إن وُجدت)"""
+        with self.db.writer() as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                INSERT INTO products (name, category, price, quantity, min_stock_level, expiry_date, last_updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (name, category, price, quantity, min_stock_level, expiry_date, datetime.now()))
+            
+            product_id = cursor.lastrowid
+            
+            # الكمية الأولى هي أول دفعة للسلعة
+            if quantity > 0:
+                cursor.execute('''
+                    INSERT INTO stock_lots (product_id, quantity, expiry_date, received_date)
+                    VALUES (?, ?, ?, ?)
+                ''', (product_id, quantity, iso_date(expiry_date, strict=False), datetime.now()))
+            
+            self._insert_barcodes(cursor, product_id, barcodes)
+            self._update_search_index(conn)
         
-        print(f"تم إضافة السلعة '{name}' بنجاح برقم: {product_id}")
+        self._refresh_cache([product_id])
+        logger.info("تم إضافة السلعة '%s' بنجاح برقم: %s", name, product_id)
         return product_id
     
     def delete_product(self, product_id):
-        """حذف سلعة بناءً على رقمها"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
-        
-        # التحقق من وجود السلعة
-        cursor.execute('SELECT name FROM products WHERE product_id = ?', (product_id,))
-        product = cursor.fetchone()
+        """حذف سلعة بناءً على رقمها (حذف ناعم يحتفظ بسجل مبيعاتها)"""
+        with self.db.writer() as conn:
+            cursor = conn.cursor()
+            
+            # التحقق من وجود السلعة
+            cursor.execute('SELECT name FROM products WHERE product_id = ?', (product_id,))
+            product = cursor.fetchone()
+            
+            if product:
+                cursor.execute(f'''
+                    INSERT OR REPLACE INTO deleted_products ({PRODUCT_COLUMNS}, deleted_date)
+                    SELECT {PRODUCT_COLUMNS}, ? FROM products WHERE product_id = ?
+                ''', (datetime.now(), product_id))
+                cursor.execute('DELETE FROM products WHERE product_id = ?', (product_id,))
         
         if product:
-            cursor.execute('DELETE FROM products WHERE product_id = ?', (product_id,))
-            cursor.execute('DELETE FROM sales WHERE product_id = ?', (product_id,))
-            conn.commit()
-            conn.close()
-            print(f"تم حذف السلعة '{product[0]}' بنجاح")
+            self._refresh_cache([product_id])
+            logger.info("تم حذف السلعة '%s' بنجاح", product[0])
             return True
         else:
-            conn.close()
-            print(f"لا توجد سلعة برقم {product_id}")
+            logger.warning("لا توجد سلعة برقم %s", product_id)
             return False
     
-    def update_product(self, product_id, **kwargs):
-        """تعديل بيانات سلعة"""
-        if not kwargs:
-            print("لم يتم تقديم أي بيانات للتحديث")
-            return False
+    def receive_stock(self, product_id, quantity, expiry_date=None, received_date=None):
+        """استلام دفعة جديدة من سلعة بتاريخ انتهائها وإضافتها إلى المخزون
         
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+        تعيد رقم الدفعة، أو None إذا لم توجد السلعة.
+        """
+        if quantity <= 0:
+            raise ValueError("الكمية يجب أن تكون أكبر من صفر")
+        expiry_date = iso_date(expiry_date)
         
-        # التحقق من وجود السلعة
-        cursor.execute('SELECT name FROM products WHERE product_id = ?', (product_id,))
-        product = cursor.fetchone()
+        with self.db.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE products SET quantity = quantity + ?, last_updated = ? WHERE product_id = ?
+            ''', (quantity, datetime.now(), product_id))
+            if cursor.rowcount == 0:
+                logger.warning("لا توجد سلعة برقم %s", product_id)
+                return None
+            
+            cursor.execute('''
+                INSERT INTO stock_lots (product_id, quantity, expiry_date, received_date)
+                VALUES (?, ?, ?, ?)
+            ''', (product_id, quantity, expiry_date, received_date or datetime.now()))
+            lot_id = cursor.lastrowid
         
-        if not product:
-            conn.close()
-            print(f"لا توجد سلعة برقم {product_id}")
+        self._refresh_cache([product_id])
+        logger.info("تم استلام %s من السلعة رقم %s (دفعة %s، تنتهي: %s)", quantity, product_id, lot_id, expiry_date or '---')
+        return lot_id
+    
+    def get_product_lots(self, product_id):
+        """دفعات السلعة المتبقية بترتيب الصرف (الأقرب انتهاءً أولاً)"""
+        with self.db.connection() as conn:
+            rows = conn.execute('''
+                SELECT lot_id, product_id, quantity, expiry_date, received_date
+                FROM stock_lots
+                WHERE product_id = ? AND quantity > 0
+                ORDER BY expiry_date IS NULL, expiry_date, lot_id
+            ''', (product_id,)).fetchall()
+        return [StockLot._make(row) for row in rows]
+    
+    @replica_read
+    def get_expiring_lots(self, days=7, today=None, include_expired=True, limit=None):
+        """الدفعات التي تنتهي صلاحيتها خلال days يوماً، الأقرب انتهاءً أولاً
+        
+        تمر على فهرس idx_stock_lots_expiry الجزئي فتقرأ الدفعات المطابقة فقط.
+        include_expired=False يستبعد الدفعات المنتهية قبل اليوم.
+        """
+        today = iso_date(today or date.today())
+        until = (date.fromisoformat(today) + timedelta(days=days)).isoformat()
+        
+        query = '''
+            SELECT l.lot_id, l.product_id, p.name, p.category, l.quantity, l.expiry_date, l.received_date,
+                   CAST(julianday(l.expiry_date) - julianday(?) AS INTEGER)
+            FROM stock_lots l
+            JOIN products p ON p.product_id = l.product_id
+            WHERE l.quantity > 0 AND l.expiry_date <= ?
+        '''
+        params = [today, until]
+        if not include_expired:
+            query += ' AND l.expiry_date >= ?'
+            params.append(today)
+        query += ' ORDER BY l.expiry_date, l.lot_id LIMIT ?'
+        params.append(-1 if limit is None else limit)
+        
+        with self.db.connection() as conn:
+            rows = conn.execute(query, params).fetchall()
+        return [ExpiringLot._make(row) for row in rows]
+    
+    def restore_product(self, product_id):
+        """استعادة سلعة محذوفة بنفس رقمها وبياناتها"""
+        with self.db.writer() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT name FROM deleted_products WHERE product_id = ?', (product_id,))
+            product = cursor.fetchone()
+            
+            if product:
+                cursor.execute(f'''
+                    INSERT INTO products ({PRODUCT_COLUMNS})
+                    SELECT {PRODUCT_COLUMNS} FROM deleted_products WHERE product_id = ?
+                ''', (product_id,))
+                cursor.execute('DELETE FROM deleted_products WHERE product_id = ?', (product_id,))
+                self._update_search_index(conn)
+        
+        if product:
+            self._refresh_cache([product_id])
+            logger.info("تم استعادة السلعة '%s' برقم %s", product[0], product_id)
+            return True
+        logger.warning("لا توجد سلعة محذوفة برقم %s", product_id)
+        return False
+    
+    def update_product(self, product_id, **kwargs):
+        """تعديل بيانات سلعة (barcodes=[...] يستبدل رموز الباركود)"""
+        barcodes = kwargs.pop('barcodes', None)
+        if not kwargs and barcodes is None:
+            logger.warning("لم يتم تقديم أي بيانات للتحديث")
             return False
         
         # بناء استعلام التحديث ديناميكياً
@@ -112,70 +965,303 @@ class GroceryStoreManager:
                 update_fields.append(f"{field} = ?")
                 values.append(value)
         
-        if not update_fields:
-            conn.close()
-            print("لا توجد حقول صالحة للتحديث")
-            return False
-        
-        values.append(product_id)
-        update_fields.append("last_updated = ?")
-        values.append(datetime.now())
+        with self.db.writer() as conn:
+            cursor = conn.cursor()
+            
+            # التحقق من وجود السلعة
+            cursor.execute('SELECT name FROM products WHERE product_id = ?', (product_id,))
+            product = cursor.fetchone()
+            
+            if not product:
+                logger.warning("لا توجد سلعة برقم %s", product_id)
+                return False
+            
+            if not update_fields and barcodes is None:
+                logger.warning("لا توجد حقول صالحة للتحديث")
+                return False
+            
+            update_fields.append("last_updated = ?")
+            values.append(datetime.now())
+            values.append(product_id)
+            
+            query = f"UPDATE products SET {', '.join(update_fields)} WHERE product_id = ?"
+            cursor.execute(query, values)
+            
+            if barcodes is not None:
+                cursor.execute('DELETE FROM product_barcodes WHERE product_id = ?', (product_id,))
+                self._insert_barcodes(cursor, product_id, barcodes)
+            self._update_search_index(conn)
         
-        query = f"UPDATE products SET {', '.join(update_fields)} WHERE product_id = ?"
-        cursor.execute(query, values)
-        conn.commit()
-        conn.close()
+        self._refresh_cache([product_id])
+        logger.info("تم تحديث بيانات السلعة '%s' بنجاح", product[0])
+        return True
+    
+    def _insert_barcodes(self, cursor, product_id, barcodes):
+        """ربط رموز بسلعة؛ الرمز المرتبط بسلعة محذوفة يُنقل، والمرتبط بسلعة قائمة خطأ"""
+        for barcode in barcodes:
+            barcode = normalize_barcode(barcode)
+            cursor.execute('''
+                INSERT INTO product_barcodes (barcode, product_id) VALUES (?, ?)
+                ON CONFLICT (barcode) DO UPDATE SET product_id = excluded.product_id
+                WHERE product_barcodes.product_id = excluded.product_id
+                   OR product_barcodes.product_id NOT IN (SELECT product_id FROM products)
+            ''', (barcode, product_id))
+            if cursor.rowcount == 0:
+                raise ValueError(f"الباركود {barcode} مستخدم لسلعة أخرى")
+    
+    def add_barcode(self, product_id, barcode):
+        """إضافة رمز باركود لسلعة موجودة"""
+        with self.db.writer() as conn:
+            cursor = conn.cursor()
+            if not cursor.execute('SELECT 1 FROM products WHERE product_id = ?', (product_id,)).fetchall():
+                logger.warning("لا توجد سلعة برقم %s", product_id)
+                return False
+            self._insert_barcodes(cursor, product_id, [barcode])
         
-        print(f"تم تحديث بيانات السلعة '{product[0]}' بنجاح")
+        self._refresh_cache([product_id])
         return True
     
-    def sell_product(self, product_id, quantity):
-        """بيع كمية من السلعة"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+    def remove_barcode(self, barcode):
+        """حذف رمز باركود؛ تعيد رقم سلعته أو None إذا لم يوجد"""
+        with self.db.writer() as conn:
+            rows = conn.execute('DELETE FROM product_barcodes WHERE barcode = ? RETURNING product_id',
+                                (normalize_barcode(barcode),)).fetchall()
         
-        # الحصول على بيانات السلعة
-        cursor.execute('SELECT name, price, quantity FROM products WHERE product_id = ?', (product_id,))
-        product = cursor.fetchone()
+        if not rows:
+            return None
+        self._refresh_cache([rows[0][0]])
+        return rows[0][0]
+    
+    def get_barcodes(self, product_id):
+        """رموز الباركود المرتبطة بسلعة"""
+        with self.db.connection() as conn:
+            rows = conn.execute('SELECT barcode FROM product_barcodes WHERE product_id = ? ORDER BY barcode',
+                                (product_id,)).fetchall()
+        return [barcode for (barcode,) in rows]
+    
+    def find_by_barcode(self, barcode):
+        """السلعة المرتبطة برمز باركود كـ ProductRow أو None
         
-        if not product:
-            conn.close()
-            print(f"لا توجد سلعة برقم {product_id}")
-            return False
+        مع الذاكرة المؤقتة البحث في قاموس (باركود -> سلعة) دون الوصول إلى
+        قاعدة البيانات، وإلا قراءة واحدة بالمفتاح الأساسي.
+        """
+        barcode = normalize_barcode(barcode)
+        if self.cache is not None:
+            return self.cache.by_barcode(barcode)
         
-        name, price, current_quantity = product
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = product_row_factory
+            rows = cursor.execute(
+                PRODUCT_ROW_QUERY + ' JOIN product_barcodes b ON b.product_id = p.product_id WHERE b.barcode = ?',
+                (barcode,)).fetchall()
+        return rows[0] if rows else None
+    
+    def scan_and_sell(self, barcode, quantity=1):
+        """بيع سلعة بمسح رمزها: تحديد السلعة من الباركود ثم مسار البيع المعتاد
         
-        if current_quantity < quantity:
-            conn.close()
-            print(f"الكمية المتاحة غير كافية. المتاح: {current_quantity}")
-            return False
+        تعيد صف السلعة المباعة (الاسم والسعر لشاشة نقطة البيع) أو None إذا
+        لم يُعرف الرمز أو لم يكفِ المخزون.
+        """
+        product = self.find_by_barcode(barcode)
+        if product is None:
+            logger.warning("لا توجد سلعة بالباركود %s", barcode)
+            return None
+        return product if self.sell_product(product.product_id, quantity) else None
+    
+    def sell_product(self, product_id, quantity):
+        """بيع كمية من السلعة
+        
+        يُنقص المخزون بتحديث ذري مشروط (quantity = quantity - ? WHERE quantity >= ?)
+        داخل معاملة BEGIN IMMEDIATE، فلا تضيع تحديثات نقاط البيع المتزامنة على
+        ملف قاعدة البيانات نفسه. في وضع الكتابة المؤجلة يُضاف البيع إلى طابور
+        المبيعات ويُكتب مع غيره في معاملة واحدة.
+        """
+        if quantity <= 0:
+            raise ValueError("الكمية يجب أن تكون أكبر من صفر")
+        if self.write_behind is not None:
+            return self.write_behind.sell(product_id, quantity)
         
-        # تحديث كمية السلعة
-        new_quantity = current_quantity - quantity
-        cursor.execute('''
-            UPDATE products 
-            SET quantity = ?, sold_quantity = sold_quantity + ?, last_updated = ?
-            WHERE product_id = ?
-        ''', (new_quantity, quantity, datetime.now(), product_id))
-        
-        # تسجيل عملية البيع
-        total_price = price * quantity
-        cursor.execute('''
-            INSERT INTO sales (product_id, quantity_sold, total_price, sale_date)
-            VALUES (?, ?, ?, ?)
-        ''', (product_id, quantity, total_price, datetime.now()))
-        
-        conn.commit()
-        conn.close()
-        
-        print(f"تم بيع {quantity} من '{name}' بقيمة إجمالية: {total_price:.2f} ريال")
+        with self.db.writer() as conn:
+            cursor = conn.cursor()
+            
+            # تحديث كمية السلعة فقط إذا كانت الكمية المتاحة كافية
+            cursor.execute('''
+                UPDATE products 
+                SET quantity = quantity - ?, sold_quantity = sold_quantity + ?, last_updated = ?
+                WHERE product_id = ? AND quantity >= ?
+            ''', (quantity, quantity, datetime.now(), product_id, quantity))
+            sold = cursor.rowcount == 1
+            
+            # الحصول على بيانات السلعة (ضمن المعاملة نفسها)
+            cursor.execute('SELECT name, price, quantity FROM products WHERE product_id = ?', (product_id,))
+            product = cursor.fetchone()
+            
+            if not product:
+                logger.warning("لا توجد سلعة برقم %s", product_id)
+                return False
+            
+            name, price, current_quantity = product
+            
+            if not sold:
+                logger.warning("الكمية المتاحة غير كافية. المتاح: %s", current_quantity)
+                return False
+            
+            # تسجيل عملية البيع
+            total_price = price * quantity
+            cursor.execute('''
+                INSERT INTO sales (product_id, quantity_sold, total_price, sale_date)
+                VALUES (?, ?, ?, ?)
+            ''', (product_id, quantity, total_price, datetime.now()))
+        
+        self._refresh_cache([product_id])
+        logger.info("تم بيع %s من '%s' بقيمة إجمالية: %.2f ريال", quantity, name, total_price)
         return True
     
+    def sell_many(self, lines):
+        """بيع عدة سلع في فاتورة واحدة ضمن معاملة واحدة (كل شيء أو لا شيء)
+        
+        lines: قائمة أزواج (رقم السلعة، الكمية).
+        تعيد فاتورة فيها نجاح العملية ونتيجة كل سطر والمجموع الكلي.
+        """
+        results = [{
+            'product_id': product_id,
+            'quantity': quantity,
+            'name': None,
+            'total_price': 0.0,
+            'success': False,
+            'error': None
+        } for product_id, quantity in lines]
+        receipt = {'success': False, 'lines': results, 'total_price': 0.0}
+        
+        if not results:
+            logger.warning("السلة فارغة")
+            return receipt
+        
+        # تجميع الكميات المطلوبة لكل سلعة (قد تتكرر السلعة في أكثر من سطر)
+        requested = {}
+        for line in results:
+            requested[line['product_id']] = requested.get(line['product_id'], 0) + line['quantity']
+        
+        # الكميات المحجوزة لمبيعات في طابور الكتابة المؤجلة غير متاحة للفاتورة
+        reservations = self.write_behind.reservations() if self.write_behind is not None else nullcontext({})
+        with self.db.writer() as conn, reservations as reserved:
+            cursor = conn.cursor()
+            
+            # التحقق من المخزون لجميع الأسطر باستعلام واحد
+            placeholders = ', '.join('?' * len(requested))
+            cursor.execute(
+                f'SELECT product_id, name, price, quantity FROM products WHERE product_id IN ({placeholders})',
+                list(requested)
+            )
+            stock = {row[0]: row[1:] for row in cursor.fetchall()}
+            
+            for line in results:
+                product = stock.get(line['product_id'])
+                if not product:
+                    line['error'] = f"لا توجد سلعة برقم {line['product_id']}"
+                    continue
+                
+                name, price, current_quantity = product
+                current_quantity -= reserved.get(line['product_id'], 0)
+                line['name'] = name
+                line['total_price'] = price * line['quantity']
+                
+                if line['quantity'] <= 0:
+                    line['error'] = "الكمية يجب أن تكون أكبر من صفر"
+                elif current_quantity < requested[line['product_id']]:
+                    line['error'] = f"الكمية المتاحة غير كافية. المتاح: {current_quantity}"
+            
+            if any(line['error'] for line in results):
+                logger.warning("تم إلغاء الفاتورة: بعض الأسطر غير صالحة")
+                return receipt
+            
+            # تطبيق جميع التعديلات دفعة واحدة ثم اعتماد واحد
+            now = datetime.now()
+            cursor.executemany('''
+                UPDATE products
+                SET quantity = quantity - ?, sold_quantity = sold_quantity + ?, last_updated = ?
+                WHERE product_id = ? AND quantity >= ?
+            ''', [(quantity, quantity, now, product_id, quantity) for product_id, quantity in requested.items()])
+            
+            # المعاملة تحجز قفل الكتابة منذ التحقق، فأي فرق هنا خطأ يستوجب التراجع
+            if cursor.rowcount != len(requested):
+                raise sqlite3.DatabaseError("تغيّر المخزون أثناء تنفيذ الفاتورة")
+            
+            cursor.executemany('''
+                INSERT INTO sales (product_id, quantity_sold, total_price, sale_date)
+                VALUES (?, ?, ?, ?)
+            ''', [(line['product_id'], line['quantity'], line['total_price'], now) for line in results])
+        
+        self._refresh_cache(requested)
+        for line in results:
+            line['success'] = True
+        receipt['success'] = True
+        receipt['total_price'] = sum(line['total_price'] for line in results)
+        
+        logger.info("تم بيع %s سطر بقيمة إجمالية: %.2f ريال", len(results), receipt['total_price'])
+        return receipt
+    
+    def _iter_rows(self, query, params=()):
+        """تنفيذ استعلام سلع وإرجاع الصفوف تدريجياً كـ ProductRow"""
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = product_row_factory
+            cursor.execute(query, params)
+            try:
+                while True:
+                    rows = cursor.fetchmany(500)
+                    if not rows:
+                        break
+                    yield from rows
+            finally:
+                cursor.close()
+    
+    def iter_products(self):
+        """جميع السلع كصفوف ProductRow مرتبة حسب الرقم"""
+        if self.cache is not None:
+            return iter(self.cache.all())
+        return self._iter_rows(PRODUCT_ROW_QUERY + ' ORDER BY p.product_id')
+    
+    def get_products_by_category(self, category):
+        """سلع فئة محددة كصفوف ProductRow مرتبة حسب الرقم"""
+        if self.cache is not None:
+            return self.cache.by_category(category)
+        return list(self._iter_rows(
+            PRODUCT_ROW_QUERY + ' WHERE p.category = ? ORDER BY p.product_id', (category,)))
+    
+    def get_product(self, product_id):
+        """سلعة واحدة كـ ProductRow أو None إذا لم توجد"""
+        if self.cache is not None:
+            return self.cache.get(product_id)
+        
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = product_row_factory
+            rows = cursor.execute(PRODUCT_ROW_QUERY + ' WHERE p.product_id = ?', (product_id,)).fetchall()
+        return rows[0] if rows else None
+    
+    @replica_read
     def get_all_products(self):
         """استعراض جميع السلع كجدول"""
-        conn = sqlite3.connect(self.db_name)
+        return rows_to_dataframe(self.iter_products())
+    
+    def count_products(self):
+        """عدد السلع الكلي"""
+        if self.cache is not None:
+            return self.cache.count()
         
-        query = '''
+        with self.db.connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM products').fetchall()[0][0]
+    
+    def get_products_page(self, limit=100, offset=0, after_id=None):
+        """صفحة من السلع مرتبة حسب رقم السلعة
+        
+        عند تمرير after_id تُجلب الصفحة بطريقة keyset (product_id > after_id)
+        دون الحاجة لتخطي الصفوف السابقة، وإلا تُستخدم LIMIT/OFFSET.
+        تعيد قائمة صفوف: (الرقم، الاسم، الفئة، السعر، الكمية، المباع، الحالة).
+        """
+        columns = '''
             SELECT 
                 product_id,
                 name,
@@ -183,60 +1269,105 @@ class GroceryStoreManager:
                 price,
                 quantity,
                 sold_quantity,
-                min_stock_level,
-                expiry_date,
                 CASE 
                     WHEN quantity = 0 THEN 'منتهي'
                     WHEN quantity <= min_stock_level THEN 'منخفض'
                     ELSE 'متوفر'
-                END as status,
-                (price * (quantity + sold_quantity)) as total_value
+                END as status
             FROM products
-            ORDER BY product_id
         '''
         
-        df = pd.read_sql_query(query, conn)
-        conn.close()
-        
-        return df
+        with self.db.connection() as conn:
+            if after_id is not None:
+                cursor = conn.execute(
+                    columns + ' WHERE product_id > ? ORDER BY product_id LIMIT ?', (after_id, limit))
+            else:
+                cursor = conn.execute(
+                    columns + ' ORDER BY product_id LIMIT ? OFFSET ?', (limit, offset))
+            return cursor.fetchall()
     
-    def get_product_stats(self):
-        """الحصول على إحصائيات عامة"""
-        conn = sqlite3.connect(self.db_name)
-        cursor = conn.cursor()
+    def latest_change_seq(self):
+        """آخر رقم في سجل التغييرات (نقطة البداية لمستهلك جديد)"""
+        with self.db.connection() as conn:
+            return conn.execute('SELECT IFNULL(MAX(seq), 0) FROM change_journal').fetchall()[0][0]
+    
+    def changes_since(self, seq=0, limit=1000):
+        """التغييرات بعد الرقم seq مختصرة: الحالة الحالية لكل سلعة تغيرت مرة واحدة
         
-        # إحصائيات عامة
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as total_products,
-                SUM(quantity) as total_quantity,
-                SUM(sold_quantity) as total_sold,
-                SUM(price * quantity) as current_stock_value,
-                SUM(price * sold_quantity) as total_sales_value
-            FROM products
-        ''')
+        تعيد ChangeFeed: upserts صفوف ProductRow للسلع المضافة أو المعدّلة،
+        deleted أرقام السلع المحذوفة، sales أرقام المبيعات الجديدة. كلفة الطلب
+        تتناسب مع عدد التغييرات لا مع عدد السلع.
+        """
+        with self.db.connection() as conn:
+            first = conn.execute('SELECT MIN(seq) FROM change_journal').fetchall()[0][0]
+            entries = conn.execute(
+                HOT_QUERIES['changes_since'][0], (seq, limit + 1)).fetchall()
         
-        stats = cursor.fetchone()
+        more = len(entries) > limit
+        entries = entries[:limit]
+        reset = first is not None and seq + 1 < first
+        if not entries:
+            return ChangeFeed(seq, reset, False, [], [], [])
         
-        # المنتجات المنتهية والمنخفضة
-        cursor.execute('''
-            SELECT 
-                COUNT(*) as low_stock_count
-            FROM products 
-            WHERE quantity <= min_stock_level AND quantity > 0
-        ''')
+        # آخر عملية لكل سلعة تكفي: الحالة الحالية تُقرأ من الجدول
+        latest = {}
+        sales = []
+        for _, table_name, row_id, operation in entries:
+            if table_name == 'products':
+                latest[row_id] = operation
+            elif operation == 'insert':
+                sales.append(row_id)
         
-        low_stock = cursor.fetchone()[0]
+        upserts = self._get_product_rows([product_id for product_id, operation in latest.items()
+                                          if operation != 'delete'])
+        found = {row.product_id for row in upserts}
+        deleted = sorted(product_id for product_id in latest if product_id not in found)
+        return ChangeFeed(entries[-1][0], reset, more, upserts, deleted, sales)
+    
+    def trim_change_journal(self, keep=100_000, keep_days=None):
+        """صيانة صريحة: حذف أقدم التغييرات حسب سياسة الاحتفاظ وإعادة عدد المحذوف
         
-        cursor.execute('''
-            SELECT COUNT(*) as out_of_stock_count
-            FROM products 
-            WHERE quantity = 0
-        ''')
+        يبقى دائماً آخر keep تغيير (واحد على الأقل)، ومع keep_days تبقى أيضاً كل
+        تغييرات آخر keep_days يوماً مهما كثرت، فلا يفقد مستهلك توقف لفترة قصيرة
+        موضعه. لا تُستدعى تلقائياً من أي عملية أخرى؛ يشغّلها المسؤول دورياً
+        (grocery_archive.py trim-journal). المستهلك الذي تأخر عن الجزء المحذوف
+        يتلقى reset=True فيعيد التحميل الكامل.
+        """
+        query = 'DELETE FROM change_journal WHERE seq <= (SELECT MAX(seq) FROM change_journal) - ?'
+        params = [max(1, keep)]
+        if keep_days is not None:
+            query += " AND changed_at < datetime('now', ?)"
+            params.append(f'-{keep_days} days')
         
-        out_of_stock = cursor.fetchone()[0]
+        with self.db.writer() as conn:
+            removed = conn.execute(query, params).rowcount
+        logger.info("تم حذف %s تغييراً قديماً من سجل التغييرات", removed)
+        return removed
+    
+    def _get_product_rows(self, product_ids):
+        """صفوف ProductRow لعدة سلع (الموجودة فقط) مرتبة حسب الرقم"""
+        if not product_ids:
+            return []
+        if self.cache is not None:
+            return sorted(self.cache.get_many(product_ids))
         
-        conn.close()
+        rows = []
+        with self.db.connection() as conn:
+            cursor = conn.cursor()
+            cursor.row_factory = product_row_factory
+            for start in range(0, len(product_ids), 500):
+                chunk = product_ids[start:start + 500]
+                placeholders = ', '.join('?' * len(chunk))
+                rows.extend(cursor.execute(
+                    PRODUCT_ROW_QUERY + f' WHERE p.product_id IN ({placeholders})', chunk).fetchall())
+        return sorted(rows)
+    
+    @replica_read
+    def get_product_stats(self):
+        """الحصول على إحصائيات عامة (من جدول الإحصائيات المجمّعة)"""
+        with self.db.connection() as conn:
+            stats = conn.execute(
+                f'SELECT {", ".join(STATS_COLUMNS)} FROM product_stats WHERE id = 1').fetchall()[0]
         
         return {
             'إجمالي السلع': stats[0],
@@ -244,50 +1375,183 @@ class GroceryStoreManager:
             'إجمالي المبيعات': stats[2],
             'قيمة المخزون الحالي': stats[3] or 0,
             'قيمة المبيعات الإجمالية': stats[4] or 0,
-            'سلع منخفضة المخزون': low_stock,
-            'سلع منتهية': out_of_stock
+            'سلع منخفضة المخزون': stats[5],
+            'سلع منتهية': stats[6]
         }
     
-    def search_products(self, search_term):
-        """بحث عن السلع"""
-        conn = sqlite3.connect(self.db_name)
+    def check_product_stats(self, tolerance=1e-6, repair=False):
+        """مقارنة الإحصائيات المجمّعة بحساب كامل من جدول السلع
         
-        query = '''
-            SELECT 
-                product_id,
-                name,
-                category,
-                price,
-                quantity,
-                sold_quantity
-            FROM products 
-            WHERE name LIKE ? OR category LIKE ?
-            ORDER BY product_id
-        '''
+        تعيد قاموس الفروقات (العمود -> (المخزّن، المحسوب))؛ القاموس الفارغ يعني
+        التطابق. عند repair=True يُعاد بناء الإحصائيات إذا وُجد فرق.
+        """
+        with self.db.writer() as conn:
+            stored = conn.execute(
+                f'SELECT {", ".join(STATS_COLUMNS)} FROM product_stats WHERE id = 1').fetchall()[0]
+            computed = conn.execute(STATS_AGGREGATE_QUERY).fetchall()[0]
+            
+            differences = {
+                column: (old, new)
+                for column, old, new in zip(STATS_COLUMNS, stored, computed)
+                if abs(old - new) > tolerance * max(1.0, abs(new))
+            }
+            
+            if differences and repair:
+                rebuild_stats_summary(conn)
+        
+        if differences:
+            logger.warning("الإحصائيات المجمّعة غير متطابقة: %s", ', '.join(differences))
+        return differences
+    
+    def rebuild_product_stats(self):
+        """إعادة بناء الإحصائيات المجمّعة من الصفر"""
+        with self.db.writer() as conn:
+            rebuild_stats_summary(conn)
+        logger.info("تم إعادة بناء الإحصائيات")
+    
+    def rebuild_sales_rollups(self):
+        """إعادة بناء جداول تجميع المبيعات من سجل المبيعات كاملاً"""
+        with self.db.writer() as conn:
+            rebuild_sales_rollups(conn)
+        logger.info("تم إعادة بناء تجميعات المبيعات")
+    
+    def _rollup_query(self, query, params):
+        with self.db.connection() as conn:
+            return conn.execute(query, params).fetchall()
+    
+    @replica_read
+    def get_revenue_by_period(self, period='day', start=None, end=None, category=None):
+        """الإيراد لكل ساعة أو يوم أو شهر ضمن نطاق اختياري (الحدان مشمولان)
         
-        df = pd.read_sql_query(query, conn, params=(f'%{search_term}%', f'%{search_term}%'))
-        conn.close()
+        start وend نصوص بصيغة sale_date ('2024-03' أو '2024-03-15') أو كائنات date/datetime.
+        تعيد قائمة PeriodRevenue مرتبة حسب الفترة.
+        """
+        if period not in SALES_ROLLUPS:
+            raise ValueError(f"فترة غير مدعومة: {period}")
         
-        return df
+        table, length = SALES_ROLLUPS[period]
+        where, params = _bucket_where(_bucket_bound(start), _bucket_bound(end), length)
+        if category is not None:
+            where += (' AND ' if where else ' WHERE ') + 'category = ?'
+            params.append(category)
+        
+        rows = self._rollup_query(f'''
+            SELECT bucket, SUM(quantity), SUM(revenue), SUM(sale_count)
+            FROM {table}{where}
+            GROUP BY bucket
+            ORDER BY bucket
+        ''', params)
+        return [PeriodRevenue._make(row) for row in rows]
     
-    def get_low_stock_products(self):
-        """الحصول على السلع المنخفضة المخزون"""
-        conn = sqlite3.connect(self.db_name)
+    @replica_read
+    def get_top_sellers(self, n=10, start=None, end=None, by='revenue', category=None):
+        """أكثر السلع مبيعاً (حسب الإيراد أو الكمية) ضمن نطاق اختياري
         
-        query = '''
-            SELECT 
-                product_id,
-                name,
-                category,
-                price,
-                quantity,
-                min_stock_level
-            FROM products 
-            WHERE quantity <= min_stock_level AND quantity > 0
-            ORDER BY quantity ASC
+        يُختار جدول التجميع حسب دقة الحدود: الأشهر الكاملة تُجاب من الجدول الشهري.
+        """
+        if by not in ('revenue', 'quantity'):
+            raise ValueError(f"ترتيب غير مدعوم: {by}")
+        
+        start, end = _bucket_bound(start), _bucket_bound(end)
+        table, length = _rollup_for_range(start, end)
+        where, params = _bucket_where(start, end, length)
+        if category is not None:
+            where += (' AND ' if where else ' WHERE ') + 'category = ?'
+            params.append(category)
+        
+        rows = self._rollup_query(f'''
+            SELECT t.product_id, IFNULL(p.name, ''), IFNULL(p.category, t.category),
+                   t.quantity, t.revenue, t.sale_count
+            FROM (
+                SELECT product_id, MAX(category) AS category, SUM(quantity) AS quantity,
+                       SUM(revenue) AS revenue, SUM(sale_count) AS sale_count
+                FROM {table}{where}
+                GROUP BY product_id
+                ORDER BY {by} DESC, product_id
+                LIMIT ?
+            ) t
+            LEFT JOIN product_catalog p ON p.product_id = t.product_id
+            ORDER BY t.{by} DESC, t.product_id
+        ''', params + [n])
+        return [TopSeller._make(row) for row in rows]
+    
+    @replica_read
+    def get_category_breakdown(self, start=None, end=None):
+        """المبيعات لكل فئة ضمن نطاق اختياري مع نسبة كل فئة من الإيراد"""
+        start, end = _bucket_bound(start), _bucket_bound(end)
+        table, length = _rollup_for_range(start, end)
+        where, params = _bucket_where(start, end, length)
+        
+        rows = self._rollup_query(f'''
+            SELECT category, SUM(quantity), SUM(revenue), SUM(sale_count)
+            FROM {table}{where}
+            GROUP BY category
+            ORDER BY 3 DESC, category
+        ''', params)
+        total = sum(row[2] for row in rows)
+        return [CategorySales(*row, share=row[2] / total if total else 0.0) for row in rows]
+    
+    def iter_search_results(self, search_term, use_fts=True, limit=None):
+        """بحث عن السلع وإرجاع النتائج كصفوف ProductRow
+        
+        يستخدم فهرس FTS5 (مطابقة بداية الكلمات مع ترتيب حسب الصلة وتوحيد
+        الحروف العربية) إذا كان متاحاً، وإلا يعود إلى البحث بـ LIKE.
+        """
+        match = fts_query(search_term) if use_fts and self.fts_enabled else None
+        limit = -1 if limit is None else limit
+        
+        if match:
+            self.sync_search_index()
+            query = PRODUCT_ROW_QUERY + '''
+                JOIN products_fts ON products_fts.rowid = p.product_id
+                WHERE products_fts MATCH ?
+                ORDER BY bm25(products_fts, 10.0, 1.0), p.product_id
+                LIMIT ?
+            '''
+            return self._iter_rows(query, (match, limit))
+        
+        query = PRODUCT_ROW_QUERY + '''
+            WHERE p.name LIKE ? OR p.category LIKE ?
+            ORDER BY p.product_id
+            LIMIT ?
+        '''
+        return self._iter_rows(query, (f'%{search_term}%', f'%{search_term}%', limit))
+    
+    @replica_read
+    def search_products(self, search_term, use_fts=True, limit=None):
+        """بحث عن السلع"""
+        return rows_to_dataframe(
+            self.iter_search_results(search_term, use_fts, limit),
+            ['product_id', 'name', 'category', 'price', 'quantity', 'sold_quantity']
+        )
+    
+    def iter_low_stock_products(self):
+        """السلع المنخفضة المخزون كصفوف ProductRow"""
+        if self.cache is not None:
+            rows = self.cache.by_status('منخفض')
+            return iter(sorted(rows, key=lambda row: (row.quantity, row.product_id)))
+        
+        query = PRODUCT_ROW_QUERY + '''
+            WHERE p.quantity <= p.min_stock_level AND p.quantity > 0
+            ORDER BY p.quantity ASC
         '''
+        return self._iter_rows(query)
+    
+    @replica_read
+    def get_reorder_suggestions(self, limit=None, end=None, **options):
+        """السلع التي تحتاج إعادة طلب حسب طلبها الفعلي (تُستورد NumPy عند الحاجة فقط)
         
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        end آخر يوم في فترة المبيعات (اليوم افتراضياً)، وoptions تُمرر إلى
+        ReplenishmentEngine (method وwindow وlead_time_days ...).
+        """
+        from grocery_forecast import ReplenishmentEngine
         
-        return df
+        return ReplenishmentEngine(self, **options).suggestions(end=end, limit=limit)
+    
+    @replica_read
+    def get_low_stock_products(self):
+        """الحصول على السلع المنخفضة المخزون"""
+        return rows_to_dataframe(
+            self.iter_low_stock_products(),
+            ['product_id', 'name', 'category', 'price', 'quantity', 'min_stock_level']
+        )
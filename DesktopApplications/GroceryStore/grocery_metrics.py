@@ -0,0 +1,265 @@
+# grocery_metrics.py - قياس زمن العمليات واستعلامات SQL وسجل الرسائل
+import bisect
+import functools
+import inspect
+import logging
+import re
+import sys
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import Iterator
+
+# سجل رسائل المحل: لا يطبع شيئاً ما لم تضبطه الواجهة أو سطر الأوامر (configure_logging)
+logger = logging.getLogger('grocery_store')
+logger.addHandler(logging.NullHandler())
+
+# حدود خانات المدرج التكراري بالميكروثانية (مضاعفات 2 من 8µs حتى ~8 ثوانٍ)
+HISTOGRAM_BOUNDS_US = [8 * 2 ** i for i in range(21)]
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r'\s+')
+
+
+def configure_logging(level=logging.INFO, stream=None):
+    """إظهار رسائل المحل كنص فقط (كما كانت تُطبع سابقاً) في نقاط التشغيل"""
+    if not any(getattr(handler, '_grocery_store', False) for handler in logger.handlers):
+        handler = logging.StreamHandler(stream or sys.stdout)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        handler._grocery_store = True
+        logger.addHandler(handler)
+    logger.setLevel(level)
+    return logger
+
+
+def normalize_sql(sql, max_length=200):
+    """شكل موحد للاستعلام يصلح مفتاحاً للتجميع: القيم الحرفية تُستبدل بـ ? والمسافات تُختصر"""
+    return _SPACES.sub(' ', _LITERALS.sub('?', sql)).strip()[:max_length]
+
+
+class LatencyHistogram:
+    """مدرج تكراري للأزمنة بخانات لوغاريتمية مع نافذة متحركة لآخر العينات للنسب المئوية"""
+    
+    def __init__(self, window=1024):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_US) + 1)
+        self.recent = deque(maxlen=window)
+    
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS_US, seconds * 1e6)] += 1
+        self.recent.append(seconds)
+    
+    def percentile(self, fraction):
+        """النسبة المئوية من العينات الأخيرة بالميكروثانية"""
+        if not self.recent:
+            return 0.0
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] * 1e6
+    
+    def snapshot(self):
+        return {
+            'calls': self.count,
+            'total_ms': self.total * 1e3,
+            'mean_us': self.total / self.count * 1e6 if self.count else 0.0,
+            'p50_us': self.percentile(0.5),
+            'p95_us': self.percentile(0.95),
+            'p99_us': self.percentile(0.99),
+            'max_us': self.max * 1e6,
+            'buckets': {f'<={bound}us': n for bound, n in zip(HISTOGRAM_BOUNDS_US, self.buckets) if n},
+        }
+
+
+def _is_query(name):
+    # أسماء القياسات نصوص عادة، ويمكن أن تكون صفوفاً (tuple) مثل (الفرع، العملية)
+    return isinstance(name, str) and name.startswith('sql:')
+
+
+class Metrics:
+    """عدادات ومدرجات أزمنة للعمليات واستعلامات SQL وسجل للاستعلامات البطيئة
+    
+    كل التسجيل يمر بقفل واحد، ولا يُستدعى شيء منه عندما enabled=False.
+    """
+    
+    def __init__(self, enabled=True, profile_sql=True, slow_query_ms=50.0, slow_log_size=100,
+                 window=1024, progress_steps=1000):
+        self.enabled = enabled
+        self.profile_sql = profile_sql
+        self.slow_query_ms = slow_query_ms
+        self.window = window
+        self.progress_steps = progress_steps
+        self.histograms = {}
+        self.counters = Counter()
+        self.slow_queries = deque(maxlen=slow_log_size)
+        self._lock = threading.Lock()
+    
+    def record(self, name, seconds):
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram(self.window)
+            histogram.add(seconds)
+    
+    def increment(self, name, amount=1):
+        with self._lock:
+            self.counters[name] += amount
+    
+    def record_query(self, sql, seconds, steps=0):
+        """تسجيل زمن استعلام تحت شكله الموحد، وفي سجل البطيئة إذا تجاوز slow_query_ms"""
+        self.record('sql:' + normalize_sql(sql), seconds)
+        with self._lock:
+            self.counters['sql.statements'] += 1
+            self.counters['sql.vm_steps'] += steps
+            if seconds * 1e3 >= self.slow_query_ms:
+                self.slow_queries.append({
+                    'time': time.strftime('%Y-%m-%d %H:%M:%S'),
+                    'ms': seconds * 1e3,
+                    'vm_steps': steps,
+                    'sql': _SPACES.sub(' ', sql).strip()[:500],
+                })
+        if seconds * 1e3 >= self.slow_query_ms:
+            logger.debug("استعلام بطيء (%.1f ms): %s", seconds * 1e3, sql)
+    
+    def reset(self):
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+            self.slow_queries.clear()
+    
+    def snapshot(self):
+        """نسخة من كل القياسات: العمليات والاستعلامات (الأبطأ إجمالاً أولاً) والعدادات والبطيئة"""
+        with self._lock:
+            items = [(name, histogram.snapshot()) for name, histogram in self.histograms.items()]
+            counters = dict(self.counters)
+            slow = list(self.slow_queries)
+        items.sort(key=lambda item: item[1]['total_ms'], reverse=True)
+        return {
+            'methods': {name: data for name, data in items if not _is_query(name)},
+            'queries': {name[4:]: data for name, data in items if _is_query(name)},
+            'counters': counters,
+            'slow_queries': slow,
+        }
+
+
+class SqlProfiler:
+    """توقيت الاستعلامات عبر set_trace_callback وعدّ خطوات SQLite عبر set_progress_handler
+    
+    تستدعي SQLite دالة التتبع عند بدء كل أمر (بما فيها أوامر المشغلات بصيغة
+    '-- TRIGGER name' و COMMIT)، فيُحسب زمن الأمر من بدايته حتى بدء الأمر التالي
+    على الاتصال نفسه أو نهاية السياق (finish). الزمن تقريبي ويشمل عمل Python
+    بين الأوامر، لكنه يكفي لإظهار الاستعلامات والمشغلات الأغلى.
+    """
+    
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._states = {}
+    
+    def attach(self, conn):
+        state = [None, 0.0, 0]  # الأمر الحالي، بدايته، خطوات SQLite
+        metrics = self.metrics
+        
+        def on_statement(sql):
+            now = time.perf_counter()
+            if state[0] is not None:
+                metrics.record_query(state[0], now - state[1], state[2])
+            state[0], state[1], state[2] = sql, now, 0
+        
+        def on_progress():
+            state[2] += metrics.progress_steps
+            return 0
+        
+        self._states[id(conn)] = state
+        conn.set_trace_callback(on_statement)
+        conn.set_progress_handler(on_progress, metrics.progress_steps)
+    
+    def finish(self, conn):
+        """إغلاق الأمر المفتوح على الاتصال (عند نهاية سياق العمل)"""
+        state = self._states.get(id(conn))
+        if state is not None and state[0] is not None:
+            self.metrics.record_query(state[0], time.perf_counter() - state[1], state[2])
+            state[0] = None
+    
+    def detach(self, conn):
+        self.finish(conn)
+        self._states.pop(id(conn), None)
+        conn.set_trace_callback(None)
+        conn.set_progress_handler(None, 0)
+
+
+def _timed_iter(metrics, name, iterator, elapsed=0.0):
+    """توقيت المولّد داخل next() فقط، دون الوقت الذي يقضيه المستهلك بين العناصر
+    
+    elapsed زمن سابق يُضاف إلى القياس (زمن إنشاء المكرر). إغلاق الغلاف قبل
+    النهاية يغلق المكرر الأصلي أيضاً (ومعه مؤشر قاعدة البيانات).
+    """
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                elapsed += time.perf_counter() - start
+                return
+            elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            close()
+        metrics.record(name, elapsed)
+
+
+def timed(func, name=None):
+    """مزخرف يسجل زمن الدالة في self.metrics إذا كان القياس مفعلاً
+    
+    عند التعطيل لا يضيف سوى قراءة خاصية واحدة قبل الاستدعاء. الدالة التي تعيد
+    مكرراً (مولّداً من دالة داخلية أو مؤشراً) يُقاس زمن إنشائه مع زمن قراءة
+    عناصره، لا زمن إنشائه وحده.
+    """
+    name = name or func.__name__
+    
+    if inspect.isgeneratorfunction(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            metrics = self.metrics
+            if not metrics.enabled:
+                return func(self, *args, **kwargs)
+            return _timed_iter(metrics, name, func(self, *args, **kwargs))
+        return wrapper
+    
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        metrics = self.metrics
+        if not metrics.enabled:
+            return func(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            result = func(self, *args, **kwargs)
+        except BaseException:
+            metrics.record(name, time.perf_counter() - start)
+            raise
+        if isinstance(result, Iterator):
+            return _timed_iter(metrics, name, result, time.perf_counter() - start)
+        metrics.record(name, time.perf_counter() - start)
+        return result
+    return wrapper
+
+
+def untimed(func):
+    """استثناء دالة عامة من instrument_methods"""
+    func._untimed = True
+    return func
+
+
+def instrument_methods(cls):
+    """مزخرف صنف: تطبيق timed على كل الدوال العامة المعرفة في الصنف (عدا المعلّمة بـ untimed)"""
+    for attr, value in list(vars(cls).items()):
+        if attr.startswith('_') or not inspect.isfunction(value) or getattr(value, '_untimed', False):
+            continue
+        setattr(cls, attr, timed(value, attr))
+    return cls
@@ -0,0 +1,215 @@
+# grocery_replica.py - نسخة متماثلة للتقارير تُنسخ دورياً بواجهة النسخ الاحتياطي في SQLite
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from grocery_metrics import logger
+
+
+class ReplicaSnapshot:
+    """لقطة مكتملة من قاعدة البيانات في أحد ملفي النسخة ومدير قراءة مفتوح عليها"""
+    
+    __slots__ = ('path', 'manager', 'taken_at', 'seq', 'readers')
+    
+    def __init__(self, path, manager, taken_at, seq):
+        self.path = path
+        self.manager = manager
+        self.taken_at = taken_at   # لحظة بدء معاملة القراءة التي نُسخت منها اللقطة
+        self.seq = seq             # آخر رقم في سجل التغييرات داخل اللقطة
+        self.readers = 0
+
+
+class ReportingReplica:
+    """نسخة من قاعدة البيانات لقراءات التقارير الثقيلة بعيداً عن مبيعات الصندوق
+    
+    تُنسخ القاعدة كل interval ثانية بـ sqlite3.Connection.backup على دفعات من
+    pages صفحة. يُفتح المصدر داخل معاملة قراءة طوال النسخ، فتكون اللقطة متسقة
+    ولا يُعاد النسخ من البداية كلما اعتمد كاتب (في وضع WAL لا تمنع معاملة
+    القراءة الكتّاب). تتناوب اللقطات على ملفين: تُكتب الجديدة في الملف غير
+    المستخدم ثم تحل محل الحالية، ولا يُكتب فوق لقطة ما دام فيها قارئ. تُفتح
+    كل لقطة للقراءة فقط (mode=ro) دون تهيئة أو ترحيلات أو ذاكرة مؤقتة.
+    
+    حدود وضع wal=False: معاملة القراءة على المصدر تمنع الكتّاب من الاعتماد حتى
+    ينتهي النسخ (ينتظرون حتى مهلة الاتصال ثم يفشلون). لذلك تُنسخ القاعدة في
+    خطوة واحدة دون pages وsleep لتقصير هذه المدة، ويبقى وضع WAL هو المناسب
+    للنسخة المتماثلة مع مبيعات متواصلة.
+    
+    تُوجَّه قراءات التقارير إلى اللقطة الحالية ما دام عمرها (lag) لا يتجاوز
+    max_lag ثانية، وإلا تُقرأ من القاعدة الأصلية.
+    """
+    
+    def __init__(self, manager, path=None, max_lag=60.0, interval=30.0, pages=1024, sleep=0.0,
+                 auto_start=True):
+        self.manager = manager
+        self.max_lag = max_lag
+        self.interval = interval
+        self.pages = pages
+        self.sleep = sleep
+        if not manager.wal:
+            logger.warning("النسخة المتماثلة بدون WAL: الكتابات تنتظر انتهاء كل نسخ")
+        
+        root, _ = os.path.splitext(path or manager.db_name)
+        self.paths = [f'{root}.replica-{slot}.db' for slot in (0, 1)]
+        self._next_slot = 0
+        
+        self._current = None
+        self._retired = None
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._refresh_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        
+        self.snapshots = 0
+        self.routed = 0
+        self.fallbacks = 0
+        self.last_copy_seconds = None
+        self.last_steps = 0
+        self.failures = 0
+        self.last_error = None
+        
+        if auto_start:
+            self.start()
+    
+    def start(self):
+        """تشغيل خيط النسخ الدوري (أول لقطة فوراً)"""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='reporting-replica', daemon=True)
+            self._thread.start()
+    
+    def _run(self):
+        while not self._stop.is_set():
+            # أي خطأ يُسجل ويُعاد النسخ في الدورة التالية، فلا يتوقف الخيط بصمت؛
+            # وتُوجَّه التقارير إلى القاعدة الأصلية ما دامت اللقطة أقدم من max_lag
+            try:
+                self.refresh()
+                self.last_error = None
+            except Exception as e:
+                self.failures += 1
+                self.last_error = repr(e)
+                logger.exception("تعذر نسخ قاعدة البيانات للتقارير")
+            self._stop.wait(self.interval)
+    
+    def refresh(self):
+        """أخذ لقطة جديدة الآن وجعلها اللقطة الحالية"""
+        with self._refresh_lock:
+            path = self.paths[self._next_slot]
+            
+            # الملف المستهدف يحمل اللقطة قبل السابقة: ننتظر انتهاء قرائها ثم نغلقها
+            with self._idle:
+                retired = self._retired
+                while retired is not None and retired.readers:
+                    self._idle.wait()
+                self._retired = None
+            if retired is not None:
+                retired.manager.close()
+            
+            # اللقطة للقراءة فقط، فتُفهرس السلع المعلّقة في القاعدة الأصلية قبل نسخها
+            self.manager.sync_search_index()
+            
+            start = time.perf_counter()
+            steps = 0
+            
+            def on_progress(status, remaining, total):
+                nonlocal steps
+                steps += 1
+            
+            source = sqlite3.connect(self.manager.db_name, timeout=self.manager.db.timeout, isolation_level=None)
+            try:
+                source.execute('BEGIN')
+                seq = source.execute('SELECT IFNULL(MAX(seq), 0) FROM change_journal').fetchall()[0][0]
+                taken_at = time.time()
+                target = sqlite3.connect(path)
+                try:
+                    if self.manager.wal:
+                        source.backup(target, pages=self.pages, progress=on_progress, sleep=self.sleep)
+                    else:
+                        source.backup(target, progress=on_progress)
+                    # اللقطة تُقرأ فقط: وضع journal عادي لا يحتاج ملفي -wal و-shm لفتحها بـ mode=ro
+                    target.execute('PRAGMA journal_mode = DELETE').fetchall()
+                finally:
+                    target.close()
+                source.execute('COMMIT')
+            finally:
+                source.close()
+            
+            replica = type(self.manager)(path, cache=False, read_only=True)
+            snapshot = ReplicaSnapshot(path, replica, taken_at, seq)
+            with self._lock:
+                self._retired, self._current = self._current, snapshot
+            self._next_slot ^= 1
+            
+            self.snapshots += 1
+            self.last_copy_seconds = time.perf_counter() - start
+            self.last_steps = steps
+            logger.debug("لقطة تقارير جديدة في %.1f ms (%s خطوة)", self.last_copy_seconds * 1e3, steps)
+    
+    def lag(self):
+        """عمر اللقطة الحالية بالثواني (None قبل أول لقطة)"""
+        current = self._current
+        return None if current is None else time.time() - current.taken_at
+    
+    def is_fresh(self):
+        lag = self.lag()
+        return lag is not None and lag <= self.max_lag
+    
+    @contextmanager
+    def reader(self):
+        """مدير القراءة على اللقطة الحالية إذا كانت حديثة بما يكفي، وإلا None
+        
+        لا يُكتب فوق اللقطة قبل خروج كل من يقرأ منها من هذا السياق.
+        """
+        with self._lock:
+            snapshot = self._current
+            if snapshot is None or time.time() - snapshot.taken_at > self.max_lag:
+                snapshot = None
+                self.fallbacks += 1
+            else:
+                snapshot.readers += 1
+                self.routed += 1
+        
+        if snapshot is None:
+            yield None
+            return
+        try:
+            yield snapshot.manager
+        finally:
+            with self._idle:
+                snapshot.readers -= 1
+                self._idle.notify_all()
+    
+    def status(self):
+        """حالة النسخة: العمر وعدد التغييرات غير المنسوخة وأرقام التوجيه والنسخ"""
+        current = self._current
+        changes_behind = None
+        if current is not None:
+            changes_behind = self.manager.latest_change_seq() - current.seq
+        return {
+            'path': current.path if current is not None else None,
+            'lag_seconds': self.lag(),
+            'max_lag': self.max_lag,
+            'fresh': self.is_fresh(),
+            'changes_behind': changes_behind,
+            'snapshots': self.snapshots,
+            'last_copy_ms': None if self.last_copy_seconds is None else self.last_copy_seconds * 1e3,
+            'last_steps': self.last_steps,
+            'failures': self.failures,
+            'last_error': self.last_error,
+            'routed': self.routed,
+            'fallbacks': self.fallbacks,
+        }
+    
+    def close(self):
+        """إيقاف النسخ الدوري وإغلاق مديري اللقطات"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._refresh_lock, self._lock:
+            for snapshot in (self._retired, self._current):
+                if snapshot is not None:
+                    snapshot.manager.close()
+            self._current = self._retired = None
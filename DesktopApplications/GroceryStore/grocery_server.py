@@ -0,0 +1,361 @@
+# grocery_server.py - خدمة نقاط بيع عبر HTTP/JSON فوق مدير المحل
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+from grocery_manager import GroceryStoreManager
+from grocery_metrics import configure_logging, logger
+
+HTTP_STATUS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    409: 'Conflict',
+    413: 'Payload Too Large',
+    500: 'Internal Server Error',
+}
+
+MAX_BODY_SIZE = 1024 * 1024
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class GroceryStoreServer:
+    """خادم asyncio خفيف يعرض عمليات المحل عبر HTTP/JSON
+    
+    تعمل استدعاءات قاعدة البيانات في مجمع خيوط محدود الحجم حتى لا تحجب
+    حلقة الأحداث، وتُحفظ نتائج القراءة لمدة cache_ttl ثانية وتُمسح عند أي
+    كتابة. عدد الطلبات المنفذة في الوقت نفسه محدود بـ max_pending.
+    
+    المسارات:
+        GET  /products/<id>            سلعة واحدة
+        GET  /products?limit=&offset=  صفحة من السلع
+        GET  /search?q=&limit=         بحث
+        GET  /low-stock                السلع المنخفضة المخزون
+        GET  /stats                    الإحصائيات العامة
+        POST /sell    {"product_id": 1, "quantity": 2}
+        POST /basket  {"lines": [[1, 2], [5, 1]]}
+    """
+    
+    def __init__(self, manager, host='127.0.0.1', port=8080, max_workers=4, max_pending=64, cache_ttl=1.0):
+        self.manager = manager
+        self.host = host
+        self.port = port
+        self.cache_ttl = cache_ttl
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='grocery-db')
+        self.max_pending = max_pending
+        
+        self._cache = {}
+        self._writes = 0           # يزيد مع بداية كل كتابة ونهايتها
+        self._connections = {}     # الكاتب -> مهمة المعالجة
+        self._server = None
+        self._pending = None
+        
+        self.requests = 0
+        self.cache_hits = 0
+    
+    async def _run_db(self, func, *args):
+        """تنفيذ استدعاء قاعدة بيانات في مجمع الخيوط"""
+        async with self._pending:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, func, *args)
+    
+    async def _cached_read(self, key, func, *args):
+        """قراءة مع ذاكرة مؤقتة قصيرة العمر"""
+        entry = self._cache.get(key)
+        now = time.monotonic()
+        if entry is not None and entry[0] > now:
+            self.cache_hits += 1
+            return entry[1]
+        
+        writes = self._writes
+        result = await self._run_db(func, *args)
+        # قراءة تداخلت مع كتابة قد تحمل بيانات قديمة، فلا تُحفظ بعد مسح الذاكرة
+        if writes == self._writes and writes % 2 == 0:
+            self._cache[key] = (now + self.cache_ttl, result)
+        return result
+    
+    async def _write_db(self, func, *args):
+        """تنفيذ كتابة ثم مسح نتائج القراءة المحفوظة"""
+        self._writes += 1
+        try:
+            return await self._run_db(func, *args)
+        finally:
+            self._writes += 1
+            self._cache.clear()
+    
+    # ----- المسارات -----
+    
+    async def route(self, method, path, query, body):
+        parts = [part for part in path.split('/') if part]
+        
+        if method == 'GET':
+            if parts == ['products']:
+                limit = self._int(query.get('limit', ['100'])[0], 'limit', minimum=1)
+                offset = self._int(query.get('offset', ['0'])[0], 'offset', minimum=0)
+                rows = await self._cached_read(('page', limit, offset), self.manager.get_products_page, limit, offset)
+                return [dict(zip(('product_id', 'name', 'category', 'price', 'quantity', 'sold_quantity', 'status'),
+                                 row)) for row in rows]
+            
+            if len(parts) == 2 and parts[0] == 'products':
+                product_id = self._int(parts[1], 'product_id')
+                row = await self._cached_read(('product', product_id), self.manager.get_product, product_id)
+                if row is None:
+                    raise HttpError(404, f"لا توجد سلعة برقم {product_id}")
+                return row._asdict()
+            
+            if parts == ['search']:
+                term = query.get('q', [''])[0]
+                limit = self._int(query.get('limit', ['50'])[0], 'limit', minimum=1)
+                rows = await self._cached_read(
+                    ('search', term, limit), lambda: list(self.manager.iter_search_results(term, limit=limit)))
+                return [row._asdict() for row in rows]
+            
+            if parts == ['low-stock']:
+                rows = await self._cached_read(('low-stock',), lambda: list(self.manager.iter_low_stock_products()))
+                return [row._asdict() for row in rows]
+            
+            if parts == ['stats']:
+                return await self._cached_read(('stats',), self.manager.get_product_stats)
+            
+            raise HttpError(404, "المسار غير موجود")
+        
+        if method == 'POST':
+            if not isinstance(body, dict):
+                raise HttpError(400, "جسم الطلب يجب أن يكون كائن JSON")
+            
+            if parts == ['sell']:
+                product_id = self._int(body.get('product_id'), 'product_id')
+                quantity = self._int(body.get('quantity', 1), 'quantity', minimum=1)
+                success = await self._write_db(self.manager.sell_product, product_id, quantity)
+                if not success:
+                    if await self._run_db(self.manager.get_product, product_id) is None:
+                        raise HttpError(404, f"لا توجد سلعة برقم {product_id}")
+                    raise HttpError(409, "الكمية المتاحة غير كافية")
+                return {'success': True, 'product_id': product_id, 'quantity': quantity}
+            
+            if parts == ['basket']:
+                lines = body.get('lines', [])
+                if not isinstance(lines, list) or not all(isinstance(line, list) and len(line) == 2
+                                                          for line in lines):
+                    raise HttpError(400, "الحقل lines يجب أن يكون قائمة أزواج [رقم السلعة، الكمية]")
+                lines = [(self._int(product_id, 'product_id'), self._int(quantity, 'quantity', minimum=1))
+                         for product_id, quantity in lines]
+                return await self._write_db(self.manager.sell_many, lines)
+            
+            raise HttpError(404, "المسار غير موجود")
+        
+        raise HttpError(405, "الطريقة غير مدعومة")
+    
+    @staticmethod
+    def _int(value, name, minimum=None):
+        try:
+            value = int(value)
+        except (TypeError, ValueError):
+            raise HttpError(400, f"قيمة غير صالحة للحقل {name}")
+        if minimum is not None and value < minimum:
+            raise HttpError(400, f"الحقل {name} يجب ألا يقل عن {minimum}")
+        return value
+    
+    # ----- بروتوكول HTTP -----
+    
+    async def handle_connection(self, reader, writer):
+        self._connections[writer] = asyncio.current_task()
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b'\r\n\r\n')
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                
+                lines = head.decode('latin-1').split('\r\n')
+                try:
+                    method, target, version = lines[0].split(' ', 2)
+                except ValueError:
+                    break
+                headers = {}
+                for line in lines[1:]:
+                    if ':' in line:
+                        name, value = line.split(':', 1)
+                        headers[name.strip().lower()] = value.strip()
+                
+                keep_alive = headers.get('connection', '').lower() != 'close' and version == 'HTTP/1.1'
+                status, payload = 200, None
+                try:
+                    try:
+                        length = int(headers.get('content-length', 0))
+                    except ValueError:
+                        length = -1
+                    # لا يمكن تحديد نهاية جسم الطلب، فيُغلق الاتصال بعد الرد
+                    if length < 0:
+                        keep_alive = False
+                        raise HttpError(400, "قيمة Content-Length غير صالحة")
+                    if length > MAX_BODY_SIZE:
+                        keep_alive = False
+                        raise HttpError(413, "حجم الطلب كبير جداً")
+                    raw_body = await reader.readexactly(length) if length else b''
+                    body = json.loads(raw_body) if raw_body else {}
+                    
+                    url = urlsplit(target)
+                    self.requests += 1
+                    payload = await self.route(method.upper(), url.path, parse_qs(url.query), body)
+                except HttpError as e:
+                    status, payload = e.status, {'error': e.message}
+                except json.JSONDecodeError:
+                    status, payload = 400, {'error': "جسم الطلب ليس JSON صالحاً"}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception:
+                    logger.exception("خطأ غير متوقع أثناء معالجة %s %s", method, target)
+                    status, payload = 500, {'error': "خطأ داخلي في الخادم"}
+                
+                data = json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8')
+                writer.write(
+                    f"HTTP/1.1 {status} {HTTP_STATUS[status]}\r\n"
+                    f"Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode('latin-1') + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        finally:
+            self._connections.pop(writer, None)
+            writer.close()
+    
+    async def start(self):
+        self._pending = asyncio.Semaphore(self.max_pending)
+        self._server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("خادم نقاط البيع يعمل على http://%s:%s", self.host, self.port)
+        return self
+    
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+    
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            # إغلاق الاتصالات الخاملة (keep-alive) حتى تنتهي معالجاتها
+            handlers = list(self._connections.values())
+            for writer in list(self._connections):
+                writer.close()
+            await asyncio.gather(*handlers, return_exceptions=True)
+            await self._server.wait_closed()
+        self.executor.shutdown(wait=True)
+
+
+# ----- اختبار الحمل -----
+
+async def _request(reader, writer, method, path, body=None):
+    data = json.dumps(body).encode('utf-8') if body is not None else b''
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Length: {len(data)}\r\n\r\n".encode('latin-1')
+        + data)
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    length = 0
+    for line in head.split(b'\r\n'):
+        if line.lower().startswith(b'content-length:'):
+            length = int(line.split(b':', 1)[1])
+    payload = json.loads(await reader.readexactly(length)) if length else None
+    return status, payload
+
+
+async def load_test(host='127.0.0.1', port=8080, clients=20, requests_per_client=100, product_ids=(1,)):
+    """تشغيل عدة عملاء متزامنين بمزيج من القراءة والبيع وقياس الإنتاجية والزمن"""
+    latencies = []
+    statuses = {}
+    
+    async def client(index):
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            for i in range(requests_per_client):
+                product_id = product_ids[(index + i) % len(product_ids)]
+                kind = i % 10
+                if kind < 4:
+                    request = ('GET', f'/products/{product_id}', None)
+                elif kind < 6:
+                    request = ('GET', '/search?q=%D8%B3%D9%84%D8%B9%D8%A9&limit=20', None)
+                elif kind < 7:
+                    request = ('GET', '/stats', None)
+                elif kind < 9:
+                    request = ('POST', '/sell', {'product_id': product_id, 'quantity': 1})
+                else:
+                    request = ('POST', '/basket', {'lines': [[product_id, 1], [product_ids[0], 1]]})
+                start = time.perf_counter()
+                status, _ = await _request(reader, writer, *request)
+                latencies.append(time.perf_counter() - start)
+                statuses[status] = statuses.get(status, 0) + 1
+        finally:
+            writer.close()
+    
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(clients)))
+    elapsed = time.perf_counter() - start
+    
+    ordered = sorted(latencies)
+    result = {
+        'requests': len(ordered),
+        'seconds': elapsed,
+        'requests_per_second': len(ordered) / elapsed,
+        'p50_ms': ordered[len(ordered) // 2] * 1000,
+        'p95_ms': ordered[int(len(ordered) * 0.95)] * 1000,
+        'mean_ms': statistics.fmean(ordered) * 1000,
+        'statuses': statuses,
+    }
+    print(f"{result['requests']} طلب في {elapsed:.2f} ثانية: {result['requests_per_second']:.0f} طلب/ث، "
+          f"p50 {result['p50_ms']:.2f} ms، p95 {result['p95_ms']:.2f} ms، الحالات {statuses}")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="خدمة نقاط البيع عبر HTTP/JSON")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    serve_parser = subparsers.add_parser('serve', help="تشغيل الخادم")
+    serve_parser.add_argument('--db', default='grocery_store.db')
+    serve_parser.add_argument('--host', default='127.0.0.1')
+    serve_parser.add_argument('--port', type=int, default=8080)
+    serve_parser.add_argument('--workers', type=int, default=4)
+    serve_parser.add_argument('--cache-ttl', type=float, default=1.0)
+    
+    load_parser = subparsers.add_parser('loadtest', help="اختبار حمل على خادم يعمل")
+    load_parser.add_argument('--host', default='127.0.0.1')
+    load_parser.add_argument('--port', type=int, default=8080)
+    load_parser.add_argument('--clients', type=int, default=20)
+    load_parser.add_argument('--requests', type=int, default=100)
+    load_parser.add_argument('--products', type=int, nargs='+', default=[1])
+    
+    args = parser.parse_args(argv)
+    configure_logging()
+    
+    if args.command == 'serve':
+        with GroceryStoreManager(args.db) as manager:
+            server = GroceryStoreServer(manager, args.host, args.port, args.workers, cache_ttl=args.cache_ttl)
+            try:
+                asyncio.run(server.serve_forever())
+            except KeyboardInterrupt:
+                pass
+            finally:
+                server.executor.shutdown(wait=True)
+    else:
+        asyncio.run(load_test(args.host, args.port, args.clients, args.requests, args.products))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+# grocery_text.py - توحيد النصوص العربية لأغراض البحث
+import re
+
+# التشكيل والتطويل وعلامات القرآن
+ARABIC_DIACRITICS = re.compile('[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]')
+
+# توحيد أشكال الحروف المتقاربة: الألف والياء والتاء المربوطة والهمزات
+ARABIC_LETTERS = str.maketrans({
+    'أ': 'ا', 'إ': 'ا', 'آ': 'ا', 'ٱ': 'ا',
+    'ى': 'ي', 'ئ': 'ي',
+    'ؤ': 'و',
+    'ة': 'ه',
+})
+
+WORD = re.compile(r'\w+')
+
+
+def normalize_arabic(text):
+    """إزالة التشكيل وتوحيد أشكال الحروف وتحويل الحروف اللاتينية إلى صغيرة"""
+    if text is None:
+        return ''
+    text = ARABIC_DIACRITICS.sub('', str(text))
+    return text.translate(ARABIC_LETTERS).casefold()
+
+
+def search_text(text):
+    """النص الذي يُخزّن في فهرس البحث
+    
+    يضاف إلى النص الموحّد نسخة من كل كلمة بدون "ال" التعريف، حتى يطابق
+    البحث عن "حليب" السلعة "الحليب".
+    """
+    words = WORD.findall(normalize_arabic(text))
+    stripped = [word[2:] for word in words if word.startswith('ال') and len(word) > 3]
+    return ' '.join(words + stripped)
+
+
+def fts_query(term):
+    """تحويل عبارة البحث إلى استعلام FTS5 يطابق بداية كل كلمة
+    
+    تعيد None إذا لم تحتوِ العبارة على كلمات قابلة للبحث.
+    """
+    words = WORD.findall(normalize_arabic(term))
+    if not words:
+        return None
+    return ' AND '.join(f'"{word}"*' for word in words)
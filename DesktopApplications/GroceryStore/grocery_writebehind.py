@@ -0,0 +1,278 @@
+# grocery_writebehind.py - تسجيل المبيعات بكتابة مؤجلة مجمّعة (group commit)
+import atexit
+import functools
+import queue
+import threading
+import time
+import weakref
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+from grocery_metrics import logger
+
+
+class PendingSale:
+    """عملية بيع تم التحقق منها وتنتظر الكتابة في قاعدة البيانات"""
+    
+    __slots__ = ('product_id', 'quantity', 'name', 'price', 'sale_date', 'done', 'success')
+    
+    def __init__(self, product_id, quantity, name, price):
+        self.product_id = product_id
+        self.quantity = quantity
+        self.name = name
+        self.price = price
+        self.sale_date = datetime.now()
+        self.done = threading.Event()
+        self.success = False
+
+
+def _close_at_exit(ref):
+    # مرجع ضعيف: التسجيل في atexit لا يُبقي الطابور ومديره حيين
+    writer = ref()
+    if writer is not None:
+        writer.close()
+
+
+class SalesWriteBehind:
+    """طابور مبيعات يكتبه خيط خلفي على دفعات في معاملة واحدة
+    
+    يُتحقق من كل بيع مقابل المخزون المعتمد في قاعدة البيانات (مطروحاً منه ما هو
+    محجوز في الطابور)، ثم يُضاف إلى الطابور. يجمع الخيط الخلفي المبيعات حتى يمر
+    flush_interval ثانية أو يصل عددها إلى max_batch، ويكتبها كلها باعتماد واحد.
+    
+    durability:
+        'ack'   - لا يعود البيع إلا بعد اعتماد دفعته (لا يضيع بيع مؤكد)، وتُكتب
+                  الدفعة فور فراغ الطابور دون انتظار flush_interval.
+        'async' - يعود البيع فور إضافته إلى الطابور (أسرع، وقد تضيع آخر
+                  المبيعات غير المكتوبة إذا توقفت العملية فجأة).
+    
+    في وضع async القبول مبدئي: الفواتير (sell_many) تحترم الحجوزات، لكن تعديل
+    الكمية أو حذف السلعة أو بيعها من عملية أخرى قبل الاعتماد قد يجعل التحديث
+    المشروط يرفض البيع. يُسجل الرفض في السجل وفي العداد rejected، ويُستدعى
+    on_reject(product_id, quantity) إن مُرر ليعرف المستدعي أن البيع لم يتم.
+    
+    في وضع ack لا ينتظر البيع اعتماده أكثر من ack_timeout ثانية، وبعدها يرفع
+    TimeoutError (قد يُعتمد البيع لاحقاً، فالنتيجة غير معروفة وليست فشلاً).
+    """
+    
+    def __init__(self, manager, flush_interval=0.02, max_batch=500, durability='ack', ack_timeout=30.0,
+                 on_reject=None):
+        if durability not in ('ack', 'async'):
+            raise ValueError(f"قيمة durability غير مدعومة: {durability}")
+        
+        self.manager = manager
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.durability = durability
+        self.ack_timeout = ack_timeout
+        self.on_reject = on_reject
+        
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._reserved = {}        # رقم السلعة -> الكمية المحجوزة في الطابور
+        self._in_flight = 0
+        self._idle = threading.Condition(self._lock)
+        self._closed = False
+        
+        self.batches = 0
+        self.committed = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+        self.batch_sizes = deque(maxlen=1000)
+        self.commit_seconds = deque(maxlen=1000)
+        
+        self._thread = threading.Thread(target=self._run, name='sales-writer', daemon=True)
+        self._thread.start()
+        self._atexit = functools.partial(_close_at_exit, weakref.ref(self))
+        atexit.register(self._atexit)
+    
+    def sell(self, product_id, quantity):
+        """التحقق من البيع مقابل المخزون في الذاكرة وإضافته إلى الطابور"""
+        if quantity <= 0:
+            raise ValueError("الكمية يجب أن تكون أكبر من صفر")
+        
+        with self._lock:
+            # الفحص والإضافة تحت القفل نفسه، فلا يُضاف بيع بعد علامة الإيقاف
+            if self._closed:
+                raise RuntimeError("تم إيقاف طابور المبيعات")
+            
+            # المخزون يُقرأ من قاعدة البيانات تحت القفل: الخيط الخلفي يفك حجز الدفعة
+            # تحته بعد اعتمادها، فلا تُطرح دفعة معتمدة مرتين ولا يُنسى حجز قائم
+            with self.manager.db.connection() as conn:
+                product = conn.execute('SELECT name, price, quantity FROM products WHERE product_id = ?',
+                                       (product_id,)).fetchone()
+            if product is None:
+                logger.warning("لا توجد سلعة برقم %s", product_id)
+                return False
+            
+            name, price, current_quantity = product
+            available = current_quantity - self._reserved.get(product_id, 0)
+            if available < quantity:
+                logger.warning("الكمية المتاحة غير كافية. المتاح: %s", available)
+                return False
+            
+            self._reserved[product_id] = self._reserved.get(product_id, 0) + quantity
+            self._in_flight += 1
+            sale = PendingSale(product_id, quantity, name, price)
+            self._queue.put(sale)
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        
+        if self.durability == 'ack':
+            if not sale.done.wait(self.ack_timeout):
+                raise TimeoutError(f"لم يُعتمد البيع خلال {self.ack_timeout} ثانية")
+            if sale.success:
+                logger.info("تم بيع %s من '%s' بقيمة إجمالية: %.2f ريال", quantity, sale.name, sale.price * quantity)
+            return sale.success
+        return True
+    
+    def _run(self):
+        while True:
+            sale = self._queue.get()
+            if sale is None:
+                return
+            
+            batch = [sale]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.max_batch:
+                # في وضع ack ينتظر البائعون الاعتماد، فلا فائدة من انتظار المزيد:
+                # تتكوّن الدفعة التالية طبيعياً أثناء اعتماد الدفعة الحالية
+                if self.durability == 'ack' and self._queue.empty():
+                    break
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    sale = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+                if sale is None:
+                    self._commit(batch)
+                    return
+                batch.append(sale)
+            
+            self._commit(batch)
+    
+    def _commit(self, batch):
+        """كتابة دفعة من المبيعات في معاملة واحدة"""
+        start = time.perf_counter()
+        try:
+            with self.manager.db.writer() as conn:
+                cursor = conn.cursor()
+                accepted = []
+                for sale in batch:
+                    # التحقق النهائي ذري: قد تكون عملية أخرى باعت من المخزون نفسه
+                    cursor.execute('''
+                        UPDATE products
+                        SET quantity = quantity - ?, sold_quantity = sold_quantity + ?, last_updated = ?
+                        WHERE product_id = ? AND quantity >= ?
+                    ''', (sale.quantity, sale.quantity, sale.sale_date, sale.product_id, sale.quantity))
+                    if cursor.rowcount == 1:
+                        accepted.append(sale)
+                
+                cursor.executemany('''
+                    INSERT INTO sales (product_id, quantity_sold, total_price, sale_date)
+                    VALUES (?, ?, ?, ?)
+                ''', [(sale.product_id, sale.quantity, sale.price * sale.quantity, sale.sale_date)
+                      for sale in accepted])
+            for sale in accepted:
+                sale.success = True
+            self.manager._refresh_cache({sale.product_id for sale in batch})
+        except Exception as e:
+            logger.error("فشل اعتماد دفعة المبيعات: %s", e)
+        
+        # الإبلاغ قبل فك الحجز، فيكون قد تم عند عودة flush()
+        if self.durability == 'async':
+            self._report_rejected(sale for sale in batch if not sale.success)
+        self._release(batch, start)
+    
+    def _report_rejected(self, sales):
+        """إبلاغ المستدعي ببيع قُبل مبدئياً (وضع async) ثم رُفض عند الاعتماد"""
+        for sale in sales:
+            logger.warning("رُفض بيع %s من السلعة رقم %s عند الاعتماد", sale.quantity, sale.product_id)
+            if self.on_reject is not None:
+                try:
+                    self.on_reject(sale.product_id, sale.quantity)
+                except Exception as e:
+                    logger.error("فشل استدعاء on_reject: %s", e)
+    
+    def _release(self, batch, start=None):
+        """فك حجز دفعة منتهية (معتمدة أو مرفوضة) وإبلاغ من ينتظرها؛ start لدفعة حاول الخيط اعتمادها"""
+        with self._lock:
+            for sale in batch:
+                remaining = self._reserved[sale.product_id] - sale.quantity
+                if remaining:
+                    self._reserved[sale.product_id] = remaining
+                else:
+                    del self._reserved[sale.product_id]
+            self._in_flight -= len(batch)
+            succeeded = sum(1 for sale in batch if sale.success)
+            self.committed += succeeded
+            self.rejected += len(batch) - succeeded
+            if start is not None:
+                self.batches += 1
+                self.batch_sizes.append(len(batch))
+                self.commit_seconds.append(time.perf_counter() - start)
+            self._idle.notify_all()
+        
+        for sale in batch:
+            sale.done.set()
+    
+    @contextmanager
+    def reservations(self):
+        """الكميات المحجوزة في الطابور لكل سلعة، ولا يُقبل بيع جديد حتى ينتهي السياق
+        
+        تستخدمه الفاتورة داخل معاملة الكتابة فلا تصرف مخزوناً وُعد به بيع في الطابور.
+        """
+        with self._lock:
+            yield self._reserved
+    
+    def flush(self, timeout=None):
+        """الانتظار حتى تُكتب جميع المبيعات الموجودة في الطابور"""
+        with self._lock:
+            return self._idle.wait_for(lambda: self._in_flight == 0, timeout)
+    
+    def close(self):
+        """كتابة ما تبقى في الطابور ثم إيقاف الخيط الخلفي
+        
+        المبيعات التي بقيت في الطابور بعد توقف الخيط (إذا توقف لخطأ) تُعلن
+        فاشلة ويُفك حجزها، فلا يبقى بائع ينتظرها.
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        atexit.unregister(self._atexit)
+        self._thread.join()
+        
+        pending = []
+        while True:
+            try:
+                sale = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if sale is not None:
+                pending.append(sale)
+        if pending:
+            logger.error("تم إيقاف طابور المبيعات قبل كتابة %s بيع", len(pending))
+            if self.durability == 'async':
+                self._report_rejected(pending)
+            self._release(pending)
+    
+    def metrics(self):
+        """مقاييس الطابور: العمق الحالي وأحجام الدفعات وزمن الاعتماد"""
+        with self._lock:
+            sizes = list(self.batch_sizes)
+            seconds = list(self.commit_seconds)
+            return {
+                'queue_depth': self._queue.qsize(),
+                'in_flight': self._in_flight,
+                'max_queue_depth': self.max_queue_depth,
+                'batches': self.batches,
+                'committed': self.committed,
+                'rejected': self.rejected,
+                'avg_batch_size': sum(sizes) / len(sizes) if sizes else 0.0,
+                'max_batch_size': max(sizes, default=0),
+                'avg_commit_ms': sum(seconds) / len(seconds) * 1000 if seconds else 0.0,
+            }
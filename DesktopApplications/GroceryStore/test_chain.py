@@ -0,0 +1,57 @@
+# test_chain.py - التحقق من استعلامات السلسلة مع عدد فروع يتجاوز حد الاتصالات لكل قاعدة
+import shutil
+import tempfile
+import unittest
+
+from grocery_chain import ChainStoreCoordinator
+from grocery_db import ConnectionManager
+
+BRANCHES = 20
+
+
+class ChainFanOutTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def open_chain(self, **options):
+        chain = ChainStoreCoordinator([f'b{i}' for i in range(BRANCHES)], self.directory, metrics=False, **options)
+        self.addCleanup(chain.close)
+        for i, name in enumerate(chain.branches):
+            chain.add_product(name, f'سلعة {i}', 'فئة', 2.0, 1)
+        return chain
+    
+    def assert_fan_out_scales(self, chain):
+        limit = ConnectionManager.__init__.__defaults__[3]
+        self.assertGreater(len(chain.branches), limit)
+        
+        # تكرار الاستعلام يمر بكل خيوط المجمع، ولا يفتح أي فرع اتصالاً لكل خيط
+        for _ in range(5):
+            stats = chain.get_chain_stats()
+            low_stock = list(chain.iter_low_stock_products())
+        
+        self.assertEqual(stats['إجمالي السلع'], BRANCHES)
+        self.assertEqual(len(low_stock), BRANCHES)
+        for manager in chain.managers.values():
+            self.assertLessEqual(manager.db.open_connections, 2)
+    
+    def test_thread_per_branch(self):
+        self.assert_fan_out_scales(self.open_chain())
+    
+    def test_shared_threads(self):
+        chain = self.open_chain(workers=4)
+        self.assertEqual(len({id(lane) for lane in chain._branch_lanes.values()}), 4)
+        self.assert_fan_out_scales(chain)
+    
+    def test_added_branch_gets_a_thread(self):
+        chain = self.open_chain()
+        chain.add_branch('جديد')
+        chain.add_product('جديد', 'سلعة', 'فئة', 2.0, 1)
+        
+        self.assertEqual(len(list(chain.iter_low_stock_products())), BRANCHES + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+# test_query_plans.py - التحقق من أن الاستعلامات الأكثر استخداماً تبحث عبر فهارسها بعد الترحيلات
+import os
+import shutil
+import tempfile
+import unittest
+
+from grocery_manager import HOT_QUERIES, SCHEMA_MIGRATIONS, GroceryStoreManager
+
+
+class QueryPlanTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.manager = GroceryStoreManager(os.path.join(self.directory, 'plans.db'), metrics=False)
+    
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def assert_plans_use_indexes(self):
+        for name, (query, params, index_name) in HOT_QUERIES.items():
+            with self.subTest(query=name):
+                plan = self.manager.explain_query_plan(query, params)
+                self.assertTrue(any(step.startswith('SEARCH') and index_name in step for step in plan),
+                                f"{name}: الخطة لا تستخدم {index_name}: {plan}")
+                self.assertFalse([step for step in plan if step.startswith('SCAN')],
+                                 f"{name}: مسح كامل في الخطة: {plan}")
+    
+    def test_schema_is_fully_migrated(self):
+        self.assertEqual(self.manager.schema_version(), SCHEMA_MIGRATIONS[-1][0])
+    
+    def test_hot_queries_use_indexes(self):
+        self.assert_plans_use_indexes()
+    
+    def test_hot_queries_use_indexes_after_analyze(self):
+        # إحصائيات ANALYZE قد تغير اختيار المخطط، فنتحقق على قاعدة فيها بيانات أيضاً
+        for i in range(200):
+            product_id = self.manager.add_product(f'سلعة {i}', f'فئة {i % 7}', 1.5 + i, 50 + i % 30,
+                                                  expiry_date='2030-01-01', barcodes=[f'62{i:011d}'])
+            self.manager.sell_product(product_id, 1 + i % 3)
+        with self.manager.db.writer() as conn:
+            conn.execute('ANALYZE')
+        self.assert_plans_use_indexes()
+    
+    def test_check_query_plans_reports_every_query(self):
+        report = self.manager.check_query_plans()
+        self.assertEqual(set(report), set(HOT_QUERIES))
+        for name, (uses_index, plan) in report.items():
+            with self.subTest(query=name):
+                self.assertTrue(uses_index, plan)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,199 @@
+# test_sales.py - التحقق من ثوابت البيع: نقاط بيع متزامنة وفواتير ذرية وصرف FEFO وسجل التغييرات
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from grocery_manager import GroceryStoreManager
+
+TERMINALS = 4
+ATTEMPTS = 150
+MAX_QUANTITY = 3
+
+
+def _terminal(db_path, product_ids, seed):
+    """نقطة بيع في عملية مستقلة: تعيد الكمية المباعة فعلاً لكل سلعة"""
+    rng = random.Random(seed)
+    sold = dict.fromkeys(product_ids, 0)
+    with GroceryStoreManager(db_path, cache=False, metrics=False) as manager:
+        for _ in range(ATTEMPTS):
+            product_id = rng.choice(product_ids)
+            quantity = rng.randint(1, MAX_QUANTITY)
+            if manager.sell_product(product_id, quantity):
+                sold[product_id] += quantity
+    return sold
+
+
+class SalesTestCase(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_path = os.path.join(self.directory, 'sales.db')
+        self.manager = GroceryStoreManager(self.db_path, metrics=False)
+    
+    def tearDown(self):
+        self.manager.close()
+        shutil.rmtree(self.directory, ignore_errors=True)
+    
+    def stock(self, product_id):
+        with self.manager.db.connection() as conn:
+            return conn.execute('''
+                SELECT p.quantity, p.sold_quantity,
+                       (SELECT IFNULL(SUM(quantity_sold), 0) FROM sales s WHERE s.product_id = p.product_id),
+                       (SELECT COUNT(*) FROM sales s WHERE s.product_id = p.product_id)
+                FROM products p WHERE p.product_id = ?
+            ''', (product_id,)).fetchall()[0]
+
+
+class ConcurrentTerminalsTest(SalesTestCase):
+    def test_no_lost_updates_across_processes(self):
+        # المخزون أقل من الطلب الكلي حتى تنفد السلع أثناء الاختبار
+        initial = TERMINALS * ATTEMPTS // 3
+        product_ids = [self.manager.add_product(f'سلعة {i}', 'ضغط', 1.0, initial) for i in range(3)]
+        
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(TERMINALS) as pool:
+            outcomes = pool.starmap(_terminal, [(self.db_path, product_ids, seed) for seed in range(TERMINALS)])
+        
+        for product_id in product_ids:
+            with self.subTest(product_id=product_id):
+                sold = sum(outcome[product_id] for outcome in outcomes)
+                quantity, sold_quantity, recorded, _ = self.stock(product_id)
+                self.assertGreater(sold, 0)
+                self.assertGreaterEqual(quantity, 0)
+                self.assertEqual(quantity, initial - sold)
+                self.assertEqual(sold_quantity, sold)
+                self.assertEqual(recorded, sold)
+
+
+class SellManyTest(SalesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.milk = self.manager.add_product('حليب', 'ألبان', 5.0, 10)
+        self.bread = self.manager.add_product('خبز', 'مخبوزات', 2.0, 3)
+    
+    def test_basket_is_all_or_nothing(self):
+        receipt = self.manager.sell_many([(self.milk, 2), (self.bread, 4)])
+        
+        self.assertFalse(receipt['success'])
+        self.assertTrue(receipt['lines'][1]['error'])
+        self.assertEqual(self.stock(self.milk), (10, 0, 0, 0))
+        self.assertEqual(self.stock(self.bread), (3, 0, 0, 0))
+    
+    def test_repeated_lines_are_checked_together(self):
+        receipt = self.manager.sell_many([(self.bread, 2), (self.bread, 2)])
+        
+        self.assertFalse(receipt['success'])
+        self.assertEqual(self.stock(self.bread), (3, 0, 0, 0))
+    
+    def test_unknown_product_cancels_basket(self):
+        receipt = self.manager.sell_many([(self.milk, 1), (999_999, 1)])
+        
+        self.assertFalse(receipt['success'])
+        self.assertEqual(self.stock(self.milk), (10, 0, 0, 0))
+    
+    def test_valid_basket_commits_every_line(self):
+        receipt = self.manager.sell_many([(self.milk, 2), (self.bread, 3)])
+        
+        self.assertTrue(receipt['success'])
+        self.assertAlmostEqual(receipt['total_price'], 16.0)
+        self.assertEqual(self.stock(self.milk), (8, 2, 2, 1))
+        self.assertEqual(self.stock(self.bread), (0, 3, 3, 1))
+
+
+class WriteBehindTest(SalesTestCase):
+    def setUp(self):
+        super().setUp()
+        self.rejected = []
+        self.manager.close()
+        self.manager = GroceryStoreManager(self.db_path, metrics=False, write_behind={
+            'durability': 'async', 'flush_interval': 0.2,
+            'on_reject': lambda product_id, quantity: self.rejected.append((product_id, quantity))})
+        self.product_id = self.manager.add_product('ماء', 'مشروبات', 1.0, 10)
+    
+    def test_basket_does_not_spend_reserved_stock(self):
+        self.assertTrue(all(self.manager.sell_product(self.product_id, 1) for _ in range(6)))
+        
+        self.assertFalse(self.manager.sell_many([(self.product_id, 5)])['success'])
+        self.assertTrue(self.manager.sell_many([(self.product_id, 4)])['success'])
+        self.manager.write_behind.flush()
+        self.assertEqual(self.stock(self.product_id), (0, 10, 10, 7))
+        self.assertEqual(self.rejected, [])
+    
+    def test_provisional_sale_rejected_at_commit_is_reported(self):
+        self.assertTrue(self.manager.sell_product(self.product_id, 4))
+        # كاتب آخر يُنقص المخزون قبل اعتماد الدفعة
+        with self.manager.db.writer() as conn:
+            conn.execute('UPDATE products SET quantity = 2 WHERE product_id = ?', (self.product_id,))
+        self.manager.write_behind.flush()
+        
+        self.assertEqual(self.rejected, [(self.product_id, 4)])
+        self.assertEqual(self.manager.write_behind.metrics()['rejected'], 1)
+        self.assertEqual(self.stock(self.product_id)[:2], (2, 0))
+
+
+class FefoLotsTest(SalesTestCase):
+    def test_sales_deplete_earliest_expiry_first(self):
+        product_id = self.manager.add_product('زبادي', 'ألبان', 3.0, 0)
+        late = self.manager.receive_stock(product_id, 5, expiry_date='2030-03-01')
+        undated = self.manager.receive_stock(product_id, 4)
+        early = self.manager.receive_stock(product_id, 3, expiry_date='2030-01-01')
+        
+        self.assertTrue(self.manager.sell_product(product_id, 4))
+        lots = {lot.lot_id: lot.quantity for lot in self.manager.get_product_lots(product_id)}
+        self.assertEqual(lots, {late: 4, undated: 4})
+        
+        self.assertTrue(self.manager.sell_many([(product_id, 6)])['success'])
+        lots = {lot.lot_id: lot.quantity for lot in self.manager.get_product_lots(product_id)}
+        self.assertEqual(lots, {undated: 2})
+        self.assertNotIn(early, lots)
+    
+    def test_lots_match_stock_after_sales(self):
+        product_id = self.manager.add_product('جبن', 'ألبان', 8.0, 0)
+        for day in range(1, 6):
+            self.manager.receive_stock(product_id, 4, expiry_date=f'2030-01-0{day}')
+        for quantity in (3, 1, 5, 2):
+            self.assertTrue(self.manager.sell_product(product_id, quantity))
+        
+        quantity = self.stock(product_id)[0]
+        self.assertEqual(quantity, 20 - 11)
+        self.assertEqual(sum(lot.quantity for lot in self.manager.get_product_lots(product_id)), quantity)
+
+
+class ChangeJournalTest(SalesTestCase):
+    def test_trim_keeps_latest_changes(self):
+        product_id = self.manager.add_product('شاي', 'مشروبات', 4.0, 100)
+        for _ in range(20):
+            self.manager.sell_product(product_id, 1)
+        latest = self.manager.latest_change_seq()
+        
+        removed = self.manager.trim_change_journal(keep=5)
+        
+        with self.manager.db.connection() as conn:
+            remaining = [seq for (seq,) in conn.execute('SELECT seq FROM change_journal ORDER BY seq')]
+        self.assertEqual(remaining, list(range(latest - 4, latest + 1)))
+        self.assertEqual(removed, latest - 5)
+        self.assertEqual(self.manager.latest_change_seq(), latest)
+    
+    def test_consumer_behind_trimmed_part_gets_reset(self):
+        product_id = self.manager.add_product('قهوة', 'مشروبات', 12.0, 100)
+        for _ in range(10):
+            self.manager.sell_product(product_id, 1)
+        self.manager.trim_change_journal(keep=3)
+        
+        self.assertTrue(self.manager.changes_since(0).reset)
+        feed = self.manager.changes_since(self.manager.latest_change_seq() - 3)
+        self.assertFalse(feed.reset)
+        self.assertEqual([row.product_id for row in feed.upserts], [product_id])
+    
+    def test_trim_with_keep_days_keeps_recent_changes(self):
+        product_id = self.manager.add_product('سكر', 'مواد', 6.0, 100)
+        for _ in range(10):
+            self.manager.sell_product(product_id, 1)
+        
+        self.assertEqual(self.manager.trim_change_journal(keep=1, keep_days=1), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()